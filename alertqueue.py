@@ -0,0 +1,211 @@
+import threading
+import time
+
+import requests
+
+import alertstore
+from utils import load_settings
+
+DELIVERY_WORKERS = 4
+DELIVERY_MAX_ATTEMPTS = 5
+DELIVERY_BACKOFF_SECONDS = 15
+DELIVERY_MAX_BACKOFF_SECONDS = 900
+DELIVERY_CONNECT_TIMEOUT = 5
+DELIVERY_READ_TIMEOUT = 30
+DELIVERY_POLL_SECONDS = 5
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    recipient_name TEXT,
+    message TEXT NOT NULL,
+    alert_type TEXT,
+    vehicle_id TEXT,
+    driver_name TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL,
+    latency_ms REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbound_status_next ON outbound_messages (status, next_attempt_at);
+"""
+
+_session_local = threading.local()
+
+
+def _session():
+    session = getattr(_session_local, "session", None)
+    if session is None:
+        session = _session_local.session = requests.Session()
+    return session
+
+
+def send_whatsapp_text(phone_number, message):
+    whatsapp_url = load_settings().get('whatsapp_server_url')
+    if not whatsapp_url:
+        return False, "whatsapp_server_url not configured"
+    try:
+        response = _session().post(
+            f"{whatsapp_url}/send-text",
+            json={
+                "number": phone_number + "@c.us",
+                "message": message
+            },
+            timeout=(DELIVERY_CONNECT_TIMEOUT, DELIVERY_READ_TIMEOUT)
+        )
+        if response.status_code == 200:
+            return True, None
+        return False, f"HTTP {response.status_code}"
+    except Exception as e:
+        return False, str(e)
+
+
+def backoff_seconds(attempts):
+    return min(DELIVERY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), DELIVERY_MAX_BACKOFF_SECONDS)
+
+
+class DeliveryQueue:
+    def __init__(self, send_func=send_whatsapp_text, workers=DELIVERY_WORKERS, db_path=alertstore.ALERT_DB_PATH):
+        self.send_func = send_func
+        self.workers = workers
+        self.db_path = db_path
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        alertstore.connect(db_path).executescript(QUEUE_SCHEMA)
+
+    def _conn(self):
+        return alertstore.connect(self.db_path)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        conn = self._conn()
+        with conn:
+            recovered = conn.execute(
+                "UPDATE outbound_messages SET status = 'pending' WHERE status = 'sending'"
+            ).rowcount
+        pending = conn.execute("SELECT COUNT(*) FROM outbound_messages WHERE status = 'pending'").fetchone()[0]
+        print(f"[alertqueue] Starting {self.workers} delivery workers ({pending} pending, {recovered} recovered)")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"alert-delivery-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, phone, message, recipient_name=None, alert_type=None, vehicle_id=None, driver_name=None):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            message_id = conn.execute(
+                "INSERT INTO outbound_messages (status, phone, recipient_name, message, alert_type, vehicle_id, "
+                "driver_name, enqueued_at, next_attempt_at) VALUES ('pending', ?, ?, ?, ?, ?, ?, ?, ?)",
+                (phone, recipient_name, message, alert_type,
+                 None if vehicle_id is None else str(vehicle_id), driver_name, now, now)
+            ).lastrowid
+        with self._wakeup:
+            self._wakeup.notify()
+        return message_id
+
+    def _claim(self):
+        conn = self._conn()
+        with conn:
+            rows = conn.execute(
+                "UPDATE outbound_messages SET status = 'sending', attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM outbound_messages WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT 1) RETURNING *",
+                (time.time(),)
+            ).fetchall()
+        return rows[0] if rows else None
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except Exception as e:
+                print(f"[alertqueue] Failed to claim message: {e}")
+                row = None
+
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(DELIVERY_POLL_SECONDS)
+                continue
+
+            self._deliver(row)
+
+    def _deliver(self, row):
+        start = time.perf_counter()
+        try:
+            ok, error = self.send_func(row["phone"], row["message"])
+        except Exception as e:
+            ok, error = False, str(e)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        conn = self._conn()
+        if ok:
+            with conn:
+                conn.execute(
+                    "UPDATE outbound_messages SET status = 'sent', sent_at = ?, latency_ms = ?, last_error = NULL "
+                    "WHERE id = ?",
+                    (time.time(), latency_ms, row["id"])
+                )
+            try:
+                alertstore.log_alert(row["alert_type"], row["phone"], row["recipient_name"], row["message"],
+                                     row["vehicle_id"], row["driver_name"], db_path=self.db_path)
+            except Exception as e:
+                print(f"[alertqueue] Failed to log delivery {row['id']}: {e}")
+            return
+
+        if row["attempts"] >= DELIVERY_MAX_ATTEMPTS:
+            status, next_attempt_at = 'failed', time.time()
+            print(f"[alertqueue] Giving up on message {row['id']} to {row['phone']} "
+                  f"after {row['attempts']} attempts: {error}")
+        else:
+            status, next_attempt_at = 'pending', time.time() + backoff_seconds(row["attempts"])
+            print(f"[alertqueue] Message {row['id']} to {row['phone']} failed (attempt {row['attempts']}): "
+                  f"{error}; retrying in {backoff_seconds(row['attempts'])}s")
+        with conn:
+            conn.execute(
+                "UPDATE outbound_messages SET status = ?, next_attempt_at = ?, latency_ms = ?, last_error = ? "
+                "WHERE id = ?",
+                (status, next_attempt_at, latency_ms, error, row["id"])
+            )
+
+    def purge_before(self, cutoff_seconds):
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "DELETE FROM outbound_messages WHERE status IN ('sent', 'failed') AND enqueued_at < ?",
+                (time.time() - cutoff_seconds,)
+            ).rowcount
+
+    def stats(self, since_seconds=86400):
+        conn = self._conn()
+        since = time.time() - since_seconds
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM outbound_messages WHERE enqueued_at >= ? OR status = 'pending' "
+            "GROUP BY status", (since,)
+        ).fetchall())
+        latency = conn.execute(
+            "SELECT AVG(latency_ms), MAX(latency_ms), AVG(sent_at - enqueued_at) FROM outbound_messages "
+            "WHERE status = 'sent' AND enqueued_at >= ?", (since,)
+        ).fetchone()
+        return {
+            "counts": counts,
+            "avg_send_ms": latency[0],
+            "max_send_ms": latency[1],
+            "avg_queue_delay_s": latency[2]
+        }
@@ -0,0 +1,521 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import alertstore
+import changesets
+import comparisoncache
+import storage
+from alertsnapshot import ALERT_REPORTS, TRAVEL_REPORT_PATH, uae_today
+
+DRIVER_VIOLATION_LOGS_PATH = "alerts/driver_violations.json"
+ROUTE_DEVIATION_LOGS_PATH = "alerts/route_deviation_logs.json"
+
+ADMINS = "admins"
+ADMINS_AND_DRIVER = "admins_and_driver"
+CADENCE_SLACK_SECONDS = 60
+
+
+def _load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def load_driver_violations():
+    return _load_json(DRIVER_VIOLATION_LOGS_PATH)
+
+
+def save_driver_violations(violations):
+    _save_json(DRIVER_VIOLATION_LOGS_PATH, violations)
+
+
+def load_route_deviation_logs():
+    return _load_json(ROUTE_DEVIATION_LOGS_PATH)
+
+
+def save_route_deviation_logs(logs):
+    _save_json(ROUTE_DEVIATION_LOGS_PATH, logs)
+
+
+def generate_alert_hash(alert_type, vehicle_id, additional_data=None):
+    today = datetime.now().strftime('%Y-%m-%d')
+    current_hour = datetime.now().strftime('%H')
+
+    if alert_type == "IDLE":
+        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "UNAUTHORIZED_GEOFENCE":
+        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "EARLY_RETURN":
+        content = f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
+    elif alert_type == "VIOLATION":
+        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "ROUTE_DEVIATION":
+        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    else:
+        content = f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
+
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def generate_alert_key(alert_type, vehicle_id, additional_data=None):
+    today = datetime.now().strftime('%Y-%m-%d')
+    current_hour = datetime.now().strftime('%H')
+
+    if alert_type == "IDLE":
+        return f"IDLE_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "UNAUTHORIZED_GEOFENCE":
+        return f"GEOFENCE_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "EARLY_RETURN":
+        return f"EARLY_{vehicle_id}_{today}_{current_hour}"
+    elif alert_type == "VIOLATION":
+        return f"VIOLATION_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+    elif alert_type == "ROUTE_DEVIATION":
+        return f"ROUTE_DEV_{vehicle_id}_{additional_data}_{today}_{current_hour}"
+
+    return f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
+
+
+def create_google_maps_link(latitude, longitude, link_type="map"):
+    if link_type == "street":
+        return f"https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={latitude},{longitude}"
+    else:
+        return f"https://www.google.com/maps/@?api=1&map_action=map&center={latitude},{longitude}&zoom=15"
+
+
+def location_text(snapshot, vehicle_id, label):
+    location_info = snapshot.vehicle_location(vehicle_id)
+    if location_info and pd.notna(location_info['latitude']) and pd.notna(location_info['longitude']):
+        maps_link = create_google_maps_link(location_info['latitude'], location_info['longitude'])
+        street_link = create_google_maps_link(location_info['latitude'], location_info['longitude'], "street")
+        return f"{label}\nMAP: {maps_link}\nSTREET: {street_link}"
+    return label
+
+
+def _int_or_zero(value):
+    return int(value) if pd.notna(value) else 0
+
+
+def match_idle(row, rule, snapshot):
+    duration = row['Duration']
+    if pd.isna(duration) or duration <= timedelta(minutes=rule.thresholds['idle_minutes']):
+        return None
+
+    vehicle_id = str(row['Vehicle Number'])
+    idle_from_str = row['Idle From'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['Idle From']) else 'N/A'
+
+    def message():
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        location_info = snapshot.vehicle_location(vehicle_id)
+        location = row['Location']
+        if location_info and pd.notna(location_info['latitude']) and pd.notna(location_info['longitude']):
+            location = location_text(snapshot, vehicle_id, location_info['address'])
+        duration_str = str(duration).split('.')[0]
+        idle_from = row['Idle From'].strftime('%H:%M') if pd.notna(row['Idle From']) else 'N/A'
+        idle_till = row['Idle Till'].strftime('%H:%M') if pd.notna(row['Idle Till']) else 'N/A'
+        return f"🚨 IDLE ALERT\n{alias} stopped {duration_str}\nFrom: {idle_from} To: {idle_till}\nAt: {location}"
+
+    return {"vehicle_id": vehicle_id, "key_data": idle_from_str, "driver_name": row['Driver'], "message": message}
+
+
+def match_violation(row, rule, snapshot):
+    harsh_braking = _int_or_zero(row['Harsh Break'])
+    harsh_accel = _int_or_zero(row['Harsh Acceleration'])
+    over_speed = _int_or_zero(row['Over Speed'])
+    total_violations = harsh_braking + harsh_accel + over_speed
+    if total_violations <= rule.thresholds['violations']:
+        return None
+
+    vehicle_id = str(row['No of Vehicles'])
+    driver_name = row['Driver']
+
+    def message():
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        return (f"⚠️ VIOLATION ALERT\n{driver_name} ({alias})\n"
+                f"Total: {total_violations} (HB:{harsh_braking} HA:{harsh_accel} OS:{over_speed})")
+
+    return {
+        "vehicle_id": vehicle_id,
+        "key_data": total_violations,
+        "driver_name": driver_name,
+        "state_key": f"{driver_name}_{vehicle_id}",
+        "value": total_violations,
+        "message": message
+    }
+
+
+def accept_violation(candidate, rule):
+    violation_logs = load_driver_violations()
+    if candidate["value"] <= violation_logs.get(candidate["state_key"], 0):
+        return False
+    violation_logs[candidate["state_key"]] = candidate["value"]
+    save_driver_violations(violation_logs)
+    return True
+
+
+def match_route_deviation(row, rule, snapshot):
+    max_dev = row.get('maximum_route_deviation', 0)
+    if max_dev <= rule.thresholds['max_deviation_m']:
+        return None
+
+    vehicle_id = row['vehicle_id']
+
+    def message():
+        alias = snapshot.vehicle_aliases[vehicle_id]
+        return (f"🛤️ ROUTE DEVIATION\n{alias} exceeded {rule.thresholds['max_deviation_m']}m\n"
+                f"Max deviation: {max_dev:.0f}m\n"
+                f"Route alignment: {row.get('actual_route_alignment', 0):.1f}%\n"
+                f"Route coverage: {row.get('planned_route_coverage', 0):.1f}%\n"
+                f"Distance: {row.get('actual_distance', 0):.1f}km (Planned: {row.get('planned_distance', 0):.1f}km)\n"
+                f"Visits: {row.get('visited_customer_points', 0)}/{row.get('total_customer_points', 0)} "
+                f"({row.get('visit_percentage', 0.0):.1f}%)")
+
+    return {
+        "vehicle_id": vehicle_id,
+        "key_data": max_dev,
+        "state_key": f"{vehicle_id}_{row['date']}",
+        "value": max_dev,
+        "message": message
+    }
+
+
+def accept_route_deviation(candidate, rule):
+    deviation_logs = load_route_deviation_logs()
+    if candidate["state_key"] in deviation_logs:
+        return False
+    deviation_logs[candidate["state_key"]] = candidate["value"]
+    save_route_deviation_logs(deviation_logs)
+    return True
+
+
+def match_early_return(row, rule, snapshot):
+    if row['Geofence'] != rule.thresholds['office_geofence'] or pd.isna(row['In Time']) or pd.isna(row['Out Time']):
+        return None
+
+    in_time = pd.to_datetime(row['In Time'])
+    out_time = pd.to_datetime(row['Out Time'])
+    start_hour, end_hour = rule.active_hours
+    if not (out_time.hour >= start_hour and in_time.hour < end_hour and in_time.date() == out_time.date()):
+        return None
+
+    vehicle_id = str(row['Vehicle No'])
+    perf_row = snapshot.rows_for_vehicle("driverperformance", vehicle_id)
+    if perf_row.empty:
+        return None
+    perf = perf_row.iloc[0]
+    driver_name = row['Driver']
+
+    def message():
+        comparison_data = comparisoncache.get_planned_comparison(
+            [vehicle_id], datetime.now().strftime('%Y-%m-%d'), snapshot.settings
+        )
+        customers_visited = comparison_data.get(f"{vehicle_id}_Current", {}).get('visited_customer_points', 0)
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        return (f"⏰ EARLY RETURN\n{alias} ({driver_name}) returned at {in_time.strftime('%H:%M')}\n"
+                f"Customers: {customers_visited}\nViolations: HB:{_int_or_zero(perf['Harsh Break'])} "
+                f"HA:{_int_or_zero(perf['Harsh Acceleration'])} OS:{_int_or_zero(perf['Over Speed'])}")
+
+    return {
+        "vehicle_id": vehicle_id,
+        "key_data": in_time.strftime('%Y-%m-%d %H:%M'),
+        "driver_name": driver_name,
+        "message": message
+    }
+
+
+def match_unauthorized_geofence(row, rule, snapshot):
+    geofence_name = row['Geofence']
+    if pd.notna(row['Out Time']) or pd.isna(geofence_name) or geofence_name in rule.thresholds['authorized_geofences']:
+        return None
+
+    vehicle_id = str(row['Vehicle No'])
+    in_time_str = row['In Time'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['In Time']) else 'N/A'
+    driver_name = row['Driver']
+
+    def message():
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        in_time = row['In Time'].strftime('%H:%M') if pd.notna(row['In Time']) else 'Unknown'
+        elapsed = row.get('Elapsed Time Inside The Geofence')
+        elapsed_time = elapsed if pd.notna(elapsed) else 'Unknown'
+        return (f"🚩 UNAUTHORIZED AREA\n{alias} ({driver_name}) in competitor area\n"
+                f"Location: {location_text(snapshot, vehicle_id, geofence_name)}\nSince: {in_time}\nDuration: {elapsed_time}")
+
+    return {
+        "vehicle_id": vehicle_id,
+        "key_data": f"{geofence_name}_{in_time_str}",
+        "driver_name": driver_name,
+        "message": message
+    }
+
+
+def match_overspeed(row, rule, snapshot):
+    max_speed = row.get('Max Speed')
+    if pd.isna(max_speed) or int(max_speed) <= rule.thresholds['max_speed_kmh']:
+        return None
+
+    vehicle_id = str(row['No of Vehicles'])
+    driver_name = row['Driver']
+
+    def message():
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        return (f"🏎️ OVERSPEED\n{driver_name} ({alias})\n"
+                f"Max speed: {int(max_speed)} km/h (limit {rule.thresholds['max_speed_kmh']} km/h)")
+
+    return {"vehicle_id": vehicle_id, "key_data": int(max_speed), "driver_name": driver_name, "message": message}
+
+
+def match_after_hours_movement(row, rule, snapshot):
+    ping_time = row.get('time')
+    if pd.isna(ping_time) or ping_time.strftime('%Y-%m-%d') != datetime.now().strftime('%Y-%m-%d'):
+        return None
+    if ping_time.hour < rule.thresholds['after_hour'] or not (row.get('speed') or 0) >= rule.thresholds['min_speed_kmh']:
+        return None
+
+    vehicle_id = row['vehicle_id']
+
+    def message():
+        alias = snapshot.vehicle_aliases.get(vehicle_id, vehicle_id)
+        return (f"🌙 AFTER-HOURS MOVEMENT\n{alias} moving at {row['speed']:.0f} km/h\n"
+                f"Last seen: {ping_time.strftime('%H:%M')}\n"
+                f"Location: {location_text(snapshot, vehicle_id, row.get('address') or 'Unknown')}")
+
+    return {"vehicle_id": vehicle_id, "key_data": ping_time.strftime('%Y-%m-%d %H'), "message": message}
+
+
+def report_rows(name):
+    def rows(snapshot):
+        return snapshot.source_frame(name).to_dict('records')
+    return rows
+
+
+def comparison_rows(snapshot):
+    vehicle_aliases = snapshot.vehicle_aliases
+    date_val = uae_today()
+    comparison_data = comparisoncache.get_planned_comparison(list(vehicle_aliases.keys()), date_val, snapshot.settings)
+    if "error" in comparison_data:
+        raise RuntimeError(comparison_data["error"])
+
+    rows = []
+    for key, stats in comparison_data.items():
+        vehicle_id = key[:-8] if key.endswith('_Current') else key
+        if vehicle_id in vehicle_aliases:
+            rows.append({**stats, "vehicle_id": vehicle_id, "date": date_val})
+    return rows
+
+
+def position_rows(snapshot):
+    return [{**position, "vehicle_id": vehicle_id} for vehicle_id, position in snapshot.latest_positions().items()]
+
+
+SOURCES = {
+    "exidlereport": report_rows("exidlereport"),
+    "geofence": report_rows("geofence"),
+    "driverperformance": report_rows("driverperformance"),
+    "comparison": comparison_rows,
+    "positions": position_rows
+}
+
+
+CHANGE_SOURCES = changesets.CHANGESET_CONSUMERS["alerts"]
+
+
+def input_version(name, snapshot):
+    if name in ALERT_REPORTS:
+        return comparisoncache.file_version(ALERT_REPORTS[name]["path"])
+    if name == "travelreport":
+        if storage.has_report("travelreport"):
+            return storage.report_version("travelreport")
+        return comparisoncache.file_version(TRAVEL_REPORT_PATH)
+    if name == "planned_routes":
+        return comparisoncache.planned_inputs_version(snapshot.settings)
+    if name == "day":
+        return uae_today()
+    raise KeyError(f"Unknown alert input: {name}")
+
+
+class AlertRule:
+    def __init__(self, name, alert_type, source, inputs, match, thresholds=None, recipients=ADMINS_AND_DRIVER,
+                 cadence_minutes=10, active_hours=None, accept=None, enabled=True, rescan=False):
+        self.name = name
+        self.alert_type = alert_type
+        self.source = source
+        self.inputs = inputs
+        self.match = match
+        self.thresholds = thresholds or {}
+        self.recipients = recipients
+        self.cadence_minutes = cadence_minutes
+        self.active_hours = active_hours
+        self.accept = accept
+        self.enabled = enabled
+        self.rescan = rescan
+
+    def is_active(self, now):
+        if self.active_hours is None:
+            return True
+        start_hour, end_hour = self.active_hours
+        return start_hour <= now.hour < end_hour
+
+
+ALERT_RULES = [
+    AlertRule(
+        "idle", "IDLE", "exidlereport", ["exidlereport"], match_idle,
+        thresholds={"idle_minutes": 20}
+    ),
+    AlertRule(
+        "driver_performance", "VIOLATION", "driverperformance", ["driverperformance"], match_violation,
+        thresholds={"violations": 12},
+        accept=accept_violation
+    ),
+    AlertRule(
+        "route_deviation", "ROUTE_DEVIATION", "comparison", ["travelreport", "planned_routes", "day"],
+        match_route_deviation,
+        thresholds={"max_deviation_m": 4000},
+        recipients=ADMINS,
+        accept=accept_route_deviation
+    ),
+    AlertRule(
+        "early_return", "EARLY_RETURN", "geofence", ["geofence", "driverperformance"], match_early_return,
+        thresholds={"office_geofence": "Oxy Office"},
+        recipients=ADMINS,
+        active_hours=(9, 16),
+        rescan=True
+    ),
+    AlertRule(
+        "unauthorized_geofence", "UNAUTHORIZED_GEOFENCE", "geofence", ["geofence"], match_unauthorized_geofence,
+        thresholds={"authorized_geofences": ['Oxy Office', 'Staff Accomodation']}
+    ),
+    AlertRule(
+        "overspeed", "OVERSPEED", "driverperformance", ["driverperformance"], match_overspeed,
+        thresholds={"max_speed_kmh": 120},
+        enabled=False
+    ),
+    AlertRule(
+        "after_hours_movement", "AFTER_HOURS_MOVEMENT", "positions", ["travelreport"], match_after_hours_movement,
+        thresholds={"after_hour": 19, "min_speed_kmh": 10},
+        recipients=ADMINS,
+        cadence_minutes=30,
+        enabled=False
+    )
+]
+
+
+def select_recipients(policy, phone_numbers, vehicle_id):
+    for contact in phone_numbers['phone_numbers']:
+        if not contact.get('alerts', False):
+            continue
+        if contact['category'] == 'Admin':
+            yield contact
+        elif policy == ADMINS_AND_DRIVER and contact['category'] == 'Driver' and contact.get('vehicle_id') == vehicle_id:
+            yield contact
+
+
+class AlertEngine:
+    def __init__(self, deliver, rules=None):
+        self.deliver = deliver
+        self.rules = rules if rules is not None else ALERT_RULES
+        self._last_versions = {}
+        self._last_run = {}
+
+    def due_rules(self, snapshot, now, sources=None):
+        due = []
+        for rule in self.rules:
+            if not rule.enabled or not rule.is_active(now):
+                continue
+            # Rules that also read other reports rescan their full source, since a row skipped for
+            # missing inputs is already behind the change-set watermark.
+            if sources is not None and rule.source not in sources and not rule.rescan:
+                continue
+            last_run = self._last_run.get(rule.name)
+            cadence = timedelta(minutes=rule.cadence_minutes) - timedelta(seconds=CADENCE_SLACK_SECONDS)
+            if last_run is not None and now - last_run < cadence:
+                continue
+            versions = tuple(input_version(name, snapshot) for name in rule.inputs)
+            if self._last_versions.get(rule.name) == versions:
+                continue
+            due.append((rule, versions))
+        return due
+
+    def dispatch(self, rule, candidate, snapshot):
+        vehicle_id = candidate["vehicle_id"]
+        key_data = candidate.get("key_data")
+
+        if not alertstore.claim_dedup_key(generate_alert_hash(rule.alert_type, vehicle_id, key_data)):
+            return False
+        alert_key = generate_alert_key(rule.alert_type, vehicle_id, key_data)
+        if alertstore.was_sent_recently(alert_key):
+            return False
+        if rule.accept is not None and not rule.accept(candidate, rule):
+            return False
+
+        message = candidate["message"]()
+        alert_sent = False
+        for contact in select_recipients(rule.recipients, snapshot.phone_numbers, vehicle_id):
+            if self.deliver(contact, message, rule.alert_type, vehicle_id, candidate.get("driver_name")):
+                alert_sent = True
+
+        if alert_sent:
+            alertstore.mark_sent(alert_key)
+        return alert_sent
+
+    def run_cycle(self, snapshot, now=None, sources=None):
+        now = now or datetime.now()
+        return self._evaluate(snapshot, self.due_rules(snapshot, now, sources), now)
+
+    def run_changes(self, snapshot, now=None):
+        now = now or datetime.now()
+        due = [
+            (rule, None) for rule in self.rules
+            if rule.enabled and rule.is_active(now) and rule.source in (snapshot.change_files or {})
+        ]
+        return self._evaluate(snapshot, due, now)
+
+    def _evaluate(self, snapshot, due, now):
+        results = {}
+        by_source = {}
+        for rule, versions in due:
+            by_source.setdefault(rule.source, []).append((rule, versions))
+
+        for source, rules in by_source.items():
+            try:
+                rows = SOURCES[source](snapshot)
+            except Exception as e:
+                print(f"[alertrules] Failed to load {source}: {e}")
+                for rule, _ in rules:
+                    results[rule.name] = False
+                continue
+
+            sent = {rule.name: 0 for rule, _ in rules}
+            failed = set()
+            for row in rows:
+                for rule, _ in rules:
+                    if rule.name in failed:
+                        continue
+                    try:
+                        candidate = rule.match(row, rule, snapshot)
+                        if candidate is not None and self.dispatch(rule, candidate, snapshot):
+                            sent[rule.name] += 1
+                    except Exception as e:
+                        print(f"[alertrules] Rule {rule.name} failed: {e}")
+                        failed.add(rule.name)
+
+            for rule, versions in rules:
+                if rule.name in failed:
+                    results[rule.name] = False
+                    continue
+                if versions is not None:
+                    self._last_versions[rule.name] = versions
+                    self._last_run[rule.name] = now
+                results[rule.name] = sent[rule.name]
+
+        return results
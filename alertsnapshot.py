@@ -0,0 +1,226 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import storage
+from utils import load_settings, load_vehicle_aliases, load_phone_numbers
+
+TRAVEL_REPORT_PATH = "data/travelreport/current.csv"
+LOCATION_COLUMNS = ['Vehicle No', 'DateTime', 'Status', 'Speed', 'Latitude', 'Longitude', 'Address']
+
+ALERT_REPORTS = {
+    "exidlereport": {
+        "path": "data/exidlereport/current.csv",
+        "vehicle_column": "Vehicle Number",
+        "date_column": "Idle From",
+        "dtype": {
+            'Vehicle Number': str,
+            'Vehicle Model': str,
+            'Driver': str,
+            'Location': str
+        },
+        "parse_dates": ['Idle From', 'Idle Till'],
+        "timedeltas": ['Duration']
+    },
+    "geofence": {
+        "path": "data/geofence/current.csv",
+        "vehicle_column": "Vehicle No",
+        "date_column": "In Time",
+        "dtype": {
+            'Vehicle No': str,
+            'Driver': str,
+            'Geofence': str,
+            'Type': str,
+            'Elapsed Time Inside The Geofence': str
+        },
+        "parse_dates": ['In Time', 'Out Time'],
+        "timedeltas": []
+    },
+    "driverperformance": {
+        "path": "data/driverperformance/current.csv",
+        "vehicle_column": "No of Vehicles",
+        "date_column": "Login Time",
+        "dtype": {
+            'Driver': str,
+            'No of Vehicles': str,
+            'KM': float,
+            'Harsh Break': 'Int64',
+            'Harsh Acceleration': 'Int64',
+            'Over Speed': 'Int64',
+            'Max Speed': 'Int64',
+            'Exceed Road Speed': str
+        },
+        "parse_dates": ['Login Time', 'Logout Time'],
+        "timedeltas": []
+    }
+}
+
+
+def uae_today():
+    return (datetime.now(timezone.utc) + timedelta(hours=4)).strftime('%Y-%m-%d')
+
+
+def _read_alert_report(name, path=None):
+    spec = ALERT_REPORTS[name]
+    path = path or spec["path"]
+    if not os.path.exists(path):
+        return pd.DataFrame()
+
+    df = pd.read_csv(path, dtype=spec["dtype"], parse_dates=spec["parse_dates"])
+    for col in spec["timedeltas"]:
+        if col in df.columns:
+            df[col] = pd.to_timedelta(df[col], errors='coerce')
+    return df
+
+
+def _latest_travel_rows():
+    if storage.has_report("travelreport"):
+        catalog = storage.load_catalog("travelreport")
+        latest_day = {}
+        for entry in catalog["partitions"].values():
+            if entry["day"] > latest_day.get(entry["vehicle"], ""):
+                latest_day[entry["vehicle"]] = entry["day"]
+
+        vehicles_by_day = {}
+        for vehicle, day in latest_day.items():
+            vehicles_by_day.setdefault(day, []).append(vehicle)
+
+        frames = [
+            storage.read_report(
+                "travelreport",
+                vehicle_ids=vehicles,
+                t_start=f"{day} 00:00:00",
+                t_end=f"{day} 23:59:59",
+                columns=LOCATION_COLUMNS
+            )
+            for day, vehicles in vehicles_by_day.items()
+        ]
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            return pd.concat(frames, ignore_index=True), len(frames)
+        return pd.DataFrame(columns=LOCATION_COLUMNS), len(vehicles_by_day)
+
+    if not os.path.exists(TRAVEL_REPORT_PATH):
+        return pd.DataFrame(columns=LOCATION_COLUMNS), 0
+
+    df = pd.read_csv(TRAVEL_REPORT_PATH, usecols=LOCATION_COLUMNS, dtype={
+        'Vehicle No': str,
+        'Status': str,
+        'Address': str,
+        'Speed': float,
+        'Latitude': float,
+        'Longitude': float
+    }, parse_dates=['DateTime'])
+    return df, 1
+
+
+class AlertCycleSnapshot:
+    def __init__(self, change_files=None):
+        self.created_at = datetime.now()
+        self.reads = 0
+        self.change_files = change_files
+        self._changes = {}
+        self._reports = {}
+        self._rows_by_vehicle = {}
+        self._latest_positions = None
+        self._settings = None
+        self._vehicle_aliases = None
+        self._phone_numbers = None
+
+    def report(self, name):
+        if name not in self._reports:
+            try:
+                self._reports[name] = _read_alert_report(name)
+            except Exception as e:
+                print(f"[alertsnapshot] Failed to load {name}: {e}")
+                self._reports[name] = pd.DataFrame()
+            self.reads += 1
+        return self._reports[name]
+
+    def changed_rows(self, name):
+        if name not in self._changes:
+            frames = []
+            for path in (self.change_files or {}).get(name, []):
+                try:
+                    frames.append(_read_alert_report(name, path))
+                except Exception as e:
+                    print(f"[alertsnapshot] Failed to load change set {path}: {e}")
+                self.reads += 1
+            frames = [f for f in frames if not f.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            date_column = ALERT_REPORTS[name]["date_column"]
+            if not df.empty and date_column in df.columns:
+                days = pd.to_datetime(df[date_column], errors='coerce').dt.strftime('%Y-%m-%d')
+                df = df[days == uae_today()].reset_index(drop=True)
+            self._changes[name] = df
+        return self._changes[name]
+
+    def source_frame(self, name):
+        if self.change_files is not None:
+            return self.changed_rows(name)
+        return self.report(name)
+
+    def rows_for_vehicle(self, name, vehicle_id):
+        if name not in self._rows_by_vehicle:
+            df = self.report(name)
+            column = ALERT_REPORTS[name]["vehicle_column"]
+            if df.empty or column not in df.columns:
+                self._rows_by_vehicle[name] = {}
+            else:
+                self._rows_by_vehicle[name] = {
+                    str(vehicle): rows for vehicle, rows in df.groupby(column, sort=False)
+                }
+        rows = self._rows_by_vehicle[name].get(str(vehicle_id))
+        return rows if rows is not None else self.report(name).iloc[0:0]
+
+    def latest_positions(self):
+        if self._latest_positions is None:
+            self._latest_positions = {}
+            try:
+                df, reads = _latest_travel_rows()
+                self.reads += reads
+                if not df.empty:
+                    df = df.dropna(subset=['Vehicle No', 'DateTime'])
+                    latest = df.sort_values('DateTime', kind='stable').groupby('Vehicle No', sort=False).tail(1)
+                    for row in latest.reindex(columns=LOCATION_COLUMNS).to_dict('records'):
+                        self._latest_positions[str(row['Vehicle No'])] = {
+                            'latitude': row['Latitude'],
+                            'longitude': row['Longitude'],
+                            'address': row['Address'],
+                            'time': row['DateTime'],
+                            'status': row['Status'],
+                            'speed': row['Speed']
+                        }
+            except Exception as e:
+                print(f"[alertsnapshot] Failed to index vehicle positions: {e}")
+        return self._latest_positions
+
+    def vehicle_location(self, vehicle_id):
+        location = self.latest_positions().get(str(vehicle_id))
+        return dict(location) if location else None
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = load_settings()
+            self.reads += 1
+        return self._settings
+
+    @property
+    def vehicle_aliases(self):
+        if self._vehicle_aliases is None:
+            self._vehicle_aliases = load_vehicle_aliases()
+            self.reads += 1
+        return self._vehicle_aliases
+
+    @property
+    def phone_numbers(self):
+        if self._phone_numbers is None:
+            self._phone_numbers = load_phone_numbers()
+            self.reads += 1
+        return self._phone_numbers
+
+    def summary(self):
+        elapsed = (datetime.now() - self.created_at).total_seconds()
+        return f"{self.reads} file reads, {elapsed:.1f}s"
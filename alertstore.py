@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+ALERT_DB_PATH = "alerts/alerts.db"
+ALERT_CACHE_PATH = "alerts/alert_cache.json"
+SENT_ALERTS_PATH = "alerts/sent_alerts.json"
+ALERT_LOGS_PATH = "alerts/alert_logs.json"
+
+DEDUP_TTL_SECONDS = 3600
+SENT_ALERT_WINDOW_SECONDS = 3600
+SENT_ALERT_RETENTION_SECONDS = 86400
+ALERT_LOG_RETENTION_DAYS = 7
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_dedup (
+    key TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alert_dedup_expires ON alert_dedup (expires_at);
+
+CREATE TABLE IF NOT EXISTS sent_alerts (
+    key TEXT PRIMARY KEY,
+    sent_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sent_alerts_sent_at ON sent_alerts (sent_at);
+
+CREATE TABLE IF NOT EXISTS alert_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    alert_type TEXT,
+    recipient_phone TEXT,
+    recipient_name TEXT,
+    message TEXT,
+    vehicle_id TEXT,
+    driver_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alert_log_day_vehicle ON alert_log (day, vehicle_id);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+LOG_COLUMNS = ["timestamp", "alert_type", "recipient_phone", "recipient_name", "message", "vehicle_id", "driver_name"]
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def connect(db_path=ALERT_DB_PATH):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is not None:
+        return conn
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    with _init_lock:
+        if db_path not in _initialized:
+            conn.executescript(SCHEMA)
+            _initialized.add(db_path)
+
+    connections[db_path] = conn
+    return conn
+
+
+def _now():
+    return datetime.now()
+
+
+def has_store(db_path=ALERT_DB_PATH):
+    return os.path.exists(db_path)
+
+
+def claim_dedup_key(key, now=None, db_path=ALERT_DB_PATH):
+    now = now or _now()
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    bucket = hour_start.strftime('%Y-%m-%d-%H')
+    expires_at = (hour_start + timedelta(seconds=DEDUP_TTL_SECONDS)).strftime(TIME_FORMAT)
+
+    conn = connect(db_path)
+    with conn:
+        conn.execute("DELETE FROM alert_dedup WHERE expires_at < ?", (now.strftime(TIME_FORMAT),))
+        cursor = conn.execute(
+            "INSERT INTO alert_dedup (key, bucket, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET bucket = excluded.bucket, expires_at = excluded.expires_at "
+            "WHERE alert_dedup.bucket != excluded.bucket",
+            (key, bucket, expires_at)
+        )
+    return cursor.rowcount > 0
+
+
+def was_sent_recently(key, now=None, window_seconds=SENT_ALERT_WINDOW_SECONDS, db_path=ALERT_DB_PATH):
+    now = now or _now()
+    since = (now - timedelta(seconds=window_seconds)).strftime(TIME_FORMAT)
+    row = connect(db_path).execute(
+        "SELECT 1 FROM sent_alerts WHERE key = ? AND sent_at > ?", (key, since)
+    ).fetchone()
+    return row is not None
+
+
+def mark_sent(key, now=None, db_path=ALERT_DB_PATH):
+    now = now or _now()
+    expired = (now - timedelta(seconds=SENT_ALERT_RETENTION_SECONDS)).strftime(TIME_FORMAT)
+    conn = connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO sent_alerts (key, sent_at) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET sent_at = excluded.sent_at",
+            (key, now.strftime(TIME_FORMAT))
+        )
+        conn.execute("DELETE FROM sent_alerts WHERE sent_at < ?", (expired,))
+
+
+def log_alert(alert_type, recipient_phone, recipient_name, message, vehicle_id=None, driver_name=None,
+              now=None, db_path=ALERT_DB_PATH):
+    now = now or _now()
+    conn = connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO alert_log (day, timestamp, alert_type, recipient_phone, recipient_name, message, "
+            "vehicle_id, driver_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (now.strftime('%Y-%m-%d'), now.strftime(TIME_FORMAT), alert_type, recipient_phone, recipient_name,
+             message, None if vehicle_id is None else str(vehicle_id), driver_name)
+        )
+
+
+def query_alert_logs(start_day, end_day, vehicle_ids=None, driver_names=None, alert_types=None,
+                     db_path=ALERT_DB_PATH):
+    sql = "SELECT day, " + ", ".join(LOG_COLUMNS) + " FROM alert_log WHERE day BETWEEN ? AND ?"
+    params = [str(start_day)[:10], str(end_day)[:10]]
+
+    if vehicle_ids:
+        vehicle_ids = [str(v) for v in vehicle_ids]
+        sql += f" AND (vehicle_id IS NULL OR vehicle_id = '' OR vehicle_id IN ({','.join('?' * len(vehicle_ids))}))"
+        params.extend(vehicle_ids)
+    if driver_names:
+        sql += f" AND (driver_name IS NULL OR driver_name = '' OR driver_name IN ({','.join('?' * len(driver_names))}))"
+        params.extend(driver_names)
+    if alert_types:
+        sql += f" AND alert_type IN ({','.join('?' * len(alert_types))})"
+        params.extend(alert_types)
+    sql += " ORDER BY day, id"
+
+    logs = {}
+    for row in connect(db_path).execute(sql, params):
+        logs.setdefault(row["day"], []).append({col: row[col] for col in LOG_COLUMNS})
+    return logs
+
+
+def clear_old_entries(retention_days=ALERT_LOG_RETENTION_DAYS, now=None, db_path=ALERT_DB_PATH):
+    now = now or _now()
+    cutoff = (now - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    conn = connect(db_path)
+    with conn:
+        removed = conn.execute("DELETE FROM alert_log WHERE day < ?", (cutoff,)).rowcount
+        conn.execute("DELETE FROM sent_alerts")
+        conn.execute("DELETE FROM alert_dedup")
+        conn.execute(
+            "INSERT INTO store_meta (key, value) VALUES ('last_cleared', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (now.strftime('%Y-%m-%d'),)
+        )
+    return removed
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def import_json_files(cache_path=ALERT_CACHE_PATH, sent_path=SENT_ALERTS_PATH, logs_path=ALERT_LOGS_PATH,
+                      db_path=ALERT_DB_PATH):
+    conn = connect(db_path)
+    if conn.execute("SELECT 1 FROM store_meta WHERE key = 'json_imported'").fetchone():
+        return False
+
+    dedup_rows = []
+    for key, bucket in _load_json(cache_path, {}).items():
+        try:
+            hour_start = datetime.strptime(bucket, '%Y-%m-%d-%H')
+        except (TypeError, ValueError):
+            continue
+        expires_at = (hour_start + timedelta(seconds=DEDUP_TTL_SECONDS)).strftime(TIME_FORMAT)
+        dedup_rows.append((key, bucket, expires_at))
+
+    sent_rows = []
+    for key, sent_at in _load_json(sent_path, {}).items():
+        try:
+            datetime.strptime(sent_at, TIME_FORMAT)
+        except (TypeError, ValueError):
+            continue
+        sent_rows.append((key, sent_at))
+
+    log_rows = []
+    for day, entries in _load_json(logs_path, {}).get("daily_logs", {}).items():
+        for entry in entries:
+            vehicle_id = entry.get("vehicle_id")
+            log_rows.append((
+                day,
+                entry.get("timestamp") or f"{day} 00:00:00",
+                entry.get("alert_type"),
+                entry.get("recipient_phone"),
+                entry.get("recipient_name"),
+                entry.get("message"),
+                None if vehicle_id is None else str(vehicle_id),
+                entry.get("driver_name")
+            ))
+
+    with conn:
+        claimed = conn.execute(
+            "INSERT OR IGNORE INTO store_meta (key, value) VALUES ('json_imported', ?)",
+            (_now().strftime(TIME_FORMAT),)
+        ).rowcount
+        if not claimed:
+            return False
+        conn.executemany("INSERT OR IGNORE INTO alert_dedup (key, bucket, expires_at) VALUES (?, ?, ?)", dedup_rows)
+        conn.executemany("INSERT OR IGNORE INTO sent_alerts (key, sent_at) VALUES (?, ?)", sent_rows)
+        conn.executemany(
+            "INSERT INTO alert_log (day, timestamp, alert_type, recipient_phone, recipient_name, message, "
+            "vehicle_id, driver_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            log_rows
+        )
+
+    print(f"[alertstore] Imported {len(dedup_rows)} dedup keys, {len(sent_rows)} sent alerts, "
+          f"{len(log_rows)} log entries from JSON")
+    return True
+
+
+def store_stats(db_path=ALERT_DB_PATH):
+    conn = connect(db_path)
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("alert_dedup", "sent_alerts", "alert_log")
+    }
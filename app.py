@@ -1,7 +1,8 @@
 from flask import Flask, render_template, request, jsonify,send_file
-from flask import session,redirect, url_for, flash,Response
+from flask import session,redirect, url_for, flash,Response,make_response
 import pandas as pd
 import os
+from datetime import datetime
 import google.generativeai as genai
 import requests
 import traceback
@@ -17,6 +18,12 @@ from werkzeug.utils import secure_filename
 from flask import Response
 import pandas as pd
 load_dotenv()
+import alertstore
+import jobscheduler
+import mapcache
+import mapdata
+import routing
+from comparisoncache import file_version
 from utils import (
     rag_system,
     _geolocator,
@@ -414,21 +421,7 @@ def weekly_customers():
     customer_cache_point = f'{CUSTOMER_POINTS_DIR}/cust_{int(segment_areas)}_min{min_duration}_stop{min_stop_count}_points.csv'
     customer_cache_paths = f'{ROUTES_JSON_DIR}/path_{int(segment_areas)}_min{min_duration}_stop{min_stop_count}_routes.geojson'
     
-    if os.path.exists(customer_cache_point):
-        current_processed = pd.read_csv(customer_cache_point,
-            dtype = {
-                'Vehicle No':str,
-                'GeoCluster':int,
-                'Weekday':str,
-                'Address':str,
-                'StopCount':int,
-                'Latitude':float,
-                'Longitude':float
-            },
-            parse_dates = ['FirstVisit','LastVisit']
-        )
-        print('points_found_from_cache')
-    else:
+    if not os.path.exists(customer_cache_point):
         current_processed = process_customer_data(min_duration, min_stop_count, segment_areas)
         current_processed.to_csv(customer_cache_point, index=False)
     
@@ -442,99 +435,150 @@ def weekly_customers():
     
     csv_path_current = load_settings().get("csv_path_current", "")
     csv_path_past = load_settings().get("csv_path_past", "")
+    stop_date_value = stop_date if show_stop_points and stop_date else None
+    stop_csv_path = get_appropriate_csv_path(stop_date_value, csv_path_current, csv_path_past) if stop_date_value else None
+
+    cache_key = mapcache.request_key(
+        "weekly_customers",
+        {
+            "min_duration": min_duration,
+            "min_stop_count": min_stop_count,
+            "vehicles": selected_vehicles,
+            "weekdays": selected_weekdays,
+            "segment_areas": segment_areas,
+            "assign_paths": assign_paths,
+            "force_assign_path": force_assign_path,
+            "make_edits": make_edits,
+            "stop_date": stop_date,
+            "show_stop_points": show_stop_points,
+            "show_confirmed_customers": show_confirmed_customers
+        },
+        {
+            **mapcache.shared_inputs(),
+            "points": file_version(customer_cache_point),
+            "routes": file_version(customer_cache_paths) if customer_cache_paths else None,
+            "stops": mapcache.travel_inputs(stop_csv_path, selected_vehicles, stop_date_value),
+            "whatsapp": [
+                file_version(os.path.join('whatsappbot', name)) for name in ('contact_status.csv', 'extracted_data.csv')
+            ] if show_confirmed_customers else None,
+            "template": file_version(os.path.join(app.template_folder, "weekly_customers.html"))
+        }
+    )
+    etag = mapcache.etag_for(cache_key)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+
+    def build_weekly_map():
+        current_processed = pd.read_csv(customer_cache_point,
+            dtype = {
+                'Vehicle No':str,
+                'GeoCluster':int,
+                'Weekday':str,
+                'Address':str,
+                'StopCount':int,
+                'Latitude':float,
+                'Longitude':float
+            },
+            parse_dates = ['FirstVisit','LastVisit']
+        )
 
-    whatsapp_customers = []
-    whatsapp_stats = {
-        'total_customers': 0,
-        'completed_customers': 0,
-        'pending_customers': 0
-    }
+        whatsapp_customers = []
+        whatsapp_stats = {
+            'total_customers': 0,
+            'completed_customers': 0,
+            'pending_customers': 0
+        }
     
-    if show_confirmed_customers:
-        print("show_confirmed_customers enabled")
-        whatsapp_customers, whatsapp_stats = load_whatsapp_customer_data()
-
-    map_obj, vehicle_colors = create_map(
-        selected_vehicles, 
-        selected_weekdays, 
-        assign_paths_addr=customer_cache_paths,
-        customer_points=customer_cache_point,
-        date=stop_date if show_stop_points and stop_date else None,
-        csv_path_current=csv_path_current,
-        csv_path_past=csv_path_past,
-    )
-    print(f"WHATSAPP CUSTOMERS LOOK LIKE: {whatsapp_customers}")
-    for customer in whatsapp_customers:
-        print(f"Assigning customer to map{customer}")
-        whatsapp_icon = folium.DivIcon(
-            html=f'''
-            <div style="
-                background: linear-gradient(45deg, #25D366, #128C7E);
-                width: 20px;
-                height: 20px;
-                border-radius: 50%;
-                border: 3px solid white;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.3);
-            ">
-                <i class="fab fa-whatsapp" style="color: white; font-size: 10px;"></i>
-            </div>
-            ''',
-            icon_size=(26, 26),
-            icon_anchor=(13, 13)
+        if show_confirmed_customers:
+            print("show_confirmed_customers enabled")
+            whatsapp_customers, whatsapp_stats = load_whatsapp_customer_data()
+
+        map_obj, vehicle_colors = create_map(
+            selected_vehicles, 
+            selected_weekdays, 
+            assign_paths_addr=customer_cache_paths,
+            customer_points=customer_cache_point,
+            date=stop_date_value,
+            csv_path_current=csv_path_current,
+            csv_path_past=csv_path_past,
         )
+        print(f"WHATSAPP CUSTOMERS LOOK LIKE: {whatsapp_customers}")
+        for customer in whatsapp_customers:
+            print(f"Assigning customer to map{customer}")
+            whatsapp_icon = folium.DivIcon(
+                html=f'''
+                <div style="
+                    background: linear-gradient(45deg, #25D366, #128C7E);
+                    width: 20px;
+                    height: 20px;
+                    border-radius: 50%;
+                    border: 3px solid white;
+                    display: flex;
+                    align-items: center;
+                    justify-content: center;
+                    box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+                ">
+                    <i class="fab fa-whatsapp" style="color: white; font-size: 10px;"></i>
+                </div>
+                ''',
+                icon_size=(26, 26),
+                icon_anchor=(13, 13)
+            )
+
+            popup_html = f'''
+            <div style="font-family: Arial; font-size: 12px; min-width: 250px;">
+                <h4 style="margin: 0 0 10px 0; color: #25D366;">
+                    <i class="fab fa-whatsapp"></i> WhatsApp Customer
+                </h4>
+                <b>Name:</b> {customer['customer_name']}<br>
+                <b>Contact:</b> {customer['contact']}<br>
+                <b>Day:</b> {customer['weekday']}<br>
+                <b>Location Received:</b> {customer['location_received_at']}<br>
+                <b>Coordinates:</b> {customer['latitude']:.6f}, {customer['longitude']:.6f}<br>
+                <b>Map Views:</b><br>
+                <a href="https://www.google.com/maps?q={customer['latitude']:.6f},{customer['longitude']:.6f}" target="_blank">🗺️ View Location on 2D Map</a><br>
+                <a href="https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={customer['latitude']:.6f},{customer['longitude']:.6f}" target="_blank">🌐 Explore in Street View (Geolocator)</a><br>
+                <b>Address:</b> {customer['location_description'] or 'WhatsApp Location'}<br>
+                <b>Source:</b> OxyPlus WhatsApp Bot<br>
+            </div>
+            '''
+        
+            folium.Marker(
+                location=[customer['latitude'], customer['longitude']],
+                popup=folium.Popup(popup_html, max_width=350),
+                tooltip=f"{customer['customer_name']} - WhatsApp - {customer['weekday']}",
+                icon=whatsapp_icon
+            ).add_to(map_obj)
+        map_html = map_obj.get_root().render()
+        vehicles = sorted(current_processed['Vehicle No'].astype(str).unique()) if not current_processed.empty else []
+        total_points = len(current_processed)
+        total_vehicles = len(vehicles)
+        total_clusters = len(current_processed['GeoCluster'].unique()) if not current_processed.empty else 0
+        avg_stops = round(current_processed['StopCount'].mean()) if not current_processed.empty else 0
+
+        if show_confirmed_customers:
+            total_points += whatsapp_stats['completed_customers']
+    
+        return {
+            "vehicles": vehicles,
+            "map_html": map_html,
+            "vehicle_colors": vehicle_colors,
+            "total_points": total_points,
+            "total_vehicles": total_vehicles,
+            "total_clusters": total_clusters,
+            "avg_stops": avg_stops,
+            "whatsapp_stats": whatsapp_stats
+        }
 
-        popup_html = f'''
-        <div style="font-family: Arial; font-size: 12px; min-width: 250px;">
-            <h4 style="margin: 0 0 10px 0; color: #25D366;">
-                <i class="fab fa-whatsapp"></i> WhatsApp Customer
-            </h4>
-            <b>Name:</b> {customer['customer_name']}<br>
-            <b>Contact:</b> {customer['contact']}<br>
-            <b>Day:</b> {customer['weekday']}<br>
-            <b>Location Received:</b> {customer['location_received_at']}<br>
-            <b>Coordinates:</b> {customer['latitude']:.6f}, {customer['longitude']:.6f}<br>
-            <b>Map Views:</b><br>
-            <a href="https://www.google.com/maps?q={customer['latitude']:.6f},{customer['longitude']:.6f}" target="_blank">🗺️ View Location on 2D Map</a><br>
-            <a href="https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={customer['latitude']:.6f},{customer['longitude']:.6f}" target="_blank">🌐 Explore in Street View (Geolocator)</a><br>
-            <b>Address:</b> {customer['location_description'] or 'WhatsApp Location'}<br>
-            <b>Source:</b> OxyPlus WhatsApp Bot<br>
-        </div>
-        '''
-        
-        folium.Marker(
-            location=[customer['latitude'], customer['longitude']],
-            popup=folium.Popup(popup_html, max_width=350),
-            tooltip=f"{customer['customer_name']} - WhatsApp - {customer['weekday']}",
-            icon=whatsapp_icon
-        ).add_to(map_obj)
-    map_html = map_obj.get_root().render()
-    vehicles = sorted(current_processed['Vehicle No'].astype(str).unique()) if not current_processed.empty else []
-    weekdays = ['Saturday','Sunday','Monday','Tuesday','Wednesday','Thursday','Friday']
-    total_points = len(current_processed)
-    total_vehicles = len(vehicles)
-    total_clusters = len(current_processed['GeoCluster'].unique()) if not current_processed.empty else 0
-    avg_stops = round(current_processed['StopCount'].mean()) if not current_processed.empty else 0
-
-    if show_confirmed_customers:
-        total_points += whatsapp_stats['completed_customers']
+    context = mapcache.map_cache.get_or_build(cache_key, build_weekly_map)
     
-    return render_template(
+    response = make_response(render_template(
         "weekly_customers.html",
-        vehicles=vehicles,
-        weekdays=weekdays,
+        weekdays=['Saturday','Sunday','Monday','Tuesday','Wednesday','Thursday','Friday'],
         selected_vehicles=selected_vehicles,
         selected_weekdays=selected_weekdays,
-        map_html=map_html,
-        vehicle_colors=vehicle_colors,
         min_duration=min_duration,
         min_stop_count=min_stop_count,
-        total_points=total_points,
-        total_vehicles=total_vehicles,
-        total_clusters=total_clusters,
-        avg_stops=avg_stops,
         segment_areas=segment_areas,
         assign_paths=assign_paths,
         force_assign_path=force_assign_path,
@@ -542,9 +586,12 @@ def weekly_customers():
         stop_date=stop_date,
         show_stop_points=show_stop_points,
         show_confirmed_customers=show_confirmed_customers,
-        whatsapp_stats=whatsapp_stats,
-        vehicle_aliases=load_vehicle_aliases()
-    )
+        vehicle_aliases=load_vehicle_aliases(),
+        **context
+    ))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 @app.route('/daily')
 @requires_auth
@@ -590,29 +637,62 @@ def api_compare_routes():
 
     csv_path_current = get_appropriate_csv_path(date_current, load_settings()["csv_path_current"], load_settings()["csv_path_past"])
     
-    map_html, comparison_data = generate_route_comparison(
-        vehicle_ids,
-        csv_path_current,
-        csv_path_past,
-        geojson_path,
-        date_current,
-        t_start_current,
-        t_end_current,
-        date_past,
-        t_start_past,
-        t_end_past,
-        generate_map = True
+    cache_key = mapcache.request_key(
+        "compare_routes",
+        {
+            "vehicle_ids": vehicle_ids,
+            "date_current": date_current,
+            "t_start_current": t_start_current,
+            "t_end_current": t_end_current,
+            "date_past": date_past,
+            "t_start_past": t_start_past,
+            "t_end_past": t_end_past,
+            "csv_path_current": csv_path_current,
+            "csv_path_past": csv_path_past
+        },
+        {
+            **mapcache.shared_inputs(),
+            "routes": file_version(geojson_path),
+            "points": file_version(load_settings().get("customer_points_path", "")),
+            "current": mapcache.travel_inputs(csv_path_current, vehicle_ids, date_current),
+            "past": mapcache.travel_inputs(csv_path_past, vehicle_ids, date_past),
+            "whatsapp": [
+                file_version(os.path.join('whatsappbot', name)) for name in ('contact_status.csv', 'extracted_data.csv')
+            ]
+        }
     )
-
-    return jsonify({
-        "success": True,
-        "map_html": map_html,
-        "comparison_data": comparison_data,
-        "time_ranges": {
-            "current": {"start": t_start_current, "end": t_end_current},
-            "past": {"start": t_start_past, "end": t_end_past} if date_past else None
+    etag = mapcache.etag_for(cache_key)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+
+    def build_comparison():
+        map_html, comparison_data = generate_route_comparison(
+            vehicle_ids,
+            csv_path_current,
+            csv_path_past,
+            geojson_path,
+            date_current,
+            t_start_current,
+            t_end_current,
+            date_past,
+            t_start_past,
+            t_end_past,
+            generate_map = True
+        )
+        return {
+            "success": True,
+            "map_html": map_html,
+            "comparison_data": comparison_data,
+            "time_ranges": {
+                "current": {"start": t_start_current, "end": t_end_current},
+                "past": {"start": t_start_past, "end": t_end_past} if date_past else None
+            }
         }
-    })
+
+    response = jsonify(mapcache.map_cache.get_or_build(cache_key, build_comparison))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 @app.route('/api/available-vehicles')
 @requires_auth
@@ -794,6 +874,127 @@ def api_get_customer_points():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/alerts', methods=['GET'])
+@requires_auth
+def api_alerts():
+    try:
+        today = datetime.now().strftime('%Y-%m-%d')
+        start_day = request.args.get('start', today)
+        end_day = request.args.get('end', start_day)
+        
+        logs = alertstore.query_alert_logs(
+            start_day,
+            end_day,
+            vehicle_ids=request.args.getlist('vehicles'),
+            driver_names=request.args.getlist('drivers'),
+            alert_types=request.args.getlist('types')
+        )
+        
+        return jsonify({
+            "success": True,
+            "alerts": logs,
+            "count": sum(len(entries) for entries in logs.values())
+        })
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/job-stats', methods=['GET'])
+@requires_auth
+def api_job_stats():
+    try:
+        days = request.args.get('days', 7, type=int)
+        bucket = request.args.get('bucket', 'day')
+        job = request.args.get('job')
+        
+        return jsonify({
+            "success": True,
+            "bucket": bucket,
+            "stats": jobscheduler.job_stats(days=days, bucket=bucket, job=job),
+            "recent": jobscheduler.recent_runs(limit=request.args.get('limit', 20, type=int), job=job)
+        })
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/map-data', methods=['GET'])
+@requires_auth
+def api_map_data():
+    try:
+        layers = [layer for value in request.args.getlist('layers') for layer in value.split(',') if layer]
+        layers = [layer for layer in layers if layer in mapdata.MAP_LAYERS] or list(mapdata.MAP_LAYERS)
+        vehicle_ids = [vid for value in request.args.getlist('vehicles') for vid in value.split(',') if vid]
+        weekdays = [day for value in request.args.getlist('weekdays') for day in value.split(',') if day]
+        date_val = request.args.get('date')
+        t_start = request.args.get('t_start')
+        t_end = request.args.get('t_end')
+        bbox = mapdata.parse_bbox(request.args.get('bbox'))
+        zoom = request.args.get('zoom', type=int)
+        output = request.args.get('format', 'geojson')
+        min_duration = request.args.get('min_duration', type=int)
+        min_stop_count = request.args.get('min_stop_count', type=int)
+        segment_areas = request.args.get('segment_areas') == 'on'
+        
+        if not vehicle_ids:
+            return jsonify({"success": False, "error": "At least one vehicle is required"}), 400
+        
+        points_path, routes_path = mapdata.map_sources(min_duration, min_stop_count, segment_areas)
+        csv_path = mapdata.travel_csv_path(date_val) if date_val else None
+        
+        cache_key = mapcache.request_key(
+            "map_data",
+            {
+                "layers": layers,
+                "vehicles": vehicle_ids,
+                "weekdays": weekdays,
+                "date": date_val,
+                "t_start": t_start,
+                "t_end": t_end,
+                "bbox": bbox,
+                "zoom": zoom,
+                "format": output,
+                "points_path": points_path,
+                "routes_path": routes_path,
+                "csv_path": csv_path
+            },
+            {
+                **mapcache.shared_inputs(),
+                "points": file_version(points_path),
+                "routes": file_version(routes_path),
+                "travel": mapcache.travel_inputs(csv_path, vehicle_ids, date_val)
+            }
+        )
+        etag = mapcache.etag_for(cache_key)
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"})
+        
+        data = mapcache.map_cache.get_or_build(cache_key, lambda: {
+            "success": True,
+            **mapdata.build_map_data(
+                layers, vehicle_ids, weekdays, date_val, t_start, t_end, bbox, zoom,
+                points_path=points_path, routes_path=routes_path, output=output
+            )
+        })
+        response = jsonify(data)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+        
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/map-cache', methods=['GET'])
+@requires_auth
+def api_map_cache():
+    return jsonify({"success": True, "stats": mapcache.map_cache.stats()})
+
+@app.route('/api/route-progress', methods=['GET'])
+@requires_auth
+def api_route_progress():
+    return jsonify({"success": True, "progress": routing.progress()})
+
 @app.route('/api/clear-all-edits', methods=['POST'])
 @requires_auth
 def api_clear_all_edits():
@@ -0,0 +1,260 @@
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from formatdata import classify_report_days, today_uae
+from stoppoints import detect_stop_points, _haversine_m
+from routemetrics import route_metrics
+
+
+def make_travel_export(rows=1_000_000, days=2, vehicles=200):
+    start = datetime.strptime(today_uae(), '%Y-%m-%d') - timedelta(days=days - 1)
+    offsets = np.sort(np.random.randint(0, days * 86400, size=rows))
+    times = pd.to_datetime(start) + pd.to_timedelta(offsets, unit='s')
+    return pd.DataFrame({
+        'Vehicle No': np.random.randint(30000, 30000 + vehicles, size=rows).astype(str),
+        'Status': np.random.choice(['Moving', 'Stopped', 'Idle'], size=rows),
+        'DateTime': times.strftime('%Y-%m-%d %H:%M:%S'),
+        'Speed': np.random.uniform(0, 120, size=rows).round(1),
+        'Latitude': np.random.uniform(25.0, 25.5, size=rows),
+        'Longitude': np.random.uniform(55.2, 55.6, size=rows)
+    })
+
+
+def legacy_is_today(date_formats):
+    today_str = datetime.strptime(today_uae(), '%Y-%m-%d').strftime('%d-%m-%Y')
+
+    def is_today(date_str):
+        for fmt in date_formats:
+            try:
+                dt = datetime.strptime(date_str.strip(), fmt)
+                return dt.strftime('%d-%m-%Y') == today_str
+            except:
+                continue
+        return False
+
+    return is_today
+
+
+def benchmark_day_classification(rows=1_000_000):
+    date_formats = ["%Y-%m-%d %H:%M:%S"]
+    df = make_travel_export(rows)
+    print(f"Travel export: {len(df)} rows")
+
+    start = time.perf_counter()
+    legacy_mask = df['DateTime'].apply(legacy_is_today(date_formats))
+    legacy_time = time.perf_counter() - start
+    print(f"apply(is_today):        {legacy_time:.2f}s")
+
+    start = time.perf_counter()
+    days = classify_report_days(df['DateTime'], date_formats)
+    vector_mask = days == today_uae()
+    vector_time = time.perf_counter() - start
+    print(f"classify_report_days:   {vector_time:.2f}s ({legacy_time / vector_time:.1f}x)")
+
+    print(f"Masks identical: {bool((legacy_mask.values == vector_mask.values).all())}")
+    print(days.value_counts().sort_index().to_string())
+
+
+def make_travel_day(vehicles=200, interval_seconds=10, seed=0):
+    rng = np.random.default_rng(seed)
+    day_start = pd.Timestamp(today_uae())
+    rows_per_vehicle = 86400 // interval_seconds
+    frames = []
+
+    for v in range(vehicles):
+        moving = np.repeat(rng.random(rows_per_vehicle // 30 + 1) < 0.6, 30)[:rows_per_vehicle]
+        steps = np.where(moving[:, None], rng.normal(0, 0.0008, (rows_per_vehicle, 2)),
+                         rng.normal(0, 0.00003, (rows_per_vehicle, 2)))
+        coords = np.array([25.3, 55.4]) + np.cumsum(steps, axis=0)
+        frames.append(pd.DataFrame({
+            'Vehicle No': str(30000 + v),
+            'Status': np.where(moving, 'Moving', rng.choice(['Stopped', 'Idle'], size=rows_per_vehicle)),
+            'DateTime': day_start + pd.to_timedelta(np.arange(rows_per_vehicle) * interval_seconds, unit='s'),
+            'Address': 'Synthetic',
+            'Latitude': coords[:, 0],
+            'Longitude': coords[:, 1]
+        }))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def legacy_stop_points(df, vehicle_ids):
+    df = df[df['Status'].isin(['Idle', 'Stopped'])]
+    stop_points = []
+
+    def close(group, vehicle_id):
+        if len(group) >= 2:
+            duration_minutes = (group[-1]['DateTime'] - group[0]['DateTime']).total_seconds() / 60
+            if duration_minutes >= 2:
+                stop_points.append({
+                    'Vehicle No': vehicle_id,
+                    'Latitude': sum(r['Latitude'] for r in group) / len(group),
+                    'Longitude': sum(r['Longitude'] for r in group) / len(group),
+                    'StartTime': group[0]['DateTime'],
+                    'EndTime': group[-1]['DateTime'],
+                    'DurationMinutes': round(duration_minutes, 1),
+                    'Status': group[0]['Status'],
+                    'Address': group[0]['Address']
+                })
+
+    for vehicle_id in vehicle_ids:
+        group, current_lat, current_lon = [], None, None
+        for _, row in df[df['Vehicle No'] == vehicle_id].sort_values('DateTime').iterrows():
+            if current_lat is not None and _haversine_m(current_lat, current_lon, row['Latitude'], row['Longitude']) <= 50:
+                group.append(row)
+                current_lat = sum(r['Latitude'] for r in group) / len(group)
+                current_lon = sum(r['Longitude'] for r in group) / len(group)
+            else:
+                if current_lat is not None:
+                    close(group, vehicle_id)
+                group, current_lat, current_lon = [row], row['Latitude'], row['Longitude']
+        close(group, vehicle_id)
+
+    return pd.DataFrame(stop_points)
+
+
+def benchmark_stop_points(vehicles=200, legacy_vehicles=10):
+    df = make_travel_day(vehicles)
+    vehicle_ids = df['Vehicle No'].unique().tolist()
+    print(f"Travel day: {len(df)} rows, {len(vehicle_ids)} vehicles")
+
+    start = time.perf_counter()
+    result = detect_stop_points(df, vehicle_ids)
+    engine_time = time.perf_counter() - start
+    print(f"detect_stop_points (all vehicles):     {engine_time:.2f}s, {len(result)} stops")
+
+    subset = vehicle_ids[:legacy_vehicles]
+    start = time.perf_counter()
+    legacy = legacy_stop_points(df, subset)
+    legacy_time = time.perf_counter() - start
+    print(f"legacy loop ({len(subset)} vehicles):            {legacy_time:.2f}s "
+          f"(~{legacy_time * len(vehicle_ids) / len(subset):.0f}s extrapolated)")
+
+    expected = result[result['Vehicle No'].isin(subset)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(legacy, expected, check_dtype=False)
+    print("Outputs identical on legacy subset")
+
+
+def legacy_route_metrics(actual_coords, planned_coords, tolerance_m=500):
+    from pyproj import Transformer
+    from scipy.spatial.distance import directed_hausdorff
+    from shapely.geometry import LineString, Point
+
+    def overlap(ref_path, target_path):
+        ref_line = LineString(ref_path)
+        count = sum(1 for lon, lat in target_path if ref_line.distance(Point(lon, lat)) * 111320 <= tolerance_m)
+        return count / len(target_path) * 100
+
+    project = Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True).transform
+    A = np.array([project(lon, lat) for lon, lat in actual_coords])
+    B = np.array([project(lon, lat) for lon, lat in planned_coords])
+    hausdorff = min(directed_hausdorff(A, B)[0], directed_hausdorff(B, A)[0])
+    return hausdorff, overlap(actual_coords, planned_coords), overlap(planned_coords, actual_coords)
+
+
+def benchmark_route_metrics(vehicles=50):
+    day = make_travel_day(vehicles)
+    rng = np.random.default_rng(1)
+    legacy_time = engine_time = 0.0
+
+    for vehicle, rows in day.groupby('Vehicle No'):
+        actual = rows[['Longitude', 'Latitude']].to_numpy()
+        planned = actual[::50] + rng.normal(0, 0.002, (len(actual[::50]), 2))
+
+        start = time.perf_counter()
+        legacy = legacy_route_metrics(actual.tolist(), planned.tolist())
+        legacy_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        metrics = route_metrics(actual, planned)
+        engine_time += time.perf_counter() - start
+
+    print(f"Routes: {vehicles} vehicles x {len(actual)} actual points, {len(planned)} planned points")
+    print(f"legacy overlap/Hausdorff: {legacy_time:.2f}s ({legacy_time / vehicles * 1000:.0f} ms/vehicle)")
+    print(f"route_metrics:            {engine_time:.2f}s ({engine_time / vehicles * 1000:.1f} ms/vehicle)")
+    print(f"last vehicle legacy (hausdorff, coverage, alignment): {tuple(round(v, 1) for v in legacy)}")
+    print(f"last vehicle metrics (hausdorff, coverage, alignment): "
+          f"{round(metrics['hausdorff'], 1), round(metrics['coverage'], 1), round(metrics['alignment'], 1)}")
+
+
+def make_customer_points(rows=4600, vehicles=12, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Vehicle No': rng.integers(30000, 30000 + vehicles, size=rows).astype(str),
+        'GeoCluster': np.arange(rows),
+        'Weekday': rng.choice(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'], size=rows),
+        'Address': 'Dubai - United Arab Emirates',
+        'StopCount': rng.integers(1, 20, size=rows),
+        'Latitude': rng.uniform(25.0, 25.5, size=rows),
+        'Longitude': rng.uniform(55.2, 55.6, size=rows),
+        'FirstVisit': pd.Timestamp('2025-06-01'),
+        'LastVisit': pd.Timestamp('2025-07-01'),
+        'customer_id': None
+    })
+
+
+def benchmark_customer_map(sizes=(500, 2000, 4600)):
+    import folium
+    from utils import render_customer_points_to_map
+
+    for rows in sizes:
+        points = make_customer_points(rows)
+        colors = {vehicle: 'red' for vehicle in points['Vehicle No'].unique()}
+        for mode in ("markers", "geojson"):
+            m = folium.Map(location=[25.2, 55.3], zoom_start=10)
+            start = time.perf_counter()
+            render_customer_points_to_map(m, points, colors, mode=mode)
+            html = m.get_root().render()
+            print(f"{rows:>5} points {mode:<8} {time.perf_counter() - start:6.2f}s {len(html) / 1e6:6.2f} MB")
+
+
+def make_road_track(points=8640, legs=60, seed=0):
+    rng = np.random.default_rng(seed)
+    corners = np.array([55.3, 25.2]) + np.cumsum(rng.normal(0, 0.01, (legs + 1, 2)), axis=0)
+    t = np.linspace(0, legs, points)
+    leg = np.minimum(t.astype(int), legs - 1)
+    frac = (t - leg)[:, None]
+    track = corners[leg] + (corners[leg + 1] - corners[leg]) * frac
+    return track + rng.normal(0, 0.00002, track.shape)
+
+
+def benchmark_simplify(routes=50, points=8640):
+    import simplify
+
+    tracks = [make_road_track(points, seed=i) for i in range(routes)]
+    start = time.perf_counter()
+    geometries = [simplify.route_geometry(track) for track in tracks]
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for track in tracks:
+        simplify.route_geometry(track)
+    hit_time = time.perf_counter() - start
+
+    print(f"Routes: {routes} x {points} vertices")
+    print(f"level build: {build_time:.2f}s ({build_time / routes * 1000:.1f} ms/route), "
+          f"cache hits: {hit_time / routes * 1000:.2f} ms/route")
+    for level in simplify.SIMPLIFY_LEVELS_METERS:
+        kept = sum(len(g.levels[level]) for g in geometries)
+        print(f"  {level:>5.1f} m: {kept:>8} vertices ({kept / (routes * points) * 100:5.1f}%)")
+    for zoom in (10, 13, 16, 18):
+        tolerance = simplify.zoom_tolerance_m(zoom)
+        print(f"  zoom {zoom}: tolerance {tolerance:.1f} m -> level {simplify.level_for_tolerance(tolerance)} m")
+
+
+BENCHMARKS = {
+    "days": benchmark_day_classification,
+    "stops": benchmark_stop_points,
+    "routes": benchmark_route_metrics,
+    "customermap": benchmark_customer_map,
+    "simplify": benchmark_simplify
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+CHANGESET_DIR = "data/changes"
+CHANGESET_MANIFEST = "_manifest.json"
+WATERMARK_FILE = "_watermarks.json"
+CHANGESET_RETENTION_HOURS = 48
+CHANGESET_CONSUMERS = {
+    "alerts": ("exidlereport", "geofence", "driverperformance")
+}
+
+
+def _report_dir(report):
+    return os.path.join(CHANGESET_DIR, report)
+
+
+def _manifest_path(report):
+    return os.path.join(_report_dir(report), CHANGESET_MANIFEST)
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(report):
+    return _load_json(_manifest_path(report), {"report": report, "sequence": 0, "sets": []})
+
+
+def load_watermarks():
+    return _load_json(os.path.join(CHANGESET_DIR, WATERMARK_FILE), {})
+
+
+def watermark(consumer, report):
+    return load_watermarks().get(consumer, {}).get(report, 0)
+
+
+def commit_watermark(consumer, report, sequence):
+    watermarks = load_watermarks()
+    watermarks.setdefault(consumer, {})[report] = int(sequence)
+    _write_json(os.path.join(CHANGESET_DIR, WATERMARK_FILE), watermarks)
+
+
+def has_consumer(report):
+    return any(report in reports for reports in CHANGESET_CONSUMERS.values())
+
+
+def publish_change_set(report, rows):
+    if not has_consumer(report):
+        if os.path.isdir(_report_dir(report)):
+            shutil.rmtree(_report_dir(report), ignore_errors=True)
+        return None
+    if rows is None or rows.empty:
+        return None
+
+    manifest = load_manifest(report)
+    sequence = manifest["sequence"] + 1
+    file_name = f"{sequence:010d}.csv"
+    path = os.path.join(_report_dir(report), file_name)
+    os.makedirs(_report_dir(report), exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    rows.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    manifest["sequence"] = sequence
+    manifest["sets"].append({
+        "sequence": sequence,
+        "file": file_name,
+        "rows": int(len(rows)),
+        "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    prune_change_sets(report, manifest)
+    _write_json(_manifest_path(report), manifest)
+    print(f"[changesets] {report}: published change set {sequence} ({len(rows)} rows)")
+    return sequence
+
+
+def prune_change_sets(report, manifest):
+    cutoff = (datetime.now() - timedelta(hours=CHANGESET_RETENTION_HOURS)).strftime('%Y-%m-%d %H:%M:%S')
+    consumed = [marks[report] for marks in load_watermarks().values() if report in marks]
+    consumed_upto = min(consumed) if consumed else 0
+
+    kept = []
+    for entry in manifest["sets"]:
+        if entry["created_at"] < cutoff or entry["sequence"] <= consumed_upto:
+            try:
+                os.remove(os.path.join(_report_dir(report), entry["file"]))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[changesets] Failed to remove {entry['file']}: {e}")
+                kept.append(entry)
+                continue
+        else:
+            kept.append(entry)
+    manifest["sets"] = kept
+
+
+def pending_change_sets(consumer, report):
+    manifest = load_manifest(report)
+    since = watermark(consumer, report)
+    if since > manifest["sequence"]:
+        print(f"[changesets] {report}: watermark {since} ahead of sequence {manifest['sequence']}, resetting")
+        since = 0
+
+    pending = []
+    for entry in manifest["sets"]:
+        path = os.path.join(_report_dir(report), entry["file"])
+        if entry["sequence"] > since and os.path.exists(path):
+            pending.append((entry["sequence"], path))
+    return pending, manifest["sequence"]
+
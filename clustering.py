@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from pyproj import Geod
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_METERS = 6371008.8
+GROUP_SEPARATION_METERS = 1e9
+
+_geod = Geod(ellps='WGS84')
+
+
+def project_to_meters(lat, lon):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    lat0 = np.radians(np.nanmin(np.abs(lat))) if len(lat) else 0.0
+    x = EARTH_RADIUS_METERS * np.radians(lon) * np.cos(lat0)
+    y = EARTH_RADIUS_METERS * np.radians(lat)
+
+    max_lat = np.radians(np.nanmax(np.abs(lat))) if len(lat) else 0.0
+    scale = np.cos(lat0) / max(np.cos(max_lat), 1e-6)
+    return x, y, scale
+
+
+def geodesic_meters(lat1, lon1, lat2, lon2):
+    _, _, dist = _geod.inv(lon1, lat1, lon2, lat2)
+    return np.asarray(dist)
+
+
+def _group_codes(df, group_columns):
+    if not group_columns:
+        return np.zeros(len(df), dtype=np.int64)
+    codes = df.groupby(group_columns, sort=False, observed=True, dropna=False).ngroup()
+    return codes.to_numpy(dtype=np.int64)
+
+
+def neighbour_pairs(lat, lon, groups, radius_meters):
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    index = np.flatnonzero(valid)
+    if len(index) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    x, y, scale = project_to_meters(lat[index], lon[index])
+    points = np.column_stack([x, y, groups[index] * GROUP_SEPARATION_METERS])
+    tree = cKDTree(points)
+    pairs = tree.query_pairs(radius_meters * scale * 1.01 + 0.5, output_type='ndarray')
+    if len(pairs) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    pairs = index[pairs]
+    i, j = pairs[:, 0], pairs[:, 1]
+    dist = geodesic_meters(lat[i], lon[i], lat[j], lon[j])
+    pairs = pairs[dist <= radius_meters]
+    pairs = np.sort(pairs, axis=1)
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    return pairs[order]
+
+
+def greedy_clusters(lat, lon, groups, radius_meters=25):
+    n = len(lat)
+    pairs = neighbour_pairs(lat, lon, groups, radius_meters)
+    starts = np.searchsorted(pairs[:, 0], np.arange(n + 1))
+    neighbours = pairs[:, 1]
+
+    assigned = np.full(n, -1, dtype=np.int64)
+    next_id = {}
+    for i in range(n):
+        if assigned[i] >= 0:
+            continue
+        group = groups[i]
+        cluster_id = next_id.get(group, 0)
+        next_id[group] = cluster_id + 1
+        assigned[i] = cluster_id
+
+        candidates = neighbours[starts[i]:starts[i + 1]]
+        if len(candidates):
+            candidates = candidates[assigned[candidates] < 0]
+            assigned[candidates] = cluster_id
+
+    return assigned
+
+
+def grid_clusters(lat, lon, groups, radius_meters=25):
+    x, y, _ = project_to_meters(lat, lon)
+    cells = pd.DataFrame({
+        'group': groups,
+        'cx': np.floor(x / radius_meters),
+        'cy': np.floor(y / radius_meters)
+    })
+    codes = cells.groupby(['group', 'cx', 'cy'], sort=False, dropna=False).ngroup()
+    return codes.groupby(groups).rank(method='dense').to_numpy(dtype=np.int64) - 1
+
+
+def assign_geo_clusters(df, group_columns=None, radius_meters=25, method="greedy",
+                        lat_column='Latitude', lon_column='Longitude'):
+    if df.empty:
+        return np.empty(0, dtype=np.int64)
+
+    lat = pd.to_numeric(df[lat_column], errors='coerce').to_numpy(dtype=float)
+    lon = pd.to_numeric(df[lon_column], errors='coerce').to_numpy(dtype=float)
+    groups = _group_codes(df, group_columns or [])
+
+    if method == "greedy":
+        return greedy_clusters(lat, lon, groups, radius_meters)
+    if method == "grid":
+        return grid_clusters(lat, lon, groups, radius_meters)
+    raise ValueError(f"Unknown clustering method: {method}")
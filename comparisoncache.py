@@ -0,0 +1,89 @@
+import copy
+import os
+import threading
+
+import storage
+from utils import EDITS_CSV_FILE, generate_route_comparison, is_travel_report_path, load_settings
+
+_cache = {}
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except (OSError, TypeError):
+        return None
+
+
+def travel_version(csv_path, vehicle_id, date_val):
+    if is_travel_report_path(csv_path) and storage.has_report("travelreport"):
+        return storage.partition_version("travelreport", date_val, str(vehicle_id).strip())
+    return file_version(csv_path)
+
+
+def planned_inputs_version(settings):
+    return (
+        file_version(settings["geojson_path"]),
+        file_version(settings.get("customer_points_path", "")),
+        file_version(EDITS_CSV_FILE)
+    )
+
+
+def comparison_key(vehicle_id, date_val, settings):
+    return (
+        str(vehicle_id),
+        date_val,
+        travel_version(settings["csv_path_current"], vehicle_id, date_val),
+        *planned_inputs_version(settings)
+    )
+
+
+def get_planned_comparison(vehicle_ids, date_val, settings=None):
+    settings = settings or load_settings()
+    vehicle_ids = [str(v) for v in vehicle_ids]
+    keys = {vehicle_id: comparison_key(vehicle_id, date_val, settings) for vehicle_id in vehicle_ids}
+
+    with _cache_lock:
+        stale = [vehicle_id for vehicle_id in vehicle_ids if keys[vehicle_id] not in _cache]
+
+        if stale:
+            _, comparison_data = generate_route_comparison(
+                vehicle_ids=stale,
+                csv_path_current=settings["csv_path_current"],
+                csv_path_past=settings["csv_path_past"],
+                geojson_path=settings["geojson_path"],
+                date_current=date_val,
+                t_start_current="00:00:00",
+                t_end_current="23:59:59",
+                date_past=None,
+                t_start_past=None,
+                t_end_past=None,
+                generate_map=False
+            )
+            if "error" in comparison_data:
+                return comparison_data
+
+            for key in [key for key in _cache if key[1] != date_val]:
+                del _cache[key]
+            for vehicle_id in stale:
+                _cache[keys[vehicle_id]] = comparison_data.get(f"{vehicle_id}_Current")
+
+        _stats["hits"] += len(vehicle_ids) - len(stale)
+        _stats["misses"] += len(stale)
+
+        result = {}
+        for vehicle_id in vehicle_ids:
+            stats = _cache.get(keys[vehicle_id])
+            if stats is not None:
+                result[f"{vehicle_id}_Current"] = copy.deepcopy(stats)
+
+    print(f"[comparisoncache] {date_val}: {len(vehicle_ids) - len(stale)} cached, {len(stale)} computed")
+    return result
+
+
+def cache_stats():
+    with _cache_lock:
+        return {"entries": len(_cache), **_stats}
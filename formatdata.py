@@ -1,9 +1,25 @@
+import json
 import os
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+import changesets
+import stoppoints
+import storage
+
+LEGACY_ROW_INDEX_FILE = "row_hashes.bin"
+ROW_INDEX_DIR = "row_index"
+ROW_INDEX_META_FILE = "row_hashes.json"
+UNPARSED_DAY = "unparsed"
+PENDING_DIR = "pending"
+TEMP_CHUNK_ROWS = 100000
+REPORT_TIMEZONE = "Asia/Dubai"
+
 def find_latest_excel_file(folder_path):
     files = [f for f in os.listdir(folder_path) if f.endswith(".xlsx")]
     if not files:
@@ -27,51 +43,121 @@ def convert_xlsx_to_csv(folder_name, skip_rows=0):
         print(f"[convert_xlsx_to_csv] Error: {e}")
         return
 
-def extract_data_from_xml(file_path):
-    ns = {
-        'ss': 'urn:schemas-microsoft-com:office:spreadsheet'
-    }
-    try:
-        with open(file_path, 'rb') as f:
-            tree = etree.parse(f)
+SPREADSHEET_NS = 'urn:schemas-microsoft-com:office:spreadsheet'
+XML_BATCH_ROWS = 20000
+XML_PARSE_WORKERS = min(4, os.cpu_count() or 1)
 
-        rows = tree.xpath('//ss:Worksheet/ss:Table/ss:Row', namespaces=ns)
-        extracted = []
+def iter_xml_rows(file_path, batch_size=XML_BATCH_ROWS):
+    row_tag = f'{{{SPREADSHEET_NS}}}Row'
+    data_tag = f'{{{SPREADSHEET_NS}}}Data'
+    batch = []
+
+    for _, row in etree.iterparse(file_path, events=('end',), tag=row_tag, huge_tree=True):
+        batch.append([cell.text if cell.text is not None else '' for cell in row.iter(data_tag)])
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
 
-        for row in rows:
-            cells = row.xpath('./ss:Cell/ss:Data', namespaces=ns)
-            extracted.append([cell.text if cell.text is not None else '' for cell in cells])
+    if batch:
+        yield batch
 
+def extract_data_from_xml(file_path):
+    try:
+        extracted = []
+        for batch in iter_xml_rows(file_path):
+            extracted.extend(batch)
         return extracted
     except Exception as e:
         print(f"[extract_data_from_xml] Error: {e}")
         return []
 
-def collapse_xml_to_csv(folder_name):
-    all_rows = []
+def _rows_to_frame(rows, header):
+    width = len(header)
+    rows = [row[:width] + [''] * (width - len(row)) if len(row) != width else row for row in rows]
+    return pd.DataFrame(rows, columns=header)
+
+def parse_xml_to_part(file_path, part_path, transform=None):
     header = None
+    row_count = 0
+
+    with open(part_path, 'w', encoding='utf-8', newline='') as out:
+        for batch in iter_xml_rows(file_path):
+            if header is None:
+                header, batch = batch[0], batch[1:]
+            df = _rows_to_frame(batch, header)
+            if transform is not None:
+                df = transform(df)
+            df.to_csv(out, header=row_count == 0 and out.tell() == 0, index=False)
+            row_count += len(df)
+
+    return header, row_count
+
+def collapse_xml_to_csv(folder_name, transform=None):
+    xml_files = sorted(f for f in os.listdir(folder_name) if f.lower().endswith('.xml'))
+    jobs = [(os.path.join(folder_name, f), os.path.join(folder_name, f"{f}.part.csv")) for f in xml_files]
+    results = {}
+
+    def record(part_path, parse):
+        try:
+            results[part_path] = parse()
+        except Exception as e:
+            print(f"Failed to parse {part_path[:-len('.part.csv')]}: {e}")
 
-    for file in os.listdir(folder_name):
-        if file.lower().endswith('.xml'):
-            file_path = os.path.join(folder_name, file)
-            try:
-                rows = extract_data_from_xml(file_path)
-                if not rows:
-                    continue
-                if header is None:
-                    header = rows[0]
-                all_rows.extend(rows[1:])
-            except Exception as e:
-                print(f"Failed to parse {file_path}: {e}")
+    if len(jobs) > 1 and XML_PARSE_WORKERS > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(XML_PARSE_WORKERS, len(jobs))) as pool:
+                futures = {part_path: pool.submit(parse_xml_to_part, file_path, part_path, transform)
+                           for file_path, part_path in jobs}
+                for part_path, future in futures.items():
+                    record(part_path, future.result)
+        except Exception as e:
+            print(f"Parallel XML parsing unavailable ({e}), parsing sequentially.")
+            results.clear()
+
+    for file_path, part_path in jobs:
+        if part_path not in results:
+            record(part_path, lambda: parse_xml_to_part(file_path, part_path, transform))
+
+    header = None
+    total_rows = 0
+    temp_csv = os.path.join(folder_name, 'temp.csv')
+    with open(temp_csv + '.tmp', 'w', encoding='utf-8', newline='') as out:
+        for _, part_path in jobs:
+            part_header, row_count = results.get(part_path, (None, 0))
+            if part_header is None:
+                continue
+            if header is None:
+                header = part_header
+            elif part_header != header:
+                print(f"Skipping {part_path[:-len('.part.csv')]}: header does not match the first XML file.")
+                continue
+
+            with open(part_path, 'r', encoding='utf-8', newline='') as part:
+                first_line = part.readline()
+                if out.tell() == 0:
+                    out.write(first_line)
+                while True:
+                    block = part.read(1 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+            total_rows += row_count
+
+    for _, part_path in jobs:
+        if os.path.exists(part_path):
+            os.remove(part_path)
 
     if header is None:
+        os.remove(temp_csv + '.tmp')
         print("No valid XML data found.")
         return
 
-    df = pd.DataFrame(all_rows, columns=header)
-    df.drop_duplicates(inplace=True)
-    df.to_csv(f'{folder_name}/temp.csv', index=False)
-    print(f"Collapsed {len(df)} unique rows into 'temp.csv'.")
+    os.replace(temp_csv + '.tmp', temp_csv)
+    print(f"Collapsed {total_rows} rows from {len(jobs)} XML files into 'temp.csv'.")
 
 def get_time_range_uae(delta_minutes: int = 30):
     timezone_str = "Asia/Dubai"
@@ -84,33 +170,325 @@ def get_time_range_uae(delta_minutes: int = 30):
     time_format = '%d-%m-%Y %I:%M%p'
     return start_date.strftime(time_format), end_date.strftime(time_format)
 
-def format_generic_report(folder_name, date_column, date_formats):
+def today_uae():
+    return datetime.now(tz=ZoneInfo(REPORT_TIMEZONE)).strftime('%Y-%m-%d')
+
+def classify_report_days(values, date_formats):
+    text = values.astype(str).str.strip()
+    parsed = None
+
+    for fmt in date_formats:
+        if parsed is None:
+            parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+            continue
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text[missing], format=fmt, errors='coerce'))
+
+    if parsed is None:
+        return pd.Series(np.nan, index=values.index, dtype=object)
+
+    days = np.datetime_as_string(parsed.to_numpy().astype('datetime64[D]'))
+    return pd.Series(days, index=values.index, dtype=object).where(parsed.notna())
+
+def canonical_row_hashes(df):
+    canonical = df.astype(object).where(df.notna(), '').astype(str)
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy(dtype=np.uint64)
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    except FileNotFoundError:
+        return None
+
+def _csv_header(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _row_index_dir(folder_name):
+    return os.path.join(folder_name, ROW_INDEX_DIR)
+
+def _row_shard_path(folder_name, day):
+    return os.path.join(_row_index_dir(folder_name), f"{day}.bin")
+
+def save_row_index_meta(folder_name, columns):
+    with open(os.path.join(folder_name, ROW_INDEX_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"columns": columns, "layout": "daily"}, f)
+
+def invalidate_row_index(folder_name):
+    try:
+        os.remove(os.path.join(folder_name, ROW_INDEX_META_FILE))
+    except FileNotFoundError:
+        pass
+
+def report_days(df, date_column, date_formats):
+    return classify_report_days(df[date_column], date_formats).fillna(UNPARSED_DAY)
+
+def ensure_row_index(folder_name, columns, date_column, date_formats):
+    try:
+        with open(os.path.join(folder_name, ROW_INDEX_META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta = {}
+    if meta.get("layout") == "daily" and meta.get("columns") == columns and os.path.isdir(_row_index_dir(folder_name)):
+        return
+
+    print(f"Rebuilding row index for '{folder_name}'")
+    by_day = {}
+    for file_name in ("history.csv", "current.csv"):
+        path = os.path.join(folder_name, file_name)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            continue
+        for chunk in pd.read_csv(path, chunksize=TEMP_CHUNK_ROWS, dtype=str):
+            chunk = chunk.reindex(columns=columns)
+            hashes = canonical_row_hashes(chunk)
+            for day, positions in pd.Series(np.arange(len(chunk))).groupby(
+                    report_days(chunk, date_column, date_formats).to_numpy()).groups.items():
+                by_day.setdefault(day, []).append(hashes[positions])
+
+    index_dir = _row_index_dir(folder_name)
+    if os.path.isdir(index_dir):
+        for file_name in os.listdir(index_dir):
+            os.remove(os.path.join(index_dir, file_name))
+    os.makedirs(index_dir, exist_ok=True)
+    for day, parts in by_day.items():
+        np.unique(np.concatenate(parts)).tofile(_row_shard_path(folder_name, day))
+    if os.path.exists(os.path.join(folder_name, LEGACY_ROW_INDEX_FILE)):
+        os.remove(os.path.join(folder_name, LEGACY_ROW_INDEX_FILE))
+    save_row_index_meta(folder_name, columns)
+
+def load_row_shard(folder_name, day):
+    path = _row_shard_path(folder_name, day)
+    if not os.path.exists(path):
+        return np.array([], dtype=np.uint64)
+    return np.fromfile(path, dtype=np.uint64)
+
+def merge_row_shard(folder_name, day, hashes, shard=None):
+    shard = load_row_shard(folder_name, day) if shard is None else shard
+    merged = np.union1d(shard, hashes.astype(np.uint64))
+    path = _row_shard_path(folder_name, day)
+    merged.tofile(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return merged
+
+def drop_row_index_before(folder_name, cutoff_day):
+    index_dir = _row_index_dir(folder_name)
+    if not os.path.isdir(index_dir):
+        return 0
+    dropped = 0
+    for file_name in os.listdir(index_dir):
+        day = file_name[:-len(".bin")]
+        if file_name.endswith(".bin") and day != UNPARSED_DAY and day < cutoff_day:
+            os.remove(os.path.join(index_dir, file_name))
+            dropped += 1
+    return dropped
+
+def history_in_store(report_name):
+    return report_name in storage.REPORT_SCHEMAS and storage.has_report(report_name)
+
+def _history_last_day(folder_name, date_column, date_formats):
+    history_csv = os.path.join(folder_name, "history.csv")
+    meta_path = os.path.join(folder_name, ROW_INDEX_META_FILE)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta = {}
+    stat = _file_stat(history_csv)
+    if meta.get("history_stat") == stat and "history_last_day" in meta:
+        return meta["history_last_day"]
+
+    last_day = None
+    for chunk in pd.read_csv(history_csv, chunksize=TEMP_CHUNK_ROWS, dtype=str, usecols=[date_column]):
+        days = classify_report_days(chunk[date_column], date_formats).dropna()
+        if not days.empty:
+            last_day = days.max() if last_day is None else max(last_day, days.max())
+    meta.update({"history_stat": stat, "history_last_day": last_day})
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return last_day
+
+def drop_report_history_before(folder_name, date_column, date_formats, cutoff_day):
+    shards = drop_row_index_before(folder_name, cutoff_day)
+    history_csv = os.path.join(folder_name, "history.csv")
+    removed = False
+    # Once the store holds the history, history.csv is no longer appended to and is dropped whole.
+    if os.path.exists(history_csv) and history_in_store(os.path.basename(os.path.normpath(folder_name))):
+        last_day = _history_last_day(folder_name, date_column, date_formats)
+        if last_day is None or last_day < cutoff_day:
+            os.remove(history_csv)
+            removed = True
+    print(f"{folder_name} -> dropped {shards} row index shards before {cutoff_day}"
+          + (", removed legacy history.csv" if removed else ""))
+    return shards
+
+def _append_csv(path, df):
+    if df.empty:
+        return
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    df.to_csv(path, mode='a', header=write_header, index=False)
+
+def _pending_files(folder_name):
+    pending_dir = os.path.join(folder_name, PENDING_DIR)
+    if not os.path.isdir(pending_dir):
+        return []
+    return [os.path.join(pending_dir, f) for f in sorted(os.listdir(pending_dir)) if f.endswith(".csv")]
+
+def _set_aside(folder_name, path):
+    pending_dir = os.path.join(folder_name, PENDING_DIR)
+    os.makedirs(pending_dir, exist_ok=True)
+    target = os.path.join(pending_dir, f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}.csv")
+    os.replace(path, target)
+    return target
+
+def _append_new_rows(path, folder_name, report_name, columns, date_column, date_formats, today, shards, added_days):
+    history_csv = os.path.join(folder_name, "history.csv")
+    current_csv = os.path.join(folder_name, "current.csv")
+    for chunk in pd.read_csv(path, chunksize=TEMP_CHUNK_ROWS, dtype=str):
+        if date_column not in chunk.columns:
+            print(f"Date column '{date_column}' missing in {path}. Skipping.")
+            break
+
+        chunk = chunk.reindex(columns=columns)
+        hashes = canonical_row_hashes(chunk)
+        chunk_days = report_days(chunk, date_column, date_formats).to_numpy()
+        day_positions = pd.Series(np.arange(len(chunk))).groupby(chunk_days).groups
+
+        is_new = ~pd.Series(hashes).duplicated().to_numpy()
+        for day, positions in day_positions.items():
+            if day not in shards:
+                shards[day] = load_row_shard(folder_name, day)
+            shard = shards[day]
+            if len(shard):
+                pos = np.minimum(np.searchsorted(shard, hashes[positions]), len(shard) - 1)
+                is_new[positions] &= shard[pos] != hashes[positions]
+
+        new_rows = chunk[is_new]
+        if new_rows.empty:
+            continue
+
+        # The store is written first: rows only count as seen once they are safely stored.
+        if report_name in storage.REPORT_SCHEMAS:
+            touched = storage.write_report(report_name, new_rows)
+            if report_name == "travelreport":
+                try:
+                    stoppoints.refresh_stop_index(touched)
+                except Exception as e:
+                    print(f"Warning: Failed to refresh stop index for '{folder_name}': {e}")
+
+        days = pd.Series(chunk_days[is_new], index=new_rows.index, dtype=object)
+        today_mask = days == today
+        if not history_in_store(report_name):
+            past_order = days[~today_mask].sort_values(kind='stable').index
+            _append_csv(history_csv, new_rows.loc[past_order])
+        _append_csv(current_csv, new_rows[today_mask])
+        new_hashes = pd.Series(hashes[is_new])
+        for day, day_hashes in new_hashes.groupby(chunk_days[is_new]):
+            shards[day] = merge_row_shard(folder_name, day, day_hashes.to_numpy(), shards.get(day))
+        try:
+            changesets.publish_change_set(report_name, new_rows)
+        except Exception as e:
+            print(f"Warning: Failed to publish change set for '{folder_name}': {e}")
+        for day, count in days.value_counts().items():
+            added_days[day] = added_days.get(day, 0) + int(count)
+
+def append_generic_report(folder_name, date_column, date_formats):
     temp_csv = os.path.join(folder_name, "temp.csv")
     history_csv = os.path.join(folder_name, "history.csv")
     current_csv = os.path.join(folder_name, "current.csv")
+    report_name = os.path.basename(os.path.normpath(folder_name))
+    today = today_uae()
 
-    timezone_str = "Asia/Dubai"
-    now = datetime.now(tz=ZoneInfo(timezone_str))
-    today_str = now.strftime('%d-%m-%Y')
-
-    def is_today(date_str):
-        for fmt in date_formats:
-            try:
-                dt = datetime.strptime(date_str.strip(), fmt)
-                return dt.strftime('%d-%m-%Y') == today_str
-            except:
-                continue
-        return False
+    if not os.path.exists(temp_csv):
+        columns = _csv_header(history_csv) or _csv_header(current_csv) or next(
+            (header for header in map(_csv_header, _pending_files(folder_name)) if header), None)
+    else:
+        columns = _csv_header(history_csv) or _csv_header(current_csv) or _csv_header(temp_csv)
+        temp_columns = _csv_header(temp_csv)
+        if temp_columns and columns and set(temp_columns) != set(columns):
+            print(f"Columns of temp.csv in '{folder_name}' differ from stored data. Falling back to full rewrite.")
+            return rewrite_generic_report(folder_name, date_column, date_formats)
+
+    if columns is None:
+        print(f"No data in '{folder_name}'. Skipping.")
+        return
+
+    ensure_row_index(folder_name, columns, date_column, date_formats)
+    in_store = history_in_store(report_name)
+
+    if os.path.exists(current_csv):
+        try:
+            df_current = pd.read_csv(current_csv, dtype=str)
+            if not df_current.empty and date_column in df_current.columns:
+                today_mask = classify_report_days(df_current[date_column], date_formats) == today
+                outdated_rows = df_current[~today_mask]
+                if not outdated_rows.empty:
+                    if not in_store:
+                        _append_csv(history_csv, outdated_rows.reindex(columns=columns))
+                    df_current[today_mask].reindex(columns=columns).to_csv(current_csv, index=False)
+                    print(f"Rolled {len(outdated_rows)} rows out of current.csv into "
+                          f"{'the store' if in_store else 'history.csv'} in '{folder_name}'")
+        except Exception as e:
+            print(f"Warning: Failed to process existing current.csv in '{folder_name}': {e}")
+
+    sources = _pending_files(folder_name) + ([temp_csv] if os.path.exists(temp_csv) else [])
+    if not sources:
+        print(f"No temp.csv in '{folder_name}'. Skipping new data.")
+        return
+
+    added_days = {}
+    shards = {}
+    for path in sources:
+        try:
+            _append_new_rows(path, folder_name, report_name, columns, date_column, date_formats, today, shards,
+                             added_days)
+        except pd.errors.EmptyDataError:
+            print(f"{path} is empty. Skipping.")
+        except Exception as e:
+            if path == temp_csv:
+                path = _set_aside(folder_name, temp_csv)
+            print(f"Failed to append {path} in '{folder_name}', keeping it for the next run: {e}")
+            continue
+        os.remove(path)
+
+    appended = sum(added_days.values())
+    added_today = added_days.pop(today, 0)
+    print(f"{folder_name} -> appended {added_today} new rows to current.csv and {sum(added_days.values())} to "
+          f"{'the store' if in_store else 'history.csv'}.")
+    if added_days:
+        print(f"{folder_name} -> history rows by day: " + ", ".join(f"{day}: {count}" for day, count in sorted(added_days.items())))
+    return appended
+
+def format_generic_report(folder_name, date_column, date_formats, incremental=True):
+    report_name = os.path.basename(os.path.normpath(folder_name))
+
+    if report_name in storage.REPORT_SCHEMAS:
+        storage.ensure_imported(report_name, folder_name)
+
+    if incremental:
+        return append_generic_report(folder_name, date_column, date_formats) or 0
+    return rewrite_generic_report(folder_name, date_column, date_formats) or 0
+
+def rewrite_generic_report(folder_name, date_column, date_formats):
+    temp_csv = os.path.join(folder_name, "temp.csv")
+    history_csv = os.path.join(folder_name, "history.csv")
+    current_csv = os.path.join(folder_name, "current.csv")
+    report_name = os.path.basename(os.path.normpath(folder_name))
+
+    today = today_uae()
 
     if os.path.exists(current_csv):
         try:
             df_current = pd.read_csv(current_csv)
             if not df_current.empty and date_column in df_current.columns:
-                df_current['__is_today'] = df_current[date_column].apply(is_today)
+                df_current['__is_today'] = classify_report_days(df_current[date_column], date_formats) == today
                 outdated_rows = df_current[~df_current['__is_today']].drop(columns=['__is_today'])
                 df_current_today = df_current[df_current['__is_today']].drop(columns=['__is_today'])
 
-                if not outdated_rows.empty:
+                if not outdated_rows.empty and not history_in_store(report_name):
                     if os.path.exists(history_csv):
                         df_history_existing = pd.read_csv(history_csv)
                         df_combined_history = pd.concat([df_history_existing, outdated_rows], ignore_index=True)
@@ -145,11 +523,19 @@ def format_generic_report(folder_name, date_column, date_formats):
 
     df.drop_duplicates(inplace=True)
 
-    df['__is_today'] = df[date_column].apply(is_today)
+    if report_name in storage.REPORT_SCHEMAS:
+        try:
+            touched = storage.write_report(report_name, df)
+            if report_name == "travelreport":
+                stoppoints.refresh_stop_index(touched)
+        except Exception as e:
+            print(f"Warning: Failed to write '{folder_name}' rows to partitioned store: {e}")
+
+    df['__is_today'] = classify_report_days(df[date_column], date_formats) == today
     df_today = df[df['__is_today']].drop(columns=['__is_today'])
     df_history = df[~df['__is_today']].drop(columns=['__is_today'])
 
-    if not df_history.empty:
+    if not df_history.empty and not history_in_store(report_name):
         if os.path.exists(history_csv):
             df_existing = pd.read_csv(history_csv)
             df_combined = pd.concat([df_existing, df_history], ignore_index=True).drop_duplicates()
@@ -165,75 +551,76 @@ def format_generic_report(folder_name, date_column, date_formats):
             df_today.to_csv(current_csv, index=False)
 
     os.remove(temp_csv)
+    invalidate_row_index(folder_name)
     print(f"{folder_name} -> current.csv (deduplicated today), history.csv (deduplicated past) updated.")
-    return
-
-def format_travel_report(folder_name):
-    collapse_xml_to_csv(folder_name)
-    temp_csv_path = os.path.join(folder_name, 'temp.csv')
-
-    if os.path.exists(temp_csv_path):
-        travel_temp = pd.read_csv(temp_csv_path)
-        columns = ['DateTime']
+    return len(df)
 
-        for column in columns:
-            travel_temp[column] = travel_temp[column].str.replace(r'\s+(AM|PM)', '', regex=True)
-
-            travel_temp[column] = pd.to_datetime(
-                travel_temp[column],
-                format="%d-%m-%Y %H:%M:%S",
-                errors='coerce'
-            )
+def parse_travel_batch(df):
+    df['DateTime'] = pd.to_datetime(
+        df['DateTime'].str.replace(r'\s+(AM|PM)', '', regex=True),
+        format="%d-%m-%Y %H:%M:%S",
+        errors='coerce'
+    )
+    return df.dropna(subset=['DateTime'])
 
-        travel_temp.dropna(subset=columns, inplace=True)
+def run_stage(timings, stage, func, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
 
-        travel_temp.to_csv(temp_csv_path, index=False)
+def format_travel_report(folder_name):
+    timings = {}
+    run_stage(timings, "convert", collapse_xml_to_csv, folder_name, transform=parse_travel_batch)
 
-    format_generic_report(
+    rows = run_stage(
+        timings, "merge", format_generic_report,
         folder_name=folder_name,
         date_column="DateTime",
         date_formats=["%Y-%m-%d %H:%M:%S"]
     )
 
-    return
+    return timings, rows
 
 def format_geofence_report(folder_name):
-    convert_xlsx_to_csv(folder_name,skip_rows = 8)
-    format_generic_report(folder_name, date_column="In Time", date_formats=["%Y-%m-%d %H:%M:%S"])
-    return
+    timings = {}
+    run_stage(timings, "convert", convert_xlsx_to_csv, folder_name, skip_rows=8)
+    rows = run_stage(timings, "merge", format_generic_report, folder_name, date_column="In Time", date_formats=["%Y-%m-%d %H:%M:%S"])
+    return timings, rows
 def format_idle_report(folder_name):
-    convert_xlsx_to_csv(folder_name,skip_rows = 2)
-    format_generic_report(folder_name, date_column="Idle From", date_formats=["%Y-%m-%d %H:%M:%S"])
-    return
+    timings = {}
+    run_stage(timings, "convert", convert_xlsx_to_csv, folder_name, skip_rows=2)
+    rows = run_stage(timings, "merge", format_generic_report, folder_name, date_column="Idle From", date_formats=["%Y-%m-%d %H:%M:%S"])
+    return timings, rows
 def format_exidle_report(folder_name):
-    convert_xlsx_to_csv(folder_name,skip_rows = 8)
-    format_generic_report(folder_name, date_column="Idle From", date_formats=["%Y-%m-%d %H:%M:%S"])
-    return
+    timings = {}
+    run_stage(timings, "convert", convert_xlsx_to_csv, folder_name, skip_rows=8)
+    rows = run_stage(timings, "merge", format_generic_report, folder_name, date_column="Idle From", date_formats=["%Y-%m-%d %H:%M:%S"])
+    return timings, rows
+def parse_driver_performance_batch(df):
+    columns = ['Login Time', 'Logout Time']
+    for column in columns:
+        df[column] = pd.to_datetime(
+            df[column].astype(str).str.replace(r'\s+(AM|PM)', '', regex=True).str.strip(),
+            format="%d-%m-%Y %H:%M:%S",
+            errors='coerce'
+        )
+    return df.dropna(subset=columns)
+
 def format_driver_performance(folder_name):
-    collapse_xml_to_csv(folder_name)
-    temp_csv_path = os.path.join(folder_name, 'temp.csv')
-
-    if os.path.exists(temp_csv_path):
-        performance_temp = pd.read_csv(temp_csv_path)
-        columns = ['Login Time', 'Logout Time']
-        for column in columns:
-            performance_temp[column] = performance_temp[column].astype(str).str.replace(r'\s+(AM|PM)', '', regex=True).str.strip()
-            performance_temp[column] = pd.to_datetime(
-                performance_temp[column],
-                format="%d-%m-%Y %H:%M:%S",
-                errors='coerce'
-            )
-        performance_temp.dropna(subset=columns, inplace=True)
-        performance_temp.to_csv(temp_csv_path, index=False)
-    format_generic_report(
+    timings = {}
+    run_stage(timings, "convert", collapse_xml_to_csv, folder_name, transform=parse_driver_performance_batch)
+    rows = run_stage(
+        timings, "merge", format_generic_report,
         folder_name=folder_name,
         date_column="Login Time",
         date_formats=["%Y-%m-%d %H:%M:%S"]
     )
-    return
+    return timings, rows
 
 def clean_folder(folder_name):
-    keep_files = {'current.csv', 'history.csv'}
+    keep_files = {'current.csv', 'history.csv', LEGACY_ROW_INDEX_FILE, ROW_INDEX_META_FILE}
 
     for filename in os.listdir(folder_name):
         file_path = os.path.join(folder_name, filename)
@@ -247,20 +634,46 @@ def clean_folder(folder_name):
         except Exception as e:
             print(f"Failed to delete {file_path}: {e}")
 
-def format_everything():
-    folders = [
-        "data/travelreport",
-        "data/geofence",
-        "data/idlereport",
-        "data/exidlereport",
-        "data/driverperformance"
-    ]
-
-    format_travel_report(folder_name=folders[0])
-    format_geofence_report(folder_name=folders[1])
-    format_idle_report(folder_name=folders[2])
-    format_exidle_report(folder_name=folders[3])
-    format_driver_performance(folder_name=folders[4])
+REPORT_FORMATTERS = {
+    "data/travelreport": format_travel_report,
+    "data/geofence": format_geofence_report,
+    "data/idlereport": format_idle_report,
+    "data/exidlereport": format_exidle_report,
+    "data/driverperformance": format_driver_performance
+}
+
+def format_report_folder(folder_name):
+    start = time.perf_counter()
+    timings = {}
+    rows = 0
+    try:
+        timings, rows = REPORT_FORMATTERS[folder_name](folder_name)
+    except Exception as e:
+        print(f"[format_report_folder] Failed to format '{folder_name}': {e}")
+    run_stage(timings, "clean", clean_folder, folder_name)
+    return folder_name, timings, time.perf_counter() - start, rows or 0
+
+def format_everything(parallel=True):
+    folders = list(REPORT_FORMATTERS)
+    start = time.perf_counter()
+    results = []
+
+    if parallel:
+        try:
+            with ProcessPoolExecutor(max_workers=len(folders)) as pool:
+                results = list(pool.map(format_report_folder, folders))
+        except Exception as e:
+            print(f"Parallel formatting unavailable ({e}), formatting sequentially.")
+            results = []
 
+    done = {folder for folder, _, _, _ in results}
     for folder in folders:
-        clean_folder(folder)
\ No newline at end of file
+        if folder not in done:
+            results.append(format_report_folder(folder))
+
+    print("Formatting timings:")
+    for folder, timings, total, rows in results:
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        print(f"  {folder}: {total:.2f}s, {rows} rows ({stages})")
+    print(f"  wall time: {time.perf_counter() - start:.2f}s (sum of reports {sum(r[2] for r in results):.2f}s)")
+    return {"rows": sum(r[3] for r in results)}
@@ -0,0 +1,247 @@
+import importlib
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import psutil
+
+JOB_WORKERS = 2
+JOB_PRELOAD_MODULES = ["formatdata", "preprocess", "extractdata"]
+JOB_MAX_RUNS_PER_WORKER = 50
+JOB_POLL_SECONDS = 0.5
+WORKER_START_TIMEOUT = 120
+
+
+def _worker_main(conn, preload):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    start = time.perf_counter()
+    for module_name in preload:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"[jobrunner] Worker {os.getpid()} failed to preload {module_name}: {e}")
+    conn.send({"ready": True, "pid": os.getpid(), "preload_seconds": time.perf_counter() - start})
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        job_id, module_name, func_name, args, kwargs = message
+        start = time.perf_counter()
+        try:
+            func = getattr(importlib.import_module(module_name), func_name)
+            payload = {"status": "success", "result": func(*args, **kwargs)}
+        except BaseException as e:
+            payload = {"status": "failed", "error": repr(e), "traceback": traceback.format_exc()}
+        payload["job_id"] = job_id
+        payload["run_seconds"] = time.perf_counter() - start
+
+        try:
+            conn.send(payload)
+        except Exception:
+            payload["result"] = repr(payload.get("result"))
+            conn.send(payload)
+
+
+def _kill_tree(pid):
+    try:
+        parent = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    processes = parent.children(recursive=True) + [parent]
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=10)
+
+
+class JobWorker:
+    def __init__(self, ctx, preload, index):
+        self.index = index
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, preload),
+            name=f"job-worker-{index}",
+            daemon=False
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+        self.ready = None
+
+    def wait_ready(self, timeout=WORKER_START_TIMEOUT):
+        if self.ready is None and self.conn.poll(timeout):
+            self.ready = self.conn.recv()
+        return self.ready
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            _kill_tree(self.process.pid)
+        self.conn.close()
+
+    def kill(self):
+        _kill_tree(self.process.pid)
+        self.process.join(5)
+        self.conn.close()
+
+
+class JobRunner:
+    def __init__(self, workers=JOB_WORKERS, preload=None, max_runs_per_worker=JOB_MAX_RUNS_PER_WORKER):
+        self.size = workers
+        self.preload = JOB_PRELOAD_MODULES if preload is None else preload
+        self.max_runs_per_worker = max_runs_per_worker
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._busy = {}
+        self._cancelled = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Condition()
+        self._next_index = itertools.count()
+        self._started = False
+
+    def _spawn(self):
+        return JobWorker(self._ctx, self.preload, next(self._next_index))
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._idle = [self._spawn() for _ in range(self.size)]
+        print(f"[jobrunner] Started {self.size} job workers (preloading {', '.join(self.preload) or 'nothing'})")
+
+    def shutdown(self):
+        with self._lock:
+            workers = self._idle + [worker for worker, _ in self._busy.values()]
+            self._idle = []
+            self._started = False
+        for worker in workers:
+            worker.stop()
+        print(f"[jobrunner] Stopped {len(workers)} job workers")
+
+    def _acquire(self, job_id, name):
+        with self._lock:
+            if not self._started:
+                raise RuntimeError("job runner is not started")
+            while not self._idle:
+                self._lock.wait()
+            worker = self._idle.pop()
+            self._busy[job_id] = (worker, name)
+            return worker
+
+    def _release(self, job_id, worker, replace):
+        with self._lock:
+            self._busy.pop(job_id, None)
+            self._cancelled.discard(job_id)
+            if replace or not worker.is_alive() or worker.runs >= self.max_runs_per_worker:
+                if worker.is_alive():
+                    worker.stop()
+                worker = self._spawn() if self._started else None
+            if worker is not None:
+                if self._started:
+                    self._idle.append(worker)
+                else:
+                    worker.stop()
+            self._lock.notify()
+
+    def cancel(self, job_id):
+        with self._lock:
+            if job_id in self._busy:
+                self._cancelled.add(job_id)
+                return True
+        return False
+
+    def running(self):
+        with self._lock:
+            return {job_id: name for job_id, (_, name) in self._busy.items()}
+
+    def run(self, module_name, func_name, *args, timeout=None, name=None, **kwargs):
+        job_id = next(self._ids)
+        name = name or f"{module_name}.{func_name}"
+        started_at = datetime.now()
+        start = time.perf_counter()
+        result = {
+            "job_id": job_id,
+            "name": name,
+            "status": "failed",
+            "result": None,
+            "error": None,
+            "started_at": started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            "queued_seconds": 0.0,
+            "duration": 0.0,
+            "worker_pid": None
+        }
+
+        try:
+            worker = self._acquire(job_id, name)
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        replace = False
+        try:
+            ready = worker.wait_ready()
+            if not ready:
+                replace = True
+                result["error"] = "worker failed to start"
+                return result
+            result["worker_pid"] = ready["pid"]
+            result["queued_seconds"] = time.perf_counter() - start
+
+            worker.conn.send((job_id, module_name, func_name, args, kwargs))
+            worker.runs += 1
+            deadline = time.perf_counter() + timeout if timeout else None
+
+            while True:
+                if worker.conn.poll(JOB_POLL_SECONDS):
+                    payload = worker.conn.recv()
+                    result.update({key: payload.get(key) for key in ("status", "result", "error", "traceback")})
+                    break
+                if not worker.is_alive():
+                    replace = True
+                    result["status"] = "crashed"
+                    result["error"] = f"worker exited with code {worker.process.exitcode}"
+                    break
+                if job_id in self._cancelled:
+                    replace = True
+                    worker.kill()
+                    result["status"] = "cancelled"
+                    break
+                if deadline is not None and time.perf_counter() > deadline:
+                    replace = True
+                    worker.kill()
+                    result["status"] = "timeout"
+                    result["error"] = f"exceeded {timeout}s"
+                    break
+        except (EOFError, OSError) as e:
+            replace = True
+            worker.process.join(5)
+            result["status"] = "crashed"
+            result["error"] = f"worker exited with code {worker.process.exitcode}" if isinstance(e, EOFError) else str(e)
+        finally:
+            result["duration"] = time.perf_counter() - start
+            self._release(job_id, worker, replace)
+
+        print(f"[jobrunner] {name} {result['status']} in {result['duration']:.1f}s"
+              + (f": {result['error']}" if result["error"] else ""))
+        return result
@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+JOB_HISTORY_DB_PATH = "data/jobhistory.db"
+JOB_HISTORY_RETENTION_DAYS = 30
+JOB_LOCK_WAIT_SECONDS = 3600
+FINISHED_STATUSES = ("success", "failed", "timeout", "crashed", "cancelled", "interrupted")
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    trigger TEXT,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    duration REAL,
+    rows INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs (job, started_at);
+"""
+
+_local = threading.local()
+
+
+def connect(db_path=JOB_HISTORY_DB_PATH):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        connections[db_path] = conn
+    return conn
+
+
+def _outcome(value):
+    if isinstance(value, dict):
+        return value.get("status", "success"), value.get("rows"), value.get("error")
+    if value is False:
+        return "failed", None, None
+    return "success", None, None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def job_stats(days=7, bucket="day", job=None, db_path=JOB_HISTORY_DB_PATH):
+    since = (datetime.now() - timedelta(days=days)).strftime(TIME_FORMAT)
+    period_length = 13 if bucket == "hour" else 10
+    sql = "SELECT job, status, started_at, duration, rows FROM job_runs WHERE started_at >= ?"
+    params = [since]
+    if job:
+        sql += " AND job = ?"
+        params.append(job)
+
+    groups = {}
+    for row in connect(db_path).execute(sql + " ORDER BY started_at", params):
+        period = row["started_at"][:period_length]
+        group = groups.setdefault(row["job"], {}).setdefault(period, {"durations": [], "statuses": {}, "rows": 0})
+        group["statuses"][row["status"]] = group["statuses"].get(row["status"], 0) + 1
+        if row["status"] not in ("skipped", "running") and row["duration"] is not None:
+            group["durations"].append(row["duration"])
+        group["rows"] += row["rows"] or 0
+
+    stats = {}
+    for name, periods in groups.items():
+        stats[name] = []
+        for period, group in periods.items():
+            durations = sorted(group["durations"])
+            stats[name].append({
+                "period": period,
+                "runs": len(durations),
+                "statuses": group["statuses"],
+                "rows": group["rows"],
+                "p50": _percentile(durations, 0.5),
+                "p95": _percentile(durations, 0.95),
+                "max": durations[-1] if durations else None
+            })
+    return stats
+
+
+def recent_runs(limit=50, job=None, db_path=JOB_HISTORY_DB_PATH):
+    sql = "SELECT * FROM job_runs"
+    params = []
+    if job:
+        sql += " WHERE job = ?"
+        params.append(job)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in connect(db_path).execute(sql, params)]
+
+
+class Job:
+    def __init__(self, name, func, depends_on=(), locks=(), triggered=False):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.locks = tuple(locks)
+        self.triggered = triggered
+        self.lock = threading.Lock()
+
+
+class JobScheduler:
+    def __init__(self, db_path=JOB_HISTORY_DB_PATH):
+        self.db_path = db_path
+        self.jobs = {}
+        self._resource_locks = {}
+        self._threads = []
+        conn = connect(db_path)
+        cutoff = (datetime.now() - timedelta(days=JOB_HISTORY_RETENTION_DAYS)).strftime(TIME_FORMAT)
+        with conn:
+            interrupted = conn.execute(
+                "UPDATE job_runs SET status = 'interrupted', error = 'scheduler restarted' WHERE status = 'running'"
+            ).rowcount
+            conn.execute("DELETE FROM job_runs WHERE started_at < ?", (cutoff,))
+        if interrupted:
+            print(f"[jobscheduler] Marked {interrupted} unfinished runs as interrupted")
+
+    def add(self, name, func, depends_on=(), locks=(), triggered=False):
+        missing = [dep for dep in depends_on if dep not in self.jobs]
+        if missing:
+            raise ValueError(f"job {name} depends on unknown jobs: {', '.join(missing)}")
+        self.jobs[name] = Job(name, func, depends_on, locks, triggered)
+        for lock_name in locks:
+            self._resource_locks.setdefault(lock_name, threading.Lock())
+        return self.jobs[name]
+
+    def dependents(self, name):
+        return [job for job in self.jobs.values() if job.triggered and name in job.depends_on]
+
+    def last_finished_status(self, name):
+        row = connect(self.db_path).execute(
+            f"SELECT status FROM job_runs WHERE job = ? AND status IN ({','.join('?' * len(FINISHED_STATUSES))}) "
+            "ORDER BY id DESC LIMIT 1",
+            (name, *FINISHED_STATUSES)
+        ).fetchone()
+        return row["status"] if row else None
+
+    def unmet_dependency(self, job):
+        for dep in job.depends_on:
+            if self.jobs[dep].lock.locked():
+                return f"{dep} is running"
+            status = self.last_finished_status(dep)
+            if status != "success":
+                return f"last {dep} run {status or 'never happened'}"
+        return None
+
+    def _record_start(self, name, trigger):
+        conn = connect(self.db_path)
+        with conn:
+            return conn.execute(
+                "INSERT INTO job_runs (job, trigger, status, started_at) VALUES (?, ?, 'running', ?)",
+                (name, trigger, datetime.now().strftime(TIME_FORMAT))
+            ).lastrowid
+
+    def _record_finish(self, run_id, status, duration, rows=None, error=None):
+        conn = connect(self.db_path)
+        with conn:
+            conn.execute(
+                "UPDATE job_runs SET status = ?, finished_at = ?, duration = ?, rows = ?, error = ? WHERE id = ?",
+                (status, datetime.now().strftime(TIME_FORMAT), duration, rows, error, run_id)
+            )
+
+    def _record_skip(self, name, trigger, reason):
+        now = datetime.now().strftime(TIME_FORMAT)
+        conn = connect(self.db_path)
+        with conn:
+            conn.execute(
+                "INSERT INTO job_runs (job, trigger, status, started_at, finished_at, duration, error) "
+                "VALUES (?, ?, 'skipped', ?, ?, 0, ?)",
+                (name, trigger, now, now, reason)
+            )
+        print(f"[jobscheduler] Skipping {name}: {reason}")
+
+    def run(self, name, trigger="manual"):
+        job = self.jobs[name]
+        reason = self.unmet_dependency(job)
+        if reason:
+            self._record_skip(name, trigger, reason)
+            return "skipped"
+        if not job.lock.acquire(blocking=False):
+            self._record_skip(name, trigger, "previous run still in progress")
+            return "skipped"
+
+        held = []
+        try:
+            for lock_name in sorted(job.locks):
+                lock = self._resource_locks[lock_name]
+                if not lock.acquire(timeout=JOB_LOCK_WAIT_SECONDS):
+                    self._record_skip(name, trigger, f"timed out waiting for {lock_name} lock")
+                    return "skipped"
+                held.append(lock)
+
+            run_id = self._record_start(name, trigger)
+            start = time.perf_counter()
+            try:
+                status, rows, error = _outcome(job.func())
+            except Exception as e:
+                status, rows, error = "failed", None, str(e)
+            duration = time.perf_counter() - start
+            self._record_finish(run_id, status, duration, rows, error)
+            print(f"[jobscheduler] {name} {status} in {duration:.1f}s"
+                  + (f" ({rows} rows)" if rows is not None else ""))
+        finally:
+            for lock in reversed(held):
+                lock.release()
+            job.lock.release()
+
+        if status == "success":
+            for dependent in self.dependents(name):
+                self.run(dependent.name, trigger=f"after {name}")
+        return status
+
+    def submit(self, name, trigger="schedule"):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        thread = threading.Thread(target=self.run, args=(name, trigger), name=f"job-{name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return thread
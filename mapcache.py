@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from comparisoncache import file_version, travel_version
+from utils import DRIVER_NAMES, EDITS_CSV_FILE, SETTINGS_FILE
+
+MAP_CACHE_MAX_ENTRIES = 32
+MAP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+BOOT_ID = str(time.time_ns())
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v)) for k, v in value.items()))
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return str(value).strip()
+
+
+def request_key(endpoint, params, inputs):
+    return (endpoint, _normalize(params), _normalize(inputs))
+
+
+def etag_for(key):
+    return hashlib.sha1(f"{BOOT_ID}:{key!r}".encode("utf-8")).hexdigest()
+
+
+def shared_inputs():
+    return {
+        "settings": file_version(SETTINGS_FILE),
+        "aliases": file_version(DRIVER_NAMES),
+        "edits": file_version(EDITS_CSV_FILE)
+    }
+
+
+def travel_inputs(csv_path, vehicle_ids, date_val):
+    if not date_val or not csv_path:
+        return None
+    return [(str(vid), travel_version(csv_path, vid, date_val)) for vid in vehicle_ids]
+
+
+def _size(value):
+    return len(json.dumps(value, default=str))
+
+
+class MapCache:
+    def __init__(self, max_entries=MAP_CACHE_MAX_ENTRIES, max_bytes=MAP_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        size = _size(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        try:
+            with build_lock:
+                value = self.get(key)
+                if value is None:
+                    with self._lock:
+                        self._stats["misses"] += 1
+                    start = time.perf_counter()
+                    value = build()
+                    self.put(key, value)
+                    print(f"[mapcache] {key[0]} built in {time.perf_counter() - start:.2f}s")
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, **self._stats}
+
+
+map_cache = MapCache()
@@ -0,0 +1,245 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import shapely
+
+import simplify
+from utils import (
+    CUSTOMER_POINTS_DIR,
+    ROUTES_JSON_DIR,
+    assign_vehicle_colors,
+    extract_stop_points,
+    get_appropriate_csv_path,
+    load_actual_route,
+    load_and_process_customer_points,
+    load_settings,
+    load_vehicle_aliases,
+    resolve_customer_points
+)
+
+MAP_LAYERS = ("customers", "stops", "actual", "planned")
+COORD_DECIMALS = 6
+
+
+def parse_bbox(value):
+    if not value:
+        return None
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in parts)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def bbox_mask(lons, lats, bbox):
+    if bbox is None:
+        return np.ones(len(lons), dtype=bool)
+    min_lon, min_lat, max_lon, max_lat = bbox
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    return (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+
+
+def _line_feature(coords, properties, tolerance_m, bbox):
+    route = simplify.route_geometry(coords)
+    simplified = route.at_tolerance(tolerance_m)
+    geometry = shapely.linestrings(simplified) if len(simplified) > 1 else None
+    if geometry is not None and bbox is not None:
+        geometry = shapely.clip_by_rect(geometry, *bbox)
+        if geometry.is_empty:
+            return None
+    if geometry is None:
+        return None
+
+    geometry = shapely.transform(geometry, lambda xy: np.round(xy, COORD_DECIMALS))
+    geojson = json.loads(shapely.to_geojson(geometry))
+    properties.update({
+        "distance_km": round(route.length_m / 1000, 2),
+        "points": len(route.coords),
+        "rendered_points": int(shapely.get_num_coordinates(geometry)),
+        "level_m": simplify.level_for_tolerance(tolerance_m)
+    })
+    return {"type": "Feature", "geometry": geojson, "properties": properties}
+
+
+def _point_features(frame, columns):
+    features = []
+    for record in frame.to_dict('records'):
+        properties = {}
+        for key, column in columns.items():
+            value = record.get(column)
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                continue
+            if isinstance(value, pd.Timestamp):
+                value = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, np.generic):
+                value = value.item()
+            properties[key] = value
+        features.append({
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [round(float(record['Longitude']), COORD_DECIMALS),
+                                round(float(record['Latitude']), COORD_DECIMALS)]
+            },
+            "properties": properties
+        })
+    return features
+
+
+def _collection(features):
+    return {"type": "FeatureCollection", "features": features}
+
+
+def to_compact(collection):
+    features = collection["features"]
+    keys = sorted({key for feature in features for key in feature["properties"]})
+    return {
+        "columns": keys,
+        "geometry": [feature["geometry"]["coordinates"] for feature in features],
+        "rows": [[feature["properties"].get(key) for key in keys] for feature in features]
+    }
+
+
+def customer_points_layer(points_path, vehicle_ids, weekdays, bbox=None, vehicle_colors=None):
+    if not points_path or not os.path.exists(points_path):
+        return _collection([])
+    points = load_and_process_customer_points(points_path)
+    points = points[points['Vehicle No'].astype(str).isin(vehicle_ids) & points['Weekday'].isin(weekdays)]
+    points = points[bbox_mask(points['Longitude'], points['Latitude'], bbox)]
+    if points.empty:
+        return _collection([])
+
+    points = resolve_customer_points(points, vehicle_colors or assign_vehicle_colors(vehicle_ids, weekdays))
+    return _collection(_point_features(points, {
+        "vehicle": "vehicle",
+        "alias": "alias",
+        "weekday": "Weekday",
+        "color": "color",
+        "stop_count": "StopCount",
+        "cluster": "GeoCluster",
+        "customer_id": "customer_id",
+        "customer_name": "customer_name",
+        "contact": "customer_contact",
+        "address": "display_address",
+        "first_visit": "FirstVisit",
+        "last_visit": "LastVisit"
+    }))
+
+
+def stop_points_layer(csv_path, vehicle_ids, t_start, t_end, bbox=None, vehicle_colors=None):
+    stops = extract_stop_points(csv_path, vehicle_ids, t_start, t_end)
+    if stops.empty:
+        return _collection([])
+    stops = stops[bbox_mask(stops['Longitude'], stops['Latitude'], bbox)].copy()
+    aliases = load_vehicle_aliases()
+    vehicle_colors = vehicle_colors or {}
+    stops['vehicle'] = stops['Vehicle No'].astype(str)
+    stops['alias'] = stops['vehicle'].map(aliases).fillna(stops['vehicle'])
+    stops['color'] = stops['vehicle'].map(vehicle_colors).fillna('gray')
+    return _collection(_point_features(stops, {
+        "vehicle": "vehicle",
+        "alias": "alias",
+        "color": "color",
+        "status": "Status",
+        "duration_minutes": "DurationMinutes",
+        "start": "StartTime",
+        "end": "EndTime",
+        "address": "Address"
+    }))
+
+
+def actual_routes_layer(csv_path, vehicle_ids, t_start, t_end, tolerance_m=0.0, bbox=None, vehicle_colors=None):
+    aliases = load_vehicle_aliases()
+    vehicle_colors = vehicle_colors or {}
+    features = []
+    for vehicle_id in vehicle_ids:
+        coords = load_actual_route(csv_path, vehicle_id, t_start, t_end)
+        if len(coords) < 2:
+            continue
+        feature = _line_feature(coords, {
+            "vehicle": vehicle_id,
+            "alias": aliases.get(vehicle_id, vehicle_id),
+            "color": vehicle_colors.get(vehicle_id, 'blue')
+        }, tolerance_m, bbox)
+        if feature:
+            features.append(feature)
+    return _collection(features)
+
+
+def planned_routes_layer(geojson_path, vehicle_ids, weekdays, tolerance_m=0.0, bbox=None, vehicle_colors=None):
+    if not geojson_path or not os.path.exists(geojson_path):
+        return _collection([])
+    with open(geojson_path, encoding="utf-8") as f:
+        geojson_data = json.load(f)
+
+    aliases = load_vehicle_aliases()
+    vehicle_colors = vehicle_colors or {}
+    wanted_days = {day.lower() for day in weekdays}
+    features = []
+    for feature in geojson_data.get("features", []):
+        props = feature.get("properties", {})
+        vehicle_id = str(props.get("vehicle_id", "")).strip()
+        weekday = str(props.get("weekday", "")).strip()
+        if vehicle_id not in vehicle_ids or weekday.lower() not in wanted_days:
+            continue
+        coords = feature["geometry"]["coordinates"]
+        line = _line_feature(coords, {
+            "vehicle": vehicle_id,
+            "alias": aliases.get(vehicle_id, vehicle_id),
+            "weekday": weekday,
+            "color": vehicle_colors.get((vehicle_id, weekday)) or vehicle_colors.get(vehicle_id, 'blue')
+        }, tolerance_m, bbox)
+        if line:
+            features.append(line)
+    return _collection(features)
+
+
+def map_sources(min_duration=None, min_stop_count=None, segment_areas=False):
+    settings = load_settings()
+    if min_duration is None or min_stop_count is None:
+        return settings.get("customer_points_path", ""), settings.get("geojson_path", "")
+    suffix = f"{int(segment_areas)}_min{min_duration}_stop{min_stop_count}"
+    return f"{CUSTOMER_POINTS_DIR}/cust_{suffix}_points.csv", f"{ROUTES_JSON_DIR}/path_{suffix}_routes.geojson"
+
+
+def travel_csv_path(date_val):
+    settings = load_settings()
+    return get_appropriate_csv_path(date_val, settings.get("csv_path_current", ""), settings.get("csv_path_past", ""))
+
+
+def build_map_data(layers, vehicle_ids, weekdays=None, date_val=None, t_start=None, t_end=None, bbox=None,
+                   zoom=None, points_path=None, routes_path=None, output="geojson"):
+    vehicle_ids = [str(v).strip() for v in vehicle_ids if str(v).strip()]
+    if not weekdays and date_val:
+        weekdays = [datetime.strptime(date_val, "%Y-%m-%d").strftime("%A")]
+    weekdays = weekdays or []
+    if date_val:
+        t_start = t_start or f"{date_val} 00:00:00"
+        t_end = t_end or f"{date_val} 23:59:59"
+
+    latitude = (bbox[1] + bbox[3]) / 2 if bbox else simplify.DEFAULT_LATITUDE
+    tolerance_m = simplify.zoom_tolerance_m(zoom, latitude)
+    vehicle_colors = assign_vehicle_colors(vehicle_ids, weekdays)
+    csv_path = travel_csv_path(date_val) if date_val else None
+
+    result = {}
+    for layer in layers:
+        if layer == "customers":
+            result[layer] = customer_points_layer(points_path, vehicle_ids, weekdays, bbox, vehicle_colors)
+        elif layer == "planned":
+            result[layer] = planned_routes_layer(routes_path, vehicle_ids, weekdays, tolerance_m, bbox, vehicle_colors)
+        elif layer == "stops" and csv_path:
+            result[layer] = stop_points_layer(csv_path, vehicle_ids, t_start, t_end, bbox, vehicle_colors)
+        elif layer == "actual" and csv_path:
+            result[layer] = actual_routes_layer(csv_path, vehicle_ids, t_start, t_end, tolerance_m, bbox,
+                                                vehicle_colors)
+
+    if output == "json":
+        result = {layer: to_compact(collection) for layer, collection in result.items()}
+    return {"layers": result, "tolerance_m": round(tolerance_m, 2)}
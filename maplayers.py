@@ -0,0 +1,156 @@
+import pandas as pd
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+
+MARKERCLUSTER_CDN = "https://cdnjs.cloudflare.com/ajax/libs/leaflet.markercluster/1.1.0"
+CLUSTER_OPTIONS = {
+    "chunkedLoading": True,
+    "disableClusteringAtZoom": 15,
+    "spiderfyOnMaxZoom": False,
+    "showCoverageOnHover": False
+}
+
+
+def _text(value, default=''):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return default
+    return str(value)
+
+
+def customer_points_geojson(points, icon_for):
+    icons = []
+    icon_index = {}
+    features = []
+
+    columns = [points[col] if col in points else pd.Series(None, index=points.index) for col in (
+        'Latitude', 'Longitude', 'vehicle', 'alias', 'Weekday', 'color', 'is_custom', 'customer_id',
+        'customer_name', 'customer_contact', 'display_address', 'GeoCluster', 'StopCount', 'FirstVisit', 'LastVisit'
+    )]
+    for (lat, lon, vehicle, alias, weekday, color, is_custom, customer_id, name, contact, address,
+         cluster, stop_count, first_visit, last_visit) in zip(*columns):
+        icon_key = (color, bool(is_custom))
+        if icon_key not in icon_index:
+            icon_index[icon_key] = len(icons)
+            icons.append(icon_for(color, bool(is_custom)))
+
+        properties = {
+            "i": icon_index[icon_key],
+            "v": vehicle,
+            "a": alias,
+            "w": weekday,
+            "n": _text(stop_count)
+        }
+        if is_custom:
+            properties.update({
+                "id": _text(customer_id),
+                "nm": _text(name),
+                "ct": _text(contact)
+            })
+        else:
+            properties.update({
+                "g": _text(cluster),
+                "fv": _text(first_visit, 'N/A'),
+                "lv": _text(last_visit, 'N/A')
+            })
+        properties["ad"] = _text(address, 'Unspecified Location')
+
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+            "properties": properties
+        })
+
+    return {"type": "FeatureCollection", "features": features}, icons
+
+
+class CustomerPointsLayer(JSCSSMixin, MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.markerClusterGroup({{ this.cluster_options|tojson }});
+            (function() {
+                var icons = {{ this.icons|tojson }};
+                var showEdits = {{ this.show_edits_button|tojson }};
+                var esc = function(value) {
+                    return String(value == null ? '' : value).replace(/[&<>"']/g, function(ch) {
+                        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[ch];
+                    });
+                };
+                var line = function(label, value) {
+                    return value ? '<b>' + label + ':</b> ' + esc(value) + '<br>' : '';
+                };
+                var popup = function(p, lat, lon) {
+                    var custom = p.id !== undefined;
+                    var coords = lat.toFixed(6) + ',' + lon.toFixed(6);
+                    var data = 'data-customer-id="' + esc(p.id) + '" data-lat="' + lat + '" data-lon="' + lon +
+                        '" data-vehicle="' + esc(p.v) + '" data-weekday="' + esc(p.w) + '"';
+                    var buttonStyle = 'border: none; padding: 5px 10px; border-radius: 4px; cursor: pointer; ' +
+                        'font-size: 11px; flex: 1; color: white;' + (showEdits ? '' : ' display: none;');
+                    return '<div style="font-family: Arial; font-size: 12px; min-width: 250px;">' +
+                        line('Customer ID', p.id) +
+                        '<b>Vehicle:</b> ' + esc(p.a) + ' (' + esc(p.v) + ')<br>' +
+                        line('Customer', p.nm) +
+                        line('Contact', p.ct) +
+                        line('Cluster', p.g) +
+                        '<b>Day:</b> ' + esc(p.w) + '<br>' +
+                        '<b>Stop Count:</b> ' + esc(p.n) + '<br>' +
+                        line('First Visit', p.fv) +
+                        line('Last Visit', p.lv) +
+                        '<b>Coordinates:</b> ' + lat.toFixed(6) + ', ' + lon.toFixed(6) + '<br>' +
+                        '<b>Map Views:</b><br>' +
+                        '<a href="https://www.google.com/maps?q=' + coords + '" target="_blank">🗺️ View Location on 2D Map</a><br>' +
+                        '<a href="https://www.google.com/maps/@?api=1&map_action=pano&viewpoint=' + coords +
+                        '" target="_blank">🌐 Explore in Street View (Geolocator)</a><br>' +
+                        '<b>Address:</b> ' + esc(p.ad) + '<br>' +
+                        (custom ? '<b><i class="fas fa-star"></i> Custom Point</b><br>' : '') +
+                        '<hr style="margin: 10px 0;">' +
+                        '<div style="display: flex; gap: 8px; flex-wrap: wrap;">' +
+                        '<button class="' + (custom ? 'edit-custom-point-btn' : 'edit-point-btn') + '" ' + data +
+                        ' data-name="' + esc(p.nm) + '" data-contact="' + esc(p.ct) + '" data-description="' + esc(p.ad) +
+                        '" style="background: #007bff; ' + buttonStyle + '"><i class="fas fa-edit"></i> ' +
+                        (custom ? 'Edit Customer' : 'Edit Point') + '</button>' +
+                        '<button class="' + (custom ? 'remove-custom-point-btn' : 'remove-point-btn') + '" ' + data +
+                        ' style="background: #dc3545; ' + buttonStyle + '"><i class="fas fa-trash"></i> ' +
+                        (custom ? 'Remove Customer' : 'Remove Point') + '</button>' +
+                        '</div></div>';
+                };
+                var tooltip = function(p) {
+                    return p.nm ? esc(p.nm) + ' - ' + esc(p.a) + ' - ' + esc(p.w)
+                                : esc(p.a) + ' - ' + esc(p.n) + ' stops - ' + esc(p.w);
+                };
+                L.geoJSON({{ this.data|tojson }}, {
+                    pointToLayer: function(feature, latlng) {
+                        return L.marker(latlng, {
+                            icon: L.divIcon({
+                                html: icons[feature.properties.i],
+                                iconSize: [20, 20],
+                                iconAnchor: [10, 20],
+                                className: 'empty'
+                            })
+                        });
+                    },
+                    onEachFeature: function(feature, layer) {
+                        var p = feature.properties;
+                        var coords = feature.geometry.coordinates;
+                        layer.bindPopup(function() { return popup(p, coords[1], coords[0]); }, {maxWidth: 350});
+                        layer.bindTooltip(function() { return tooltip(p); });
+                    }
+                }).addTo({{ this.get_name() }});
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    default_js = [("markerclusterjs", f"{MARKERCLUSTER_CDN}/leaflet.markercluster.js")]
+    default_css = [
+        ("markerclustercss", f"{MARKERCLUSTER_CDN}/MarkerCluster.css"),
+        ("markerclusterdefaultcss", f"{MARKERCLUSTER_CDN}/MarkerCluster.Default.css")
+    ]
+
+    def __init__(self, data, icons, show_edits_button=True, cluster_options=None):
+        super().__init__()
+        self._name = "CustomerPointsLayer"
+        self.data = data
+        self.icons = icons
+        self.show_edits_button = show_edits_button
+        self.cluster_options = CLUSTER_OPTIONS if cluster_options is None else cluster_options
@@ -1,4 +1,4 @@
-from utils import load_settings, load_vehicle_aliases, load_phone_numbers, generate_route_comparison
+from utils import load_settings, load_vehicle_aliases, load_phone_numbers
 import schedule, subprocess, contextlib, psutil, signal, atexit
 from datetime import datetime, timedelta, timezone
 from datetime import time as dtime
@@ -6,32 +6,38 @@ from flask import Flask, render_template, request, jsonify, send_file
 import os
 import sys
 import pandas as pd
-import requests
 import time
-import json
-import hashlib
 from collections import defaultdict
 import threading
 
+import alertqueue
+import alertrules
+import alertstore
+import changesets
+import comparisoncache
+import jobrunner
+import jobscheduler
+from alertsnapshot import AlertCycleSnapshot
+
 flask_process = None
 whatsapp_process = None
 monitoring_active = True
+delivery_queue = None
+alert_engine = None
+job_runner = None
+job_scheduler = None
 
 IDLE_REPORT_PATH = "data/idlereport/current.csv"
 EXIDLE_REPORT_PATH = "data/exidlereport/current.csv" 
 GEOFENCE_REPORT_PATH = "data/geofence/current.csv"
 DRIVER_PERFORMANCE_PATH = "data/driverperformance/current.csv"
 TRAVEL_REPORT_PATH = "data/travelreport/current.csv"
-ALERT_LOGS_PATH = "alerts/alert_logs.json"
-DRIVER_VIOLATION_LOGS_PATH = "alerts/driver_violations.json"
-ROUTE_DEVIATION_LOGS_PATH = "alerts/route_deviation_logs.json"
-SENT_ALERTS_PATH = "alerts/sent_alerts.json"
-ALERT_CACHE_PATH = "alerts/alert_cache.json"
-
-IDLE_THRESHOLD_MINUTES = 20
-VIOLATION_THRESHOLD = 12
-ROUTE_DEVIATION_THRESHOLD = 4000
-VISIT_PERCENT_THRESHOLD = 50
+ALERT_CHANGES_CONSUMER = "alerts"
+JOB_TIMEOUTS = {
+    "extractdata.extract_all_data": 20 * 60,
+    "formatdata.format_everything": 15 * 60,
+    "preprocess.preprocess_everything": 3 * 60 * 60
+}
 
 def start_whatsapp_job():
     global whatsapp_process
@@ -81,713 +87,46 @@ def whatsapp_restart_job():
 def ensure_alert_directories():
     os.makedirs("alerts", exist_ok=True)
 
-def load_alert_cache():
-    ensure_alert_directories()
-    try:
-        with open(ALERT_CACHE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_alert_cache(cache):
-    ensure_alert_directories()
-    with open(ALERT_CACHE_PATH, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, indent=2)
-
-def generate_alert_hash(alert_type, vehicle_id, additional_data=None):
-    today = datetime.now().strftime('%Y-%m-%d')
-    current_hour = datetime.now().strftime('%H')
-    
-    if alert_type == "IDLE":
-        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "UNAUTHORIZED_GEOFENCE":
-        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "EARLY_RETURN":
-        content = f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
-    elif alert_type == "VIOLATION":
-        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "ROUTE_DEVIATION":
-        content = f"{alert_type}_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    else:
-        content = f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
-    
-    return hashlib.md5(content.encode()).hexdigest()
-
-def is_duplicate_alert(alert_hash):
-    cache = load_alert_cache()
-    current_time = datetime.now()
-    current_key = current_time.strftime('%Y-%m-%d-%H')
-    
-    if alert_hash in cache:
-        last_sent = cache[alert_hash]
-        if last_sent == current_key:
-            return True
-    
-    cache[alert_hash] = current_key
-    
-    expired_keys = []
-    for key, timestamp in cache.items():
-        try:
-            cached_time = datetime.strptime(timestamp, '%Y-%m-%d-%H')
-            if (current_time - cached_time).total_seconds() > 3600:
-                expired_keys.append(key)
-        except:
-            expired_keys.append(key)
-    
-    for key in expired_keys:
-        del cache[key]
-    
-    save_alert_cache(cache)
-    return False
-
-def load_alert_logs():
-    ensure_alert_directories()
-    try:
-        with open(ALERT_LOGS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {
-            "daily_logs": {},
-            "last_cleared": datetime.now().strftime('%Y-%m-%d')
-        }
-
-def save_alert_logs(logs):
-    ensure_alert_directories()
-    with open(ALERT_LOGS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, indent=2)
-
-def load_driver_violations():
-    ensure_alert_directories()
-    try:
-        with open(DRIVER_VIOLATION_LOGS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_driver_violations(violations):
-    ensure_alert_directories()
-    with open(DRIVER_VIOLATION_LOGS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(violations, f, indent=2)
-
-def load_route_deviation_logs():
-    ensure_alert_directories()
-    try:
-        with open(ROUTE_DEVIATION_LOGS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_route_deviation_logs(logs):
-    ensure_alert_directories()
-    with open(ROUTE_DEVIATION_LOGS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, indent=2)
-
-def load_sent_alerts():
-    ensure_alert_directories()
-    try:
-        with open(SENT_ALERTS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_sent_alerts(alerts):
-    ensure_alert_directories()
-    with open(SENT_ALERTS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(alerts, f, indent=2)
-
-def generate_alert_key(alert_type, vehicle_id, additional_data=None):
-    today = datetime.now().strftime('%Y-%m-%d')
-    current_hour = datetime.now().strftime('%H')
-    
-    if alert_type == "IDLE":
-        return f"IDLE_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "UNAUTHORIZED_GEOFENCE":
-        return f"GEOFENCE_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "EARLY_RETURN":
-        return f"EARLY_{vehicle_id}_{today}_{current_hour}"
-    elif alert_type == "VIOLATION":
-        return f"VIOLATION_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    elif alert_type == "ROUTE_DEVIATION":
-        return f"ROUTE_DEV_{vehicle_id}_{additional_data}_{today}_{current_hour}"
-    
-    return f"{alert_type}_{vehicle_id}_{today}_{current_hour}"
-
-def is_alert_already_sent(alert_key):
-    sent_alerts = load_sent_alerts()
-    current_time = datetime.now()
-    
-    if alert_key in sent_alerts:
-        try:
-            last_sent = datetime.strptime(sent_alerts[alert_key], '%Y-%m-%d %H:%M:%S')
-            if (current_time - last_sent).total_seconds() < 3600:
-                return True
-        except:
-            pass
-    
-    return False
-
-def mark_alert_as_sent(alert_key):
-    sent_alerts = load_sent_alerts()
-    sent_alerts[alert_key] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    current_time = datetime.now()
-    expired_keys = []
-    
-    for key, timestamp in sent_alerts.items():
-        try:
-            sent_time = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-            if (current_time - sent_time).total_seconds() > 86400:
-                expired_keys.append(key)
-        except:
-            expired_keys.append(key)
-    
-    for key in expired_keys:
-        del sent_alerts[key]
-    
-    save_sent_alerts(sent_alerts)
-
-def log_alert(alert_type, recipient_phone, recipient_name, message, vehicle_id=None, driver_name=None):
-    logs = load_alert_logs()
-    today = datetime.now().strftime('%Y-%m-%d')
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    if today not in logs["daily_logs"]:
-        logs["daily_logs"][today] = []
-    
-    alert_entry = {
-        "timestamp": current_time,
-        "alert_type": alert_type,
-        "recipient_phone": recipient_phone,
-        "recipient_name": recipient_name,
-        "message": message,
-        "vehicle_id": vehicle_id,
-        "driver_name": driver_name
-    }
-    
-    logs["daily_logs"][today].append(alert_entry)
-    save_alert_logs(logs)
-
 def clear_old_logs():
-    logs = load_alert_logs()
-    current_date = datetime.now()
-    
-    keys_to_delete = []
-    for date_key in logs["daily_logs"].keys():
-        try:
-            log_date = datetime.strptime(date_key, '%Y-%m-%d')
-            if (current_date - log_date).days > 7:
-                keys_to_delete.append(date_key)
-        except:
-            keys_to_delete.append(date_key)
-    
-    for key in keys_to_delete:
-        del logs["daily_logs"][key]
-    
-    logs["last_cleared"] = current_date.strftime('%Y-%m-%d')
-    save_alert_logs(logs)
-    
-    save_route_deviation_logs({})
-    save_sent_alerts({})
-    save_alert_cache({})
-    print("DEBUG: Alert logs cleared")
-
-def get_vehicle_location(vehicle_id):
-    try:
-        df = pd.read_csv(TRAVEL_REPORT_PATH, dtype={
-            'Vehicle No': str,
-            'Status': str,
-            'Address': str,
-            'Speed': float,
-            'Odometer': float,
-            'Panic': str,
-            'Latitude': float,
-            'Longitude': float
-        }, parse_dates=['DateTime'])
-        
-        vehicle_data = df[df['Vehicle No'] == str(vehicle_id)].sort_values('DateTime', ascending=False)
-        if not vehicle_data.empty:
-            latest = vehicle_data.iloc[0]
-            return {
-                'latitude': latest['Latitude'],
-                'longitude': latest['Longitude'],
-                'address': latest['Address']
-            }
-    except Exception as e:
-        print(f"DEBUG: Error getting vehicle location: {e}")
-    return None
-
-def create_google_maps_link(latitude, longitude, link_type="map"):
-    if link_type == "street":
-        return f"https://www.google.com/maps/@?api=1&map_action=pano&viewpoint={latitude},{longitude}"
-    else:
-        return f"https://www.google.com/maps/@?api=1&map_action=map&center={latitude},{longitude}&zoom=15"
-
-def send_whatsapp_alert(phone_number, message):
-    try:
-        settings = load_settings()
-        whatsapp_url = settings.get('whatsapp_server_url')
-        if not whatsapp_url:
-            return False
-        
-        response = requests.post(
-            f"{whatsapp_url}/send-text",
-            json={
-                "number": phone_number + "@c.us",
-                "message": message
-            },
-            timeout=30
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"DEBUG: WhatsApp send error: {e}")
-        return False
-
-def check_idle_alerts():
-    try:
-        if not os.path.exists(EXIDLE_REPORT_PATH):
-            return True
-            
-        df = pd.read_csv(EXIDLE_REPORT_PATH, dtype={
-            'Vehicle Number': str,
-            'Vehicle Model': str,
-            'Driver': str,
-            'Location': str
-        }, parse_dates=['Idle From', 'Idle Till'])
-        
-        if df.empty:
-            return True
-        
-        df['Duration'] = pd.to_timedelta(df['Duration'])
-        idle_threshold = timedelta(minutes=IDLE_THRESHOLD_MINUTES)
-        
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
-        
-        for _, row in df.iterrows():
-            if row['Duration'] > idle_threshold:
-                vehicle_id = str(row['Vehicle Number'])
-                alias = vehicle_aliases.get(vehicle_id, vehicle_id)
-                
-                idle_from_str = row['Idle From'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['Idle From']) else 'N/A'
-                alert_hash = generate_alert_hash("IDLE", vehicle_id, idle_from_str)
-                
-                if is_duplicate_alert(alert_hash):
-                    continue
-                
-                alert_key = generate_alert_key("IDLE", vehicle_id, idle_from_str)
-                
-                if is_alert_already_sent(alert_key):
-                    continue
-                
-                location_info = get_vehicle_location(vehicle_id)
-                location_text = row['Location']
-                
-                if location_info and pd.notna(location_info['latitude']) and pd.notna(location_info['longitude']):
-                    maps_link = create_google_maps_link(location_info['latitude'], location_info['longitude'])
-                    street_link = create_google_maps_link(location_info['latitude'], location_info['longitude'], "street")
-                    location_text = f"{location_info['address']}\nMAP: {maps_link}\nSTREET: {street_link}"
-                
-                duration_str = str(row['Duration']).split('.')[0]
-                idle_from = row['Idle From'].strftime('%H:%M') if pd.notna(row['Idle From']) else 'N/A'
-                idle_till = row['Idle Till'].strftime('%H:%M') if pd.notna(row['Idle Till']) else 'N/A'
-                
-                message = f"🚨 IDLE ALERT\n{alias} stopped {duration_str}\nFrom: {idle_from} To: {idle_till}\nAt: {location_text}"
-                
-                alert_sent = False
-                for contact in phone_numbers['phone_numbers']:
-                    if contact['category'] == 'Admin' and contact.get('alerts', False):
-                        if send_whatsapp_alert(contact['phone'], message):
-                            log_alert("IDLE", contact['phone'], contact['name'], message, vehicle_id, row['Driver'])
-                            alert_sent = True
-                    
-                    elif (contact['category'] == 'Driver' and 
-                          contact.get('vehicle_id') == vehicle_id and 
-                          contact.get('alerts', False)):
-                        if send_whatsapp_alert(contact['phone'], message):
-                            log_alert("IDLE", contact['phone'], contact['name'], message, vehicle_id, row['Driver'])
-                            alert_sent = True
-                
-                if alert_sent:
-                    mark_alert_as_sent(alert_key)
-        
-        return True
-    except Exception as e:
-        print(f"DEBUG: Idle alerts error: {e}")
-        return False
-
-def check_driver_performance_alerts():
-    try:
-        if not os.path.exists(DRIVER_PERFORMANCE_PATH):
-            return True
-            
-        df = pd.read_csv(DRIVER_PERFORMANCE_PATH, dtype={
-            'Driver': str,
-            'No of Vehicles': str,
-            'KM': float,
-            'Harsh Break': 'Int64',
-            'Harsh Acceleration': 'Int64',
-            'Over Speed': 'Int64',
-            'Max Speed': 'Int64',
-            'Exceed Road Speed': str
-        }, parse_dates=['Login Time', 'Logout Time'])
-        
-        if df.empty:
-            return True
-        
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
-        violation_logs = load_driver_violations()
-        
-        for _, row in df.iterrows():
-            driver_name = row['Driver']
-            vehicle_id = str(row['No of Vehicles'])
-            
-            harsh_braking = int(row['Harsh Break']) if pd.notna(row['Harsh Break']) else 0
-            harsh_accel = int(row['Harsh Acceleration']) if pd.notna(row['Harsh Acceleration']) else 0
-            over_speed = int(row['Over Speed']) if pd.notna(row['Over Speed']) else 0
-            
-            total_violations = harsh_braking + harsh_accel + over_speed
-            
-            if total_violations > VIOLATION_THRESHOLD:
-                alert_hash = generate_alert_hash("VIOLATION", vehicle_id, total_violations)
-                
-                if is_duplicate_alert(alert_hash):
-                    continue
-                
-                alert_key = generate_alert_key("VIOLATION", vehicle_id, total_violations)
-                
-                if is_alert_already_sent(alert_key):
-                    continue
-                
-                driver_key = f"{driver_name}_{vehicle_id}"
-                previous_violations = violation_logs.get(driver_key, 0)
-                
-                if total_violations > previous_violations:
-                    violation_logs[driver_key] = total_violations
-                    save_driver_violations(violation_logs)
-                    
-                    message = (f"⚠️ VIOLATION ALERT\n{driver_name} ({vehicle_aliases.get(vehicle_id, vehicle_id)})\n"
-                             f"Total: {total_violations} (HB:{harsh_braking} HA:{harsh_accel} OS:{over_speed})")
-                    
-                    alert_sent = False
-                    for contact in phone_numbers['phone_numbers']:
-                        if contact['category'] == 'Admin' and contact.get('alerts', False):
-                            if send_whatsapp_alert(contact['phone'], message):
-                                log_alert("VIOLATION", contact['phone'], contact['name'], message, vehicle_id, driver_name)
-                                alert_sent = True
-                        elif (contact['category'] == 'Driver' and 
-                              contact.get('vehicle_id') == vehicle_id and 
-                              contact.get('alerts', False)):
-                            if send_whatsapp_alert(contact['phone'], message):
-                                log_alert("VIOLATION", contact['phone'], contact['name'], message, vehicle_id, driver_name)
-                                alert_sent = True
-                    
-                    if alert_sent:
-                        mark_alert_as_sent(alert_key)
-        
-        return True
-    except Exception as e:
-        print(f"DEBUG: Performance alerts error: {e}")
-        return False
-
-def check_route_deviation_alerts():
+    removed = alertstore.clear_old_entries()
+    get_delivery_queue().purge_before(alertstore.ALERT_LOG_RETENTION_DAYS * 86400)
+    alertrules.save_route_deviation_logs({})
+    print(f"DEBUG: Alert logs cleared ({removed} old entries removed)")
+
+def get_delivery_queue():
+    global delivery_queue
+    if delivery_queue is None:
+        delivery_queue = alertqueue.DeliveryQueue()
+    return delivery_queue
+
+def get_alert_engine():
+    global alert_engine
+    if alert_engine is None:
+        alert_engine = alertrules.AlertEngine(queue_whatsapp_alert)
+    return alert_engine
+
+def queue_whatsapp_alert(contact, message, alert_type, vehicle_id=None, driver_name=None):
     try:
-        now_utc = datetime.now(timezone.utc)
-        uae_now = (now_utc + timedelta(hours=4)).strftime('%Y-%m-%d')
-        
-        vehicle_ids = list(load_vehicle_aliases().keys())
-        settings = load_settings()
-        
-        map_html, comparison_data = generate_route_comparison(
-            vehicle_ids=vehicle_ids,
-            csv_path_current=settings["csv_path_current"],
-            csv_path_past=settings["csv_path_past"],
-            geojson_path=settings["geojson_path"],
-            date_current=uae_now,
-            t_start_current="00:00:00",
-            t_end_current="23:59:59",
-            date_past=None,
-            t_start_past=None,
-            t_end_past=None,
-            generate_map=False
-        )
-        
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
-        deviation_logs = load_route_deviation_logs()
-        
-        for key, stats in comparison_data.items():
-            vehicle_id = key[:-8] if key.endswith('_Current') else key
-            if vehicle_id not in vehicle_aliases:
-                continue
-                
-            max_dev = stats.get('maximum_route_deviation', 0)
-            visit_percent = stats.get('visit_percentage', 0.0)
-            route_alignment = stats.get('actual_route_alignment', 0)
-            route_coverage = stats.get('planned_route_coverage', 0)
-            actual_km = stats.get('actual_distance', 0)
-            planned_km = stats.get('planned_distance', 0)
-            
-            if max_dev > ROUTE_DEVIATION_THRESHOLD:
-                alert_hash = generate_alert_hash("ROUTE_DEVIATION", vehicle_id, max_dev)
-                
-                if is_duplicate_alert(alert_hash):
-                    continue
-                
-                alert_key = generate_alert_key("ROUTE_DEVIATION", vehicle_id, max_dev)
-                
-                if is_alert_already_sent(alert_key):
-                    continue
-                
-                vehicle_key = f"{vehicle_id}_{uae_now}"
-                
-                if vehicle_key not in deviation_logs:
-                    deviation_logs[vehicle_key] = max_dev
-                    save_route_deviation_logs(deviation_logs)
-                    
-                    alias = vehicle_aliases[vehicle_id]
-                    message = (f"🛤️ ROUTE DEVIATION\n{alias} exceeded {ROUTE_DEVIATION_THRESHOLD}m\n"
-                             f"Max deviation: {max_dev:.0f}m\n"
-                             f"Route alignment: {route_alignment:.1f}%\n"
-                             f"Route coverage: {route_coverage:.1f}%\n"
-                             f"Distance: {actual_km:.1f}km (Planned: {planned_km:.1f}km)\n"
-                             f"Visits: {stats.get('visited_customer_points', 0)}/{stats.get('total_customer_points', 0)} ({visit_percent:.1f}%)")
-                    
-                    alert_sent = False
-                    for contact in phone_numbers['phone_numbers']:
-                        if contact['category'] == 'Admin' and contact.get('alerts', False):
-                            if send_whatsapp_alert(contact['phone'], message):
-                                log_alert("ROUTE_DEVIATION", contact['phone'], contact['name'], message, vehicle_id)
-                                alert_sent = True
-                    
-                    if alert_sent:
-                        mark_alert_as_sent(alert_key)
-        
+        get_delivery_queue().enqueue(contact['phone'], message, contact['name'], alert_type, vehicle_id, driver_name)
         return True
     except Exception as e:
-        print(f"DEBUG: Route deviation alerts error: {e}")
+        print(f"DEBUG: WhatsApp enqueue error: {e}")
         return False
 
-def check_early_return_alerts():
-    try:
-        if not os.path.exists(GEOFENCE_REPORT_PATH):
-            return True
-            
-        df = pd.read_csv(GEOFENCE_REPORT_PATH, dtype={
-            'Vehicle No': str,
-            'Driver': str,
-            'Geofence': str,
-            'Type': str
-        }, parse_dates=['In Time', 'Out Time'])
-        
-        if df.empty:
-            return True
-        
-        if not os.path.exists(DRIVER_PERFORMANCE_PATH):
-            return True
-            
-        performance_df = pd.read_csv(DRIVER_PERFORMANCE_PATH, dtype={
-            'Driver': str,
-            'No of Vehicles': str,
-            'KM': float,
-            'Harsh Break': 'Int64',
-            'Harsh Acceleration': 'Int64',
-            'Over Speed': 'Int64'
-        }, parse_dates=['Login Time', 'Logout Time'])
-        
-        current_time = datetime.now()
-        
-        if not (9 <= current_time.hour < 16):
-            return True
-            
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
-        
-        for _, row in df.iterrows():
-            if (row['Geofence'] == 'Oxy Office' and 
-                pd.notna(row['In Time']) and pd.notna(row['Out Time'])):
-                
-                vehicle_id = str(row['Vehicle No'])
-                driver_name = row['Driver']
-                
-                in_time = pd.to_datetime(row['In Time'])
-                out_time = pd.to_datetime(row['Out Time'])
-                
-                if (out_time.hour >= 9 and in_time.hour < 16 and 
-                    in_time.date() == out_time.date()):
-                    
-                    alert_hash = generate_alert_hash("EARLY_RETURN", vehicle_id, in_time.strftime('%Y-%m-%d %H:%M'))
-                    
-                    if is_duplicate_alert(alert_hash):
-                        continue
-                    
-                    early_return_key = generate_alert_key("EARLY_RETURN", vehicle_id, in_time.strftime('%Y-%m-%d %H:%M'))
-                    
-                    if is_alert_already_sent(early_return_key):
-                        continue
-                    
-                    perf_row = performance_df[performance_df['No of Vehicles'] == vehicle_id]
-                    if not perf_row.empty:
-                        perf = perf_row.iloc[0]
-                        
-                        uae_now = current_time.strftime('%Y-%m-%d')
-                        settings = load_settings()
-                        
-                        _, comparison_data = generate_route_comparison(
-                            vehicle_ids=[vehicle_id],
-                            csv_path_current=settings["csv_path_current"],
-                            csv_path_past=settings["csv_path_past"],
-                            geojson_path=settings["geojson_path"],
-                            date_current=uae_now,
-                            t_start_current="00:00:00",
-                            t_end_current="23:59:59",
-                            date_past=None,
-                            t_start_past=None,
-                            t_end_past=None,
-                            generate_map=False
-                        )
-                        
-                        customers_visited = 0
-                        comparison_key = f"{vehicle_id}_Current"
-                        if comparison_key in comparison_data:
-                            customers_visited = comparison_data[comparison_key].get('visited_customer_points', 0)
-                        
-                        alias = vehicle_aliases.get(vehicle_id, vehicle_id)
-                        hb = int(perf['Harsh Break']) if pd.notna(perf['Harsh Break']) else 0
-                        ha = int(perf['Harsh Acceleration']) if pd.notna(perf['Harsh Acceleration']) else 0
-                        overspeed = int(perf['Over Speed']) if pd.notna(perf['Over Speed']) else 0
-                        
-                        message = (f"⏰ EARLY RETURN\n{alias} ({driver_name}) returned at {in_time.strftime('%H:%M')}\n"
-                                 f"Customers: {customers_visited}\nViolations: HB:{hb} HA:{ha} OS:{overspeed}")
-                        
-                        alert_sent = False
-                        for contact in phone_numbers['phone_numbers']:
-                            if contact['category'] == 'Admin' and contact.get('alerts', False):
-                                if send_whatsapp_alert(contact['phone'], message):
-                                    log_alert("EARLY_RETURN", contact['phone'], contact['name'], message, vehicle_id, driver_name)
-                                    alert_sent = True
-                        
-                        if alert_sent:
-                            mark_alert_as_sent(early_return_key)
-        
-        return True
-    except Exception as e:
-        print(f"DEBUG: Early return alerts error: {e}")
-        return False
-
-def check_unauthorized_geofence_alerts():
-    try:
-        if not os.path.exists(GEOFENCE_REPORT_PATH):
-            return True
-            
-        df = pd.read_csv(GEOFENCE_REPORT_PATH, dtype={
-            'Vehicle No': str,
-            'Driver': str,
-            'Geofence': str,
-            'Type': str,
-            'Elapsed Time Inside The Geofence': str
-        }, parse_dates=['In Time', 'Out Time'])
-        
-        if df.empty:
-            return True
-        
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
-        authorized_geofences = ['Oxy Office', 'Staff Accomodation']
-        
-        for _, row in df.iterrows():
-            if (pd.isna(row['Out Time']) and 
-                row['Geofence'] not in authorized_geofences and
-                pd.notna(row['Geofence'])):
-                
-                vehicle_id = str(row['Vehicle No'])
-                geofence_name = row['Geofence']
-                in_time_str = row['In Time'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['In Time']) else 'N/A'
-                
-                alert_hash = generate_alert_hash("UNAUTHORIZED_GEOFENCE", vehicle_id, f"{geofence_name}_{in_time_str}")
-                
-                if is_duplicate_alert(alert_hash):
-                    continue
-                
-                alert_key = generate_alert_key("UNAUTHORIZED_GEOFENCE", vehicle_id, f"{geofence_name}_{in_time_str}")
-                
-                if is_alert_already_sent(alert_key):
-                    continue
-                
-                alias = vehicle_aliases.get(vehicle_id, vehicle_id)
-                driver_name = row['Driver']
-                
-                location_info = get_vehicle_location(vehicle_id)
-                location_text = geofence_name
-                
-                if location_info and pd.notna(location_info['latitude']) and pd.notna(location_info['longitude']):
-                    maps_link = create_google_maps_link(location_info['latitude'], location_info['longitude'])
-                    street_link = create_google_maps_link(location_info['latitude'], location_info['longitude'], "street")
-                    location_text = f"{geofence_name}\nMAP: {maps_link}\nSTREET: {street_link}"
-                
-                in_time = row['In Time'].strftime('%H:%M') if pd.notna(row['In Time']) else 'Unknown'
-                elapsed_time = row['Elapsed Time Inside The Geofence'] if pd.notna(row['Elapsed Time Inside The Geofence']) else 'Unknown'
-                
-                message = f"🚩 UNAUTHORIZED AREA\n{alias} ({driver_name}) in competitor area\nLocation: {location_text}\nSince: {in_time}\nDuration: {elapsed_time}"
-                
-                alert_sent = False
-                for contact in phone_numbers['phone_numbers']:
-                    if contact['category'] == 'Admin' and contact.get('alerts', False):
-                        if send_whatsapp_alert(contact['phone'], message):
-                            log_alert("UNAUTHORIZED_GEOFENCE", contact['phone'], contact['name'], message, vehicle_id, driver_name)
-                            alert_sent = True
-                    
-                    elif (contact['category'] == 'Driver' and 
-                          contact.get('vehicle_id') == vehicle_id and 
-                          contact.get('alerts', False)):
-                        if send_whatsapp_alert(contact['phone'], message):
-                            log_alert("UNAUTHORIZED_GEOFENCE", contact['phone'], contact['name'], message, vehicle_id, driver_name)
-                            alert_sent = True
-                
-                if alert_sent:
-                    mark_alert_as_sent(alert_key)
-        
-        return True
-    except Exception as e:
-        print(f"DEBUG: Unauthorized geofence alerts error: {e}")
-        return False
-
-def generate_daily_report():
+def generate_daily_report(snapshot=None):
     try:
+        snapshot = snapshot or AlertCycleSnapshot()
         now_utc = datetime.now(timezone.utc)
         uae_now = (now_utc + timedelta(hours=4)).strftime('%Y-%m-%d')
         
         if not os.path.exists(DRIVER_PERFORMANCE_PATH):
             return True
         
-        performance_df = pd.read_csv(DRIVER_PERFORMANCE_PATH, dtype={
-            'Driver': str,
-            'No of Vehicles': str,
-            'KM': float,
-            'Harsh Break': 'Int64',
-            'Harsh Acceleration': 'Int64',
-            'Over Speed': 'Int64'
-        }, parse_dates=['Login Time', 'Logout Time'])
+        vehicle_aliases = snapshot.vehicle_aliases
+        phone_numbers = snapshot.phone_numbers
+        vehicle_ids = list(vehicle_aliases.keys())
         
-        vehicle_ids = list(load_vehicle_aliases().keys())
-        settings = load_settings()
-        
-        _, comparison_data = generate_route_comparison(
-            vehicle_ids=vehicle_ids,
-            csv_path_current=settings["csv_path_current"],
-            csv_path_past=settings["csv_path_past"],
-            geojson_path=settings["geojson_path"],
-            date_current=uae_now,
-            t_start_current="00:00:00",
-            t_end_current="23:59:59",
-            date_past=None,
-            t_start_past=None,
-            t_end_past=None,
-            generate_map=False
-        )
-        
-        vehicle_aliases = load_vehicle_aliases()
-        phone_numbers = load_phone_numbers()
+        comparison_data = comparisoncache.get_planned_comparison(vehicle_ids, uae_now, snapshot.settings)
         
         report_lines = [f"📊 DAILY REPORT - {uae_now}"]
         report_lines.append("=" * 40)
@@ -815,7 +154,7 @@ def generate_daily_report():
                 planned_km = stats.get('planned_distance', 0)
             
             violations_text = "None"
-            perf_row = performance_df[performance_df['No of Vehicles'] == vehicle_id]
+            perf_row = snapshot.rows_for_vehicle("driverperformance", vehicle_id)
             if not perf_row.empty:
                 row = perf_row.iloc[0]
                 hb = int(row['Harsh Break']) if pd.notna(row['Harsh Break']) else 0
@@ -835,33 +174,35 @@ def generate_daily_report():
         
         for contact in phone_numbers['phone_numbers']:
             if contact['category'] == 'Admin' and contact.get('alerts', False):
-                if send_whatsapp_alert(contact['phone'], report_message):
-                    log_alert("DAILY_REPORT", contact['phone'], contact['name'], report_message)
+                queue_whatsapp_alert(contact, report_message, "DAILY_REPORT")
         
         return True
     except Exception as e:
         print(f"DEBUG: Daily report error: {e}")
         return False
 
-def run_script_safely(module_name, func_name, *args):
+def get_job_runner():
+    global job_runner
+    if job_runner is None:
+        job_runner = jobrunner.JobRunner()
+        job_runner.start()
+    return job_runner
+
+def run_job(module_name, func_name, *args):
+    name = f"{module_name}.{func_name}"
     try:
-        args_str = ", ".join(repr(arg) for arg in args)
-        command = f'from {module_name} import {func_name}; {func_name}({args_str})'
-        result = subprocess.run(
-            [sys.executable, "-c", command],
-            capture_output=False,
-            text=True,
-            check=True
-        )
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Subprocess failed with exit code {e.returncode}")
-        return False
+        result = get_job_runner().run(module_name, func_name, *args, timeout=JOB_TIMEOUTS.get(name), name=name)
     except Exception as e:
-        print(f"ERROR: Script execution failed: {e}")
-        return False
+        print(f"ERROR: Job runner failed for {name}: {e}")
+        return {"name": name, "status": "failed", "error": str(e), "duration": 0.0}
+    if result["status"] == "failed" and result.get("traceback"):
+        print(f"ERROR: {name} raised:\n{result['traceback']}")
+    return result
 
-def data_extraction_and_formatting_job():
+def run_script_safely(module_name, func_name, *args):
+    return run_job(module_name, func_name, *args)["status"] == "success"
+
+def extraction_job():
     current_time = datetime.now().time()
     quiet_start = dtime(1, 0)
     quiet_end = dtime(8, 0)
@@ -869,22 +210,42 @@ def data_extraction_and_formatting_job():
     if quiet_start <= current_time < quiet_end:
         print("DEBUG: Skipping extraction job execution due to quiet hours [1 AM - 8 AM]")
         print(f"DEBUG: Current time is {current_time}")
-        return False
+        return {"status": "skipped", "error": "quiet hours"}
 
     print("DEBUG: Starting data extraction")
-    success1 = run_script_safely('extractdata', 'extract_all_data')
-    print(f"DEBUG: Data extraction {'completed' if success1 else 'failed'}")
-    
-    if success1:
-        print("DEBUG: Starting data formatting")
-        success2 = run_script_safely('formatdata', 'format_everything')
-        print(f"DEBUG: Data formatting {'completed' if success2 else 'failed'}")
-        return success2
-    return False
+    result = run_job('extractdata', 'extract_all_data')
+    print(f"DEBUG: Data extraction {'completed' if result['status'] == 'success' else 'failed'}")
+    return result
+
+def formatting_job():
+    print("DEBUG: Starting data formatting")
+    result = run_job('formatdata', 'format_everything')
+    print(f"DEBUG: Data formatting {'completed' if result['status'] == 'success' else 'failed'}")
+    if isinstance(result.get("result"), dict):
+        result["rows"] = result["result"].get("rows")
+    return result
+
+def alert_job_outcome(results):
+    failed = [name for name, result in results.items() if result is False]
+    return {
+        "status": "failed" if failed else "success",
+        "rows": sum(result for result in results.values() if result is not False),
+        "error": f"rules failed: {', '.join(failed)}" if failed else None
+    }
+
+def alert_changes_job():
+    if in_alert_quiet_hours():
+        return {"status": "skipped", "error": "alert quiet hours"}
+    results = process_alert_changes()
+    return alert_job_outcome(results)
+
+def data_extraction_and_formatting_job():
+    return get_job_scheduler().run("extract") == "success"
 
 def preprocessing_job():
-    success = run_script_safely('preprocess', 'preprocess_everything', 70)
-    print(f"DEBUG: Preprocessing {'completed' if success else 'failed'}")
+    result = run_job('preprocess', 'preprocess_everything', 70)
+    print(f"DEBUG: Preprocessing {'completed' if result['status'] == 'success' else 'failed'}")
+    return result
 
 def whatsapp_clean_job():
     print("DEBUG: Running WhatsApp clean job")
@@ -900,25 +261,64 @@ def whatsapp_clean_job():
     except Exception as e:
         print(f"DEBUG: WhatsApp clean job failed silently: {e}")
 
-def alert_monitoring_job():
+def in_alert_quiet_hours():
     current_time = datetime.now().time()
     quiet_start = dtime(21, 0)
     quiet_end = dtime(9, 0)
+    return quiet_start <= current_time or current_time < quiet_end
+
+def process_alert_changes():
+    change_files = {}
+    sequences = {}
+    try:
+        for report in alertrules.CHANGE_SOURCES:
+            pending, _ = changesets.pending_change_sets(ALERT_CHANGES_CONSUMER, report)
+            if pending:
+                change_files[report] = [path for _, path in pending]
+                sequences[report] = max(sequence for sequence, _ in pending)
+    except Exception as e:
+        print(f"DEBUG: Failed to read alert change sets: {e}")
+        return {}
+    
+    if not change_files:
+        return {}
+    
+    snapshot = AlertCycleSnapshot(change_files=change_files)
+    engine = get_alert_engine()
+    try:
+        results = engine.run_changes(snapshot)
+    except Exception as e:
+        print(f"DEBUG: Alert change evaluation error: {e}")
+        return {}
+    
+    failed_sources = {rule.source for rule in engine.rules if results.get(rule.name) is False}
+    for report, sequence in sequences.items():
+        if report not in failed_sources:
+            changesets.commit_watermark(ALERT_CHANGES_CONSUMER, report, sequence)
+    
+    summary = ", ".join(f"{name}:{result}" for name, result in results.items()) or "no rules matched"
+    changed = ", ".join(f"{report}:{len(snapshot.changed_rows(report))}" for report in change_files)
+    print(f"DEBUG: Alert change sets processed ({changed}) - {summary} ({snapshot.summary()})")
+    return results
 
-    if quiet_start <= current_time or current_time < quiet_end:
+def alert_monitoring_job():
+    if in_alert_quiet_hours():
         print("DEBUG: Skipping alert monitoring due to quiet hours [9 PM - 9 AM]")
-        return
+        return {"status": "skipped", "error": "alert quiet hours"}
 
     print("DEBUG: Starting alert monitoring")
+    snapshot = AlertCycleSnapshot()
     
-    idle_alerts = check_idle_alerts()
-    performance_alerts = check_driver_performance_alerts()
-    route_alerts = check_route_deviation_alerts()
-    early_return_alerts = check_early_return_alerts()
-    geofence_alerts = check_unauthorized_geofence_alerts()
+    try:
+        sources = set(alertrules.SOURCES) - set(alertrules.CHANGE_SOURCES)
+        results = get_alert_engine().run_cycle(snapshot, sources=sources)
+    except Exception as e:
+        print(f"DEBUG: Alert rule engine error: {e}")
+        return {"status": "failed", "error": str(e)}
     
-    print(f"DEBUG: Alert monitoring completed - idle:{idle_alerts}, performance:{performance_alerts}, "
-          f"route:{route_alerts}, early_return:{early_return_alerts}, geofence:{geofence_alerts}")
+    summary = ", ".join(f"{name}:{result}" for name, result in results.items()) or "no rules due"
+    print(f"DEBUG: Alert monitoring completed - {summary} ({snapshot.summary()})")
+    return alert_job_outcome(results)
 
 def start_flask_app():
     global flask_process
@@ -1017,6 +417,10 @@ def cleanup_handler(signum, frame):
     global monitoring_active
     print("DEBUG: Received shutdown signal, cleaning up...")
     monitoring_active = False
+    if delivery_queue is not None:
+        delivery_queue.stop()
+    if job_runner is not None:
+        job_runner.shutdown()
     stop_flask_app()
     sys.exit(0)
 
@@ -1050,17 +454,35 @@ def initialize_system():
     start_whatsapp_job()
     return True
 
+def get_job_scheduler():
+    global job_scheduler
+    if job_scheduler is None:
+        job_scheduler = jobscheduler.JobScheduler()
+        job_scheduler.add("extract", extraction_job, locks=("data",))
+        job_scheduler.add("format", formatting_job, depends_on=("extract",), locks=("data",), triggered=True)
+        job_scheduler.add("alert_changes", alert_changes_job, depends_on=("format",), locks=("alerts",),
+                          triggered=True)
+        job_scheduler.add("alert_monitoring", alert_monitoring_job, depends_on=("format",), locks=("alerts",))
+        job_scheduler.add("preprocess", preprocessing_job, locks=("data",))
+        job_scheduler.add("whatsapp_clean", whatsapp_clean_job, locks=("whatsapp",))
+        job_scheduler.add("whatsapp_restart", whatsapp_restart_job, locks=("whatsapp",))
+        job_scheduler.add("clear_old_logs", clear_old_logs, locks=("alerts",))
+        job_scheduler.add("flask_restart", flask_restart_job)
+        job_scheduler.add("daily_report", generate_daily_report, locks=("alerts",))
+    return job_scheduler
+
 def schedule_jobs():
     print("DEBUG: Scheduling jobs...")
     
-    schedule.every(15).minutes.do(data_extraction_and_formatting_job)
-    schedule.every(10).minutes.do(alert_monitoring_job)
-    schedule.every(72).hours.do(whatsapp_clean_job)
-    schedule.every(60).minutes.do(whatsapp_restart_job)
-    schedule.every().day.at("01:00").do(preprocessing_job)
-    schedule.every().day.at("07:00").do(clear_old_logs)
-    schedule.every().day.at("08:00").do(flask_restart_job)
-    schedule.every().day.at("21:30").do(generate_daily_report)
+    scheduler = get_job_scheduler()
+    schedule.every(15).minutes.do(scheduler.submit, "extract")
+    schedule.every(10).minutes.do(scheduler.submit, "alert_monitoring")
+    schedule.every(72).hours.do(scheduler.submit, "whatsapp_clean")
+    schedule.every(60).minutes.do(scheduler.submit, "whatsapp_restart")
+    schedule.every().day.at("01:00").do(scheduler.submit, "preprocess")
+    schedule.every().day.at("07:00").do(scheduler.submit, "clear_old_logs")
+    schedule.every().day.at("08:00").do(scheduler.submit, "flask_restart")
+    schedule.every().day.at("21:30").do(scheduler.submit, "daily_report")
     
     print("DEBUG: All jobs scheduled successfully")
 
@@ -1094,6 +516,12 @@ def main():
     signal.signal(signal.SIGINT, cleanup_handler)
     atexit.register(cleanup_handler, None, None)
     
+    try:
+        alertstore.import_json_files()
+        get_delivery_queue().start()
+    except Exception as e:
+        print(f"ERROR: Failed to start alert store: {e}")
+    
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         test_all()
         return 0
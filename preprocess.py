@@ -1,31 +1,94 @@
+import json
+import os
+import numpy as np
 import pandas as pd
-from geopy.distance import geodesic
 from datetime import datetime, timedelta
 
-def preprocess_everything(days: int = 70):
-    df = pd.read_csv(
-        "data/travelreport/history.csv",
-        dtype={
-            'Vehicle No': str,
-            'Status': 'category',
-            'Address': str,
-            'Speed': float,
-            'Odometer': float,
-            'Panic': str,
-            'Latitude': float,
-            'Longitude': float
-        },
-        parse_dates=['DateTime'],
-        low_memory=False
-    )
-    print("Data loaded successfully")
+import clustering
+import formatdata
+import stoppoints
+import storage
+
+GEO_CLUSTER_RADIUS_METERS = 25
+GEO_CLUSTER_METHOD = "greedy"
+IDLE_POINTS_FILE = "analysis/customerpoints/idlepoints.csv"
+CHECKPOINT_DIR = "analysis/customerpoints/checkpoints"
+CHECKPOINT_MANIFEST = "_manifest.json"
+TRAVEL_REPORT_DIR = "data/travelreport"
+IDLE_POINT_COLUMNS = ['Vehicle No', 'Status', 'Date', 'GeoCluster', 'Latitude', 'Longitude',
+                      'Address', 'StartTime', 'EndTime', 'Duration']
+
+def preprocess_everything(days: int = 70, incremental: bool = True):
     cutoff_date = datetime.now() - timedelta(days=days)
     print(f"cutoff_date is : {cutoff_date}")
-    df = df[df['DateTime'] >= cutoff_date]
-    print("cutoff date applied to dataframe")
-    df.to_csv('data/travelreport/history.csv', index=False)
-    print("data/travelreport/history.csv file truncated for the last {day} days.")
+    if storage.has_report("travelreport"):
+        try:
+            formatdata.drop_report_history_before(TRAVEL_REPORT_DIR, "DateTime", ["%Y-%m-%d %H:%M:%S"],
+                                                  cutoff_date.strftime('%Y-%m-%d'))
+        except Exception as e:
+            print(f"Failed to drop {TRAVEL_REPORT_DIR} history before the cutoff: {e}")
+    if incremental and storage.has_report("travelreport"):
+        return preprocess_incremental(cutoff_date)
+
+    if storage.has_report("travelreport"):
+        storage.drop_partitions_before("travelreport", cutoff_date.strftime('%Y-%m-%d'))
+        stoppoints.drop_stop_index_before(cutoff_date.strftime('%Y-%m-%d'))
+        df = storage.read_report("travelreport", t_start=cutoff_date)
+        df['Status'] = df['Status'].astype('category')
+        print("Data loaded successfully from partitioned store")
+    else:
+        df = pd.read_csv(
+            "data/travelreport/history.csv",
+            dtype={
+                'Vehicle No': str,
+                'Status': 'category',
+                'Address': str,
+                'Speed': float,
+                'Odometer': float,
+                'Panic': str,
+                'Latitude': float,
+                'Longitude': float
+            },
+            parse_dates=['DateTime'],
+            low_memory=False
+        )
+        print("Data loaded successfully")
+        df = df[df['DateTime'] >= cutoff_date]
+        print("cutoff date applied to dataframe")
+        df.to_csv('data/travelreport/history.csv', index=False)
+        formatdata.drop_row_index_before(TRAVEL_REPORT_DIR, cutoff_date.strftime('%Y-%m-%d'))
+        print("data/travelreport/history.csv file truncated for the last {day} days.")
+    final = format_idle_points(compute_idle_points(df))
+    print("Analysis updated now you can make fresh customer points by deleting old ones from settings.")
+    final.to_csv(IDLE_POINTS_FILE, index=False)
+    return
+
+def split_by_day(intervals):
+    start = intervals['StartTime'].to_numpy(dtype='datetime64[ns]')
+    end = intervals['EndTime'].to_numpy(dtype='datetime64[ns]')
+    start_day = start.astype('datetime64[D]')
+    counts = (end.astype('datetime64[D]') - start_day).astype(np.int64) + 1
+
+    source = np.repeat(np.arange(len(intervals)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    day = (start_day[source] + offset).astype('datetime64[ns]')
+    next_day = day + np.timedelta64(1, 'D')
+
+    piece_start = np.maximum(start[source], day)
+    piece_end = np.minimum(end[source], next_day)
+
+    split = intervals.iloc[source].reset_index(drop=True)
+    split['StartTime'] = piece_start
+    split['EndTime'] = piece_end
+    split['Duration'] = piece_end - piece_start
+    split['Date'] = pd.Series(day).dt.date
+    split['Status'] = split['Status'].astype(object)
+    return split
+
+def compute_idle_points(df):
     df = df[df['Status'].isin(['Stopped', 'Idle'])].copy()
+    if df.empty:
+        return pd.DataFrame(columns=IDLE_POINT_COLUMNS)
 
     df = df.sort_values(by=['Vehicle No', 'DateTime']).reset_index(drop=True)
 
@@ -49,65 +112,14 @@ def preprocess_everything(days: int = 70):
 
     collapsed['Duration'] = collapsed['EndTime'] - collapsed['StartTime']
     print("Collapsed all points time to find customer points")
-    def split_by_day(row):
-        results = []
-        start, end = row['StartTime'], row['EndTime']
-        current = start
-
-        while current.date() < end.date():
-            midnight = pd.Timestamp.combine(current.date() + pd.Timedelta(days=1), pd.Timestamp.min.time())
-            results.append({
-                **row,
-                'StartTime': current,
-                'EndTime': midnight,
-                'Duration': midnight - current,
-                'Date': current.date()
-            })
-            current = midnight
-
-        results.append({
-            **row,
-            'StartTime': current,
-            'EndTime': end,
-            'Duration': end - current,
-            'Date': current.date()
-        })
-        return results
-
-    split_records = []
-    for _, row in collapsed.iterrows():
-        split_records.extend(split_by_day(row))
-
-    final = pd.DataFrame(split_records)
+    final = split_by_day(collapsed)
     print("Splitted all the records")
-    def assign_geo_clusters(group, radius_meters=25):
-        if len(group) <= 1:
-            group['GeoCluster'] = 0
-            return group
-        
-        cluster_id = 0
-        assigned = [None] * len(group)
-        coords = group[['Latitude', 'Longitude']].values
-
-        for i in range(len(group)):
-            if assigned[i] is not None:
-                continue
-
-            assigned[i] = cluster_id
-            for j in range(i + 1, len(group)):
-                if assigned[j] is None:
-                    dist = geodesic(coords[i], coords[j]).meters
-                    if dist <= radius_meters:
-                        assigned[j] = cluster_id
-            cluster_id += 1
-
-        group['GeoCluster'] = assigned
-        return group
-    print("Making geoclusters heaviest operation in entire deploy.")
-    final = (
-        final.groupby(['Vehicle No', 'Date', 'Status'], group_keys=False)
-            .apply(assign_geo_clusters)
-            .reset_index(drop=True)
+    print(f"Making geoclusters ({GEO_CLUSTER_METHOD}).")
+    final['GeoCluster'] = clustering.assign_geo_clusters(
+        final,
+        group_columns=['Vehicle No', 'Date', 'Status'],
+        radius_meters=GEO_CLUSTER_RADIUS_METERS,
+        method=GEO_CLUSTER_METHOD
     )
     print("Finally made geoclusters")
     final = final.groupby(['Vehicle No', 'Status', 'Date', 'GeoCluster']).agg({
@@ -118,13 +130,117 @@ def preprocess_everything(days: int = 70):
         'EndTime': 'max',
         'Duration': lambda x: pd.to_timedelta(x).sum()
     }).reset_index()
+    return final
 
+def format_idle_points(final):
     final['StartTime'] = final['StartTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
     final['EndTime'] = final['EndTime'].dt.strftime('%Y-%m-%d %H:%M:%S')
     
     final['Duration'] = pd.to_timedelta(final['Duration']).apply(
         lambda x: str(x).split(' ')[-1] if 'day' in str(x) else str(x)
     )
+    return final
+def _load_checkpoint_manifest():
+    try:
+        with open(os.path.join(CHECKPOINT_DIR, CHECKPOINT_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_checkpoint_manifest(manifest):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = os.path.join(CHECKPOINT_DIR, CHECKPOINT_MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+def _remove_checkpoint(entry):
+    if entry.get("file"):
+        try:
+            os.remove(os.path.join(CHECKPOINT_DIR, entry["file"]))
+        except FileNotFoundError:
+            pass
+
+def _day_signature(vehicle, days, idx):
+    prev_day = days[idx - 1] if idx > 0 else None
+    next_day = days[idx + 1] if idx + 1 < len(days) else None
+
+    def version(day):
+        return storage.partition_version("travelreport", day, vehicle) if day else 0
+
+    return [prev_day, version(prev_day), version(days[idx]), next_day, version(next_day)]
+
+def refresh_vehicle_checkpoints(vehicle, days, stale, manifest):
+    first, last = stale[0][0], stale[-1][0]
+    t_start = pd.Timestamp(days[max(first - 1, 0)])
+    t_end = pd.Timestamp(days[min(last + 1, len(days) - 1)]) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+    df = storage.read_report("travelreport", vehicle_ids=[vehicle], t_start=t_start, t_end=t_end)
+    df['Status'] = df['Status'].astype('category')
+    result = compute_idle_points(df)
+    result['Status'] = result['Status'].astype(str)
+
+    # Stops bridging days without data belong to the last day that has a partition.
+    result_days = pd.to_datetime(result['Date']).dt.strftime('%Y-%m-%d').to_numpy(dtype=str)
+    owner = np.asarray(days)[np.clip(np.searchsorted(days, result_days, side='right') - 1, 0, None)] if len(result) else np.array([], dtype=str)
+
+    for _, day, signature in stale:
+        key = f"{day}/{vehicle}"
+        _remove_checkpoint(manifest.get(key, {}))
+        part = result[owner == day]
+        file_name = None
+        if not part.empty:
+            file_name = os.path.join(day, storage.vehicle_file_name(vehicle))
+            os.makedirs(os.path.join(CHECKPOINT_DIR, day), exist_ok=True)
+            part.to_parquet(os.path.join(CHECKPOINT_DIR, file_name), index=False)
+        manifest[key] = {"day": day, "vehicle": vehicle, "file": file_name, "rows": int(len(part)), "signature": signature}
+
+def preprocess_incremental(cutoff_date):
+    cutoff_day = cutoff_date.strftime('%Y-%m-%d')
+    storage.drop_partitions_before("travelreport", cutoff_day)
+    stoppoints.drop_stop_index_before(cutoff_day)
+
+    manifest = _load_checkpoint_manifest()
+    live_keys = set()
+    refreshed = 0
+
+    for vehicle in storage.list_vehicles("travelreport"):
+        days = [day for day in storage.list_days("travelreport", [vehicle]) if day >= cutoff_day]
+        stale = []
+        for idx, day in enumerate(days):
+            key = f"{day}/{vehicle}"
+            live_keys.add(key)
+            signature = _day_signature(vehicle, days, idx)
+            if manifest.get(key, {}).get("signature") != signature:
+                stale.append((idx, day, signature))
+
+        if stale:
+            try:
+                refresh_vehicle_checkpoints(vehicle, days, stale, manifest)
+                refreshed += len(stale)
+            except Exception as e:
+                print(f"Failed to preprocess vehicle {vehicle}: {e}")
+                for _, day, _ in stale:
+                    manifest.pop(f"{day}/{vehicle}", None)
+
+    for key in [key for key in manifest if key not in live_keys]:
+        _remove_checkpoint(manifest.pop(key))
+
+    _save_checkpoint_manifest(manifest)
+    print(f"Recomputed {refreshed} vehicle-days, reused {len(live_keys) - refreshed} checkpoints")
+
+    frames = []
+    for entry in manifest.values():
+        if entry.get("file"):
+            frames.append(pd.read_parquet(os.path.join(CHECKPOINT_DIR, entry["file"])))
+
+    if frames:
+        final = pd.concat(frames, ignore_index=True)
+        final = final.sort_values(['Vehicle No', 'Status', 'Date', 'GeoCluster'], kind='stable').reset_index(drop=True)
+        final = format_idle_points(final[IDLE_POINT_COLUMNS])
+    else:
+        final = pd.DataFrame(columns=IDLE_POINT_COLUMNS)
+
     print("Analysis updated now you can make fresh customer points by deleting old ones from settings.")
-    final.to_csv("analysis/customerpoints/idlepoints.csv", index=False)
-    return
\ No newline at end of file
+    final.to_csv(IDLE_POINTS_FILE, index=False)
+    return
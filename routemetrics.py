@@ -0,0 +1,71 @@
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+from scipy.spatial import cKDTree
+
+ROUTE_TOLERANCE_METERS = 500
+
+
+@lru_cache(maxsize=8)
+def _transformer(utm_epsg):
+    return Transformer.from_crs("epsg:4326", f"epsg:{utm_epsg}", always_xy=True)
+
+
+def utm_epsg_for(lon, lat):
+    zone = int((lon + 180) // 6) % 60 + 1
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+def project_coords(coords, utm_epsg=None):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if utm_epsg is None:
+        utm_epsg = utm_epsg_for(np.nanmean(coords[:, 0]), np.nanmean(coords[:, 1]))
+    x, y = _transformer(utm_epsg).transform(coords[:, 0], coords[:, 1])
+    return np.column_stack([x, y])
+
+
+def point_to_line_distances(points_xy, line_xy):
+    if len(line_xy) < 2:
+        return cKDTree(line_xy).query(points_xy)[0]
+    if len(line_xy) <= len(points_xy):
+        return shapely.distance(shapely.linestrings(line_xy), shapely.points(points_xy))
+
+    segments = shapely.linestrings(np.stack([line_xy[:-1], line_xy[1:]], axis=1))
+    tree = shapely.STRtree(segments)
+    (point_index, _), distances = tree.query_nearest(shapely.points(points_xy), return_distance=True, all_matches=False)
+    result = np.full(len(points_xy), np.nan)
+    result[point_index] = distances
+    return result
+
+
+def directed_hausdorff_m(a_xy, b_xy):
+    return float(cKDTree(b_xy).query(a_xy)[0].max())
+
+
+def route_metrics(actual_coords, planned_coords, tolerance_m=ROUTE_TOLERANCE_METERS):
+    actual = np.asarray(actual_coords, dtype=float).reshape(-1, 2)
+    planned = np.asarray(planned_coords, dtype=float).reshape(-1, 2)
+    if len(actual) < 2 or len(planned) < 2:
+        return None
+
+    both = np.vstack([actual, planned])
+    utm_epsg = utm_epsg_for(np.nanmean(both[:, 0]), np.nanmean(both[:, 1]))
+    actual_xy = project_coords(actual, utm_epsg)
+    planned_xy = project_coords(planned, utm_epsg)
+
+    actual_deviation = point_to_line_distances(actual_xy, planned_xy)
+    planned_deviation = point_to_line_distances(planned_xy, actual_xy)
+    hausdorff_actual = directed_hausdorff_m(actual_xy, planned_xy)
+    hausdorff_planned = directed_hausdorff_m(planned_xy, actual_xy)
+
+    return {
+        "coverage": float((planned_deviation <= tolerance_m).mean() * 100),
+        "alignment": float((actual_deviation <= tolerance_m).mean() * 100),
+        "hausdorff": min(hausdorff_actual, hausdorff_planned),
+        "hausdorff_actual_to_planned": hausdorff_actual,
+        "hausdorff_planned_to_actual": hausdorff_planned,
+        "actual_deviation_m": actual_deviation,
+        "planned_deviation_m": planned_deviation
+    }
@@ -0,0 +1,252 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import groupby
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ORS_BASE_URL = "https://api.openrouteservice.org"
+ORS_PROFILE = "driving-car"
+ORS_REQUESTS_PER_MINUTE = 40
+ORS_BURST = 5
+ORS_WORKERS = 4
+ORS_CHUNK_SIZE = 50
+ORS_SNAP_RADIUS = 350
+ORS_MAX_RETRIES = 3
+ORS_BACKOFF_SECONDS = 2
+ORS_TIMEOUT = (10, 120)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_progress_lock = threading.Lock()
+_progress = {}
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute=ORS_REQUESTS_PER_MINUTE, burst=ORS_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def drain(self, seconds):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class ORSError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ORSClient:
+    def __init__(self, key, base_url=None, limiter=None, pool_size=ORS_WORKERS, max_retries=ORS_MAX_RETRIES):
+        self.base_url = (base_url or ORS_BASE_URL).rstrip("/")
+        self.limiter = limiter or TokenBucket()
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": key or "", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def post(self, path, payload):
+        url = f"{self.base_url}{path}"
+        for attempt in range(1, self.max_retries + 1):
+            self.limiter.acquire()
+            self._count("requests")
+            try:
+                response = self.session.post(url, json=payload, timeout=ORS_TIMEOUT)
+            except requests.RequestException as e:
+                error = ORSError(f"{path} request failed: {e}")
+                delay = ORS_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                error = ORSError(f"{path} failed ({response.status_code}): {response.text[:200]}",
+                                 response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise error
+                delay = ORS_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                if response.status_code == 429:
+                    self._count("rate_limited")
+                    try:
+                        delay = max(delay, float(response.headers.get("Retry-After", 0)))
+                    except ValueError:
+                        pass
+                    self.limiter.drain(delay)
+
+            if attempt == self.max_retries:
+                raise error
+            self._count("retries")
+            print(f"   WARNING: {error} (attempt {attempt}/{self.max_retries}, retrying in {delay:.0f}s)")
+            if error.status_code != 429:
+                time.sleep(delay)
+
+    def snap(self, coords, profile=ORS_PROFILE):
+        data = self.post(f"/v2/snap/{profile}", {"locations": coords, "radius": ORS_SNAP_RADIUS})
+        valid_coords = []
+        invalid_indices = []
+        for i, location in enumerate(data.get("locations", [])):
+            if location is not None and "location" in location:
+                valid_coords.append(location["location"])
+            else:
+                invalid_indices.append(i)
+                print(f"WARNING: Coordinate {i} ({coords[i]}) could not be snapped to road network")
+        return valid_coords, invalid_indices
+
+    def directions(self, coords, profile=ORS_PROFILE):
+        return self.post(f"/v2/directions/{profile}/geojson", {"coordinates": coords, "instructions": True})
+
+    def close(self):
+        self.session.close()
+
+
+def _street_names(props):
+    names = []
+    for segment in props.get("segments", [])[:1]:
+        for step in segment.get("steps", []):
+            name = step.get("name", "").strip()
+            if name and name != "-" and name not in ["Destination", "Start"]:
+                names.append(name)
+    return names
+
+
+def route_group(client, vehicle_id, weekday, full_coords):
+    label = f"{vehicle_id} {weekday}"
+    try:
+        valid_coords, invalid_indices = client.snap(full_coords)
+        if invalid_indices:
+            print(f"INFO: {label}: {len(invalid_indices)} out of {len(full_coords)} coordinates were invalid")
+    except Exception as e:
+        print(f"ERROR: Snap endpoint failed for {label}: {e}")
+        valid_coords, invalid_indices = list(full_coords), []
+
+    if len(valid_coords) < 2:
+        print(f"   ERROR: {label}: not enough valid coordinates for routing ({len(valid_coords)} valid)")
+        return None
+
+    all_street_names = []
+    all_coordinates = []
+    total_distance = 0
+    for chunk_count, i in enumerate(range(0, len(valid_coords), ORS_CHUNK_SIZE), start=1):
+        chunk = valid_coords[i:i + ORS_CHUNK_SIZE]
+        if len(chunk) < 2:
+            continue
+        try:
+            route = client.directions(chunk)
+        except Exception as e:
+            print(f"   ERROR: {label}: chunk {chunk_count} failed: {e}")
+            continue
+
+        features = route.get("features") or []
+        if not features:
+            print(f"   WARNING: {label}: empty route response for chunk {chunk_count}")
+            continue
+        props = features[0].get("properties", {})
+        if not props.get("summary"):
+            print(f"   WARNING: {label}: no summary in route response for chunk {chunk_count}")
+            continue
+
+        total_distance += props["summary"].get("distance", 0) / 1000
+        all_coordinates.extend(features[0]["geometry"]["coordinates"] or [])
+        all_street_names.extend(_street_names(props))
+
+    if not all_coordinates:
+        print(f"   WARNING: No coordinates collected for {label}")
+        return None
+
+    street_names = list(dict.fromkeys(k for k, _ in groupby(all_street_names)))
+    print(f"   COMPLETED: {label}: {total_distance:.2f} km | {len(street_names)} unique streets")
+    return {
+        "type": "Feature",
+        "properties": {
+            "vehicle_id": str(vehicle_id),
+            "weekday": weekday,
+            "total_distance_km": round(total_distance, 2),
+            "ordered_street_names": street_names,
+            "street_count": len(street_names),
+            "original_waypoints": len(full_coords),
+            "valid_waypoints": len(valid_coords),
+            "invalid_waypoints": len(invalid_indices)
+        },
+        "geometry": {"type": "LineString", "coordinates": all_coordinates}
+    }
+
+
+def _set_progress(job, **values):
+    with _progress_lock:
+        _progress.setdefault(job, {}).update(values)
+        return dict(_progress[job])
+
+
+def progress(job=None):
+    with _progress_lock:
+        if job is not None:
+            return dict(_progress.get(job, {}))
+        return {name: dict(state) for name, state in _progress.items()}
+
+
+def route_groups(groups, key, base_url=None, requests_per_minute=ORS_REQUESTS_PER_MINUTE, workers=ORS_WORKERS,
+                 job="routes", on_progress=None):
+    groups = list(groups)
+    client = ORSClient(key, base_url, TokenBucket(requests_per_minute), pool_size=workers)
+    start = time.perf_counter()
+    results = [None] * len(groups)
+    done = failed = 0
+    _set_progress(job, total=len(groups), done=0, failed=0, running=True, elapsed=0.0, started_at=time.time())
+    print(f"[routing] Routing {len(groups)} groups with {workers} workers at {requests_per_minute} requests/min")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ors") as executor:
+            futures = {
+                executor.submit(route_group, client, vehicle_id, weekday, coords): index
+                for index, (vehicle_id, weekday, coords) in enumerate(groups)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"ERROR: {groups[index][0]} {groups[index][1]} failed: {e}")
+                done += 1
+                failed += results[index] is None
+                state = _set_progress(job, done=done, failed=failed, elapsed=round(time.perf_counter() - start, 1),
+                                      **client.stats)
+                print(f"PROGRESS: {done}/{len(groups)} groups ({failed} failed, {state['elapsed']}s)")
+                if on_progress:
+                    on_progress(state)
+    finally:
+        client.close()
+        _set_progress(job, running=False, elapsed=round(time.perf_counter() - start, 1),
+                      rate_limit_wait=round(client.limiter.waited, 1), **client.stats)
+
+    print(f"[routing] Finished in {time.perf_counter() - start:.1f}s: {client.stats['requests']} requests, "
+          f"{client.stats['retries']} retries, {client.limiter.waited:.1f} worker-seconds waiting on the rate limit")
+    return [feature for feature in results if feature]
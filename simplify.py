@@ -0,0 +1,97 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+
+import routemetrics
+from stoppoints import haversine_m_array
+
+SIMPLIFY_LEVELS_METERS = (0.0, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+SIMPLIFY_PIXELS = 1.0
+SIMPLIFY_CACHE_ENTRIES = 512
+RENDER_ZOOM = 16
+WEB_MERCATOR_METERS_PER_PIXEL = 156543.03392
+DEFAULT_LATITUDE = 25.2
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def zoom_tolerance_m(zoom, latitude=DEFAULT_LATITUDE):
+    if zoom is None:
+        return 0.0
+    return SIMPLIFY_PIXELS * WEB_MERCATOR_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def level_for_tolerance(tolerance_m):
+    return max(level for level in SIMPLIFY_LEVELS_METERS if level <= max(tolerance_m, 0.0))
+
+
+def path_length_m(coords):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if len(coords) < 2:
+        return 0.0
+    return float(haversine_m_array(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0]).sum())
+
+
+class SimplifiedRoute:
+    def __init__(self, coords):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.length_m = path_length_m(self.coords)
+        self.latitude = float(np.nanmean(self.coords[:, 1])) if len(self.coords) else DEFAULT_LATITUDE
+        self.levels = {}
+
+        full = np.arange(len(self.coords))
+        if len(self.coords) < 3:
+            self.levels = {level: full for level in SIMPLIFY_LEVELS_METERS}
+            return
+
+        xy = routemetrics.project_coords(self.coords)
+        line = shapely.linestrings(np.column_stack([xy, full]))
+        for level in SIMPLIFY_LEVELS_METERS:
+            if level == 0:
+                self.levels[level] = full
+            else:
+                kept = shapely.get_coordinates(shapely.simplify(line, level, preserve_topology=False), include_z=True)[:, 2]
+                self.levels[level] = kept.astype(int)
+
+    def at_tolerance(self, tolerance_m):
+        return self.coords[self.levels[level_for_tolerance(tolerance_m)]]
+
+    def at_zoom(self, zoom):
+        return self.at_tolerance(zoom_tolerance_m(zoom, self.latitude))
+
+    def latlon(self, zoom=RENDER_ZOOM):
+        return self.at_zoom(zoom)[:, ::-1].tolist()
+
+    def level_sizes(self):
+        return {level: len(indices) for level, indices in self.levels.items()}
+
+
+def route_geometry(coords):
+    coords = np.ascontiguousarray(np.asarray(coords, dtype=float).reshape(-1, 2))
+    key = hashlib.blake2b(coords.tobytes(), digest_size=16).hexdigest()
+
+    with _cache_lock:
+        route = _cache.get(key)
+        if route is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return route
+
+    route = SimplifiedRoute(coords)
+    with _cache_lock:
+        _stats["misses"] += 1
+        _cache[key] = route
+        while len(_cache) > SIMPLIFY_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return route
+
+
+def cache_stats():
+    with _cache_lock:
+        return {"entries": len(_cache), **_stats}
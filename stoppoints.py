@@ -0,0 +1,305 @@
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+from math import radians, cos, sin, sqrt, atan2
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+import clustering
+import storage
+
+STOP_JOIN_RADIUS_METERS = 50
+STOP_MIN_POINTS = 2
+STOP_MIN_DURATION_MINUTES = 2
+STOP_STATUSES = ['Idle', 'Stopped']
+VISIT_RADIUS_METERS = 500
+STOP_INDEX_DIR = os.path.join(storage.STORE_DIR, "stoppoints")
+STOP_INDEX_MANIFEST = "_manifest.json"
+
+_index_lock = threading.Lock()
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    dlon = radians(lon2 - lon1)
+    dlat = radians(lat2 - lat1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    return 6371.0 * 2 * atan2(sqrt(a), sqrt(1-a)) * 1000
+
+
+def _vehicle_stop_groups(lat, lon, join_radius_m):
+    groups = []
+    if not lat:
+        return groups
+
+    start = 0
+    sum_lat = 0.0 + lat[0]
+    sum_lon = 0.0 + lon[0]
+    current_lat = lat[0]
+    current_lon = lon[0]
+
+    for i in range(1, len(lat)):
+        if _haversine_m(current_lat, current_lon, lat[i], lon[i]) <= join_radius_m:
+            sum_lat += lat[i]
+            sum_lon += lon[i]
+            size = i - start + 1
+            current_lat = sum_lat / size
+            current_lon = sum_lon / size
+        else:
+            groups.append((start, sum_lat, sum_lon))
+            start = i
+            sum_lat = 0.0 + lat[i]
+            sum_lon = 0.0 + lon[i]
+            current_lat = lat[i]
+            current_lon = lon[i]
+
+    groups.append((start, sum_lat, sum_lon))
+    return groups
+
+
+def detect_stop_points(df, vehicle_ids=None, join_radius_m=STOP_JOIN_RADIUS_METERS,
+                       min_points=STOP_MIN_POINTS, min_duration_minutes=STOP_MIN_DURATION_MINUTES):
+    if df is None or df.empty:
+        return pd.DataFrame()
+
+    df = df[df['Status'].isin(STOP_STATUSES)]
+    if df.empty:
+        return pd.DataFrame()
+
+    if vehicle_ids is None:
+        vehicle_ids = df['Vehicle No'].drop_duplicates().tolist()
+
+    by_vehicle = {vehicle: rows for vehicle, rows in df.groupby('Vehicle No', sort=False)}
+    frames = []
+
+    for vehicle_id in vehicle_ids:
+        vehicle_data = by_vehicle.get(vehicle_id)
+        if vehicle_data is None or vehicle_data.empty:
+            continue
+
+        vehicle_data = vehicle_data.sort_values('DateTime')
+        lat = vehicle_data['Latitude'].to_numpy(dtype=float)
+        lon = vehicle_data['Longitude'].to_numpy(dtype=float)
+        times = vehicle_data['DateTime'].to_numpy(dtype='datetime64[ns]')
+
+        groups = _vehicle_stop_groups(lat.tolist(), lon.tolist(), join_radius_m)
+        starts = np.array([g[0] for g in groups], dtype=np.int64)
+        ends = np.append(starts[1:], len(lat)) - 1
+        sizes = ends - starts + 1
+
+        duration = (times[ends] - times[starts]) / np.timedelta64(1, 's') / 60
+        keep = (sizes >= min_points) & (duration >= min_duration_minutes)
+        if not keep.any():
+            continue
+
+        kept = np.flatnonzero(keep)
+        starts, ends = starts[kept], ends[kept]
+
+        frames.append(pd.DataFrame({
+            'Vehicle No': vehicle_id,
+            'Latitude': [groups[k][1] / sizes[k] for k in kept],
+            'Longitude': [groups[k][2] / sizes[k] for k in kept],
+            'StartTime': times[starts],
+            'EndTime': times[ends],
+            'DurationMinutes': [round(float(duration[k]), 1) for k in kept],
+            'Status': vehicle_data['Status'].to_numpy()[starts],
+            'Address': vehicle_data['Address'].to_numpy()[starts]
+        }))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def haversine_m_array(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)) * 1000
+
+
+def match_customer_visits(customers, stops, radius_m=VISIT_RADIUS_METERS):
+    result = customers.copy()
+    result['Visited'] = False
+    result['VisitStart'] = pd.NaT
+    result['VisitEnd'] = pd.NaT
+    result['VisitDistanceM'] = np.nan
+    result['StopLatitude'] = np.nan
+    result['StopLongitude'] = np.nan
+    if customers.empty or stops is None or stops.empty:
+        return result
+
+    stops = stops.sort_values('StartTime', kind='stable').reset_index(drop=True)
+    vehicles = pd.Index(pd.concat([customers['Vehicle No'], stops['Vehicle No']]).astype(str).unique())
+    cust_group = vehicles.get_indexer(customers['Vehicle No'].astype(str))
+    stop_group = vehicles.get_indexer(stops['Vehicle No'].astype(str))
+
+    cust_lat = pd.to_numeric(customers['Latitude'], errors='coerce').to_numpy(dtype=float)
+    cust_lon = pd.to_numeric(customers['Longitude'], errors='coerce').to_numpy(dtype=float)
+    stop_lat = stops['Latitude'].to_numpy(dtype=float)
+    stop_lon = stops['Longitude'].to_numpy(dtype=float)
+
+    valid_cust = np.flatnonzero(~(np.isnan(cust_lat) | np.isnan(cust_lon)))
+    valid_stop = np.flatnonzero(~(np.isnan(stop_lat) | np.isnan(stop_lon)))
+    if len(valid_cust) == 0 or len(valid_stop) == 0:
+        return result
+
+    x, y, scale = clustering.project_to_meters(
+        np.concatenate([cust_lat[valid_cust], stop_lat[valid_stop]]),
+        np.concatenate([cust_lon[valid_cust], stop_lon[valid_stop]])
+    )
+    z = np.concatenate([cust_group[valid_cust], stop_group[valid_stop]]) * clustering.GROUP_SEPARATION_METERS
+    points = np.column_stack([x, y, z])
+    cust_points, stop_points = points[:len(valid_cust)], points[len(valid_cust):]
+
+    tree = cKDTree(stop_points)
+    candidates = tree.query_ball_point(cust_points, radius_m * scale * 1.01 + 0.5)
+    counts = np.fromiter((len(c) for c in candidates), dtype=np.int64, count=len(candidates))
+    if counts.sum() == 0:
+        return result
+
+    pair_cust = valid_cust[np.repeat(np.arange(len(valid_cust)), counts)]
+    pair_stop = valid_stop[np.concatenate([c for c in candidates if c]).astype(np.int64)]
+    dist = haversine_m_array(cust_lat[pair_cust], cust_lon[pair_cust], stop_lat[pair_stop], stop_lon[pair_stop])
+    within = dist <= radius_m
+    if not within.any():
+        return result
+
+    pairs = pd.DataFrame({'cust': pair_cust[within], 'stop': pair_stop[within], 'dist': dist[within]})
+    first_visit = pairs.sort_values(['cust', 'stop']).drop_duplicates('cust')
+    rows = first_visit['cust'].to_numpy()
+    matched = stops.iloc[first_visit['stop'].to_numpy()]
+
+    result.iloc[rows, result.columns.get_loc('Visited')] = True
+    result.iloc[rows, result.columns.get_loc('VisitStart')] = matched['StartTime'].to_numpy()
+    result.iloc[rows, result.columns.get_loc('VisitEnd')] = matched['EndTime'].to_numpy()
+    result.iloc[rows, result.columns.get_loc('VisitDistanceM')] = first_visit['dist'].round(1).to_numpy()
+    result.iloc[rows, result.columns.get_loc('StopLatitude')] = matched['Latitude'].to_numpy()
+    result.iloc[rows, result.columns.get_loc('StopLongitude')] = matched['Longitude'].to_numpy()
+    return result
+
+
+def _load_index_manifest():
+    try:
+        with open(os.path.join(STOP_INDEX_DIR, STOP_INDEX_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index_manifest(manifest):
+    os.makedirs(STOP_INDEX_DIR, exist_ok=True)
+    path = os.path.join(STOP_INDEX_DIR, STOP_INDEX_MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _day_bounds(day):
+    start = pd.Timestamp(day)
+    return start, start + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+
+
+def _build_day_entry(vehicle, day):
+    version = storage.partition_version("travelreport", day, vehicle)
+    t_start, t_end = _day_bounds(day)
+    rows = storage.read_report("travelreport", vehicle_ids=[vehicle], t_start=t_start, t_end=t_end)
+    stops = detect_stop_points(rows, [vehicle])
+
+    file_name = None
+    if not stops.empty:
+        file_name = os.path.join(day, storage.vehicle_file_name(vehicle))
+        path = os.path.join(STOP_INDEX_DIR, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        stops.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    entry = {
+        "day": day,
+        "vehicle": vehicle,
+        "file": file_name,
+        "stops": int(len(stops)),
+        "version": version,
+        "updated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return entry, stops
+
+
+def refresh_stop_index(partitions):
+    if not partitions:
+        return 0
+    with _index_lock:
+        manifest = copy.deepcopy(_load_index_manifest())
+        for day, vehicle in partitions:
+            try:
+                entry, _ = _build_day_entry(vehicle, day)
+                manifest[f"{day}/{vehicle}"] = entry
+            except Exception as e:
+                print(f"[stoppoints] Failed to index {vehicle} on {day}: {e}")
+        _save_index_manifest(manifest)
+    print(f"[stoppoints] Indexed {len(partitions)} vehicle-days")
+    return len(partitions)
+
+
+def load_day_stops(vehicle, day):
+    key = f"{day}/{vehicle}"
+    entry = _load_index_manifest().get(key)
+    if entry and entry["version"] == storage.partition_version("travelreport", day, vehicle):
+        if not entry.get("file"):
+            return pd.DataFrame()
+        try:
+            return pd.read_parquet(os.path.join(STOP_INDEX_DIR, entry["file"]))
+        except Exception as e:
+            print(f"[stoppoints] Rebuilding unreadable index entry {key}: {e}")
+
+    with _index_lock:
+        entry, stops = _build_day_entry(vehicle, day)
+        manifest = copy.deepcopy(_load_index_manifest())
+        manifest[key] = entry
+        _save_index_manifest(manifest)
+    return stops
+
+
+def drop_stop_index_before(cutoff_day):
+    with _index_lock:
+        manifest = copy.deepcopy(_load_index_manifest())
+        for key, entry in list(manifest.items()):
+            if entry["day"] >= cutoff_day:
+                continue
+            if entry.get("file"):
+                try:
+                    os.remove(os.path.join(STOP_INDEX_DIR, entry["file"]))
+                except FileNotFoundError:
+                    pass
+            del manifest[key]
+        _save_index_manifest(manifest)
+
+
+def get_stop_points(vehicle_ids, t_start, t_end):
+    t_start = pd.Timestamp(t_start)
+    t_end = pd.Timestamp(t_end)
+    frames = []
+
+    for vehicle in vehicle_ids:
+        for day in storage.list_days("travelreport", [vehicle]):
+            day_start, day_end = _day_bounds(day)
+            if day_end < t_start or day_start > t_end:
+                continue
+
+            if t_start <= day_start and t_end >= day_end.floor('s'):
+                stops = load_day_stops(vehicle, day)
+            else:
+                rows = storage.read_report("travelreport", vehicle_ids=[vehicle],
+                                           t_start=max(t_start, day_start), t_end=min(t_end, day_end))
+                stops = detect_stop_points(rows, [vehicle])
+
+            if not stops.empty:
+                frames.append(stops)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,374 @@
+import copy
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+STORE_DIR = "data/store"
+CATALOG_FILE = "_catalog.json"
+
+REPORT_SCHEMAS = {
+    "travelreport": {
+        "vehicle_column": "Vehicle No",
+        "time_column": "DateTime",
+        "datetime_columns": ["DateTime"],
+        "dtypes": {
+            'Vehicle No': str,
+            'Status': str,
+            'Address': str,
+            'Speed': float,
+            'Odometer': float,
+            'Panic': str,
+            'Latitude': float,
+            'Longitude': float
+        }
+    },
+    "geofence": {
+        "vehicle_column": "Vehicle No",
+        "time_column": "In Time",
+        "datetime_columns": ["In Time", "Out Time"],
+        "dtypes": {
+            'Vehicle No': str,
+            'Driver': str,
+            'Geofence': str,
+            'Type': str,
+            'Elapsed Time Inside The Geofence': str
+        }
+    },
+    "idlereport": {
+        "vehicle_column": "Vehicle Number",
+        "time_column": "Idle From",
+        "datetime_columns": ["Idle From", "Idle Till"],
+        "dtypes": {
+            'Vehicle Number': str,
+            'Vehicle Model': str,
+            'Driver': str,
+            'Location': str,
+            'Duration': str
+        }
+    },
+    "exidlereport": {
+        "vehicle_column": "Vehicle Number",
+        "time_column": "Idle From",
+        "datetime_columns": ["Idle From", "Idle Till"],
+        "dtypes": {
+            'Vehicle Number': str,
+            'Vehicle Model': str,
+            'Driver': str,
+            'Location': str,
+            'Duration': str
+        }
+    },
+    "driverperformance": {
+        "vehicle_column": "No of Vehicles",
+        "time_column": "Login Time",
+        "datetime_columns": ["Login Time", "Logout Time"],
+        "dtypes": {
+            'Driver': str,
+            'No of Vehicles': str,
+            'KM': float,
+            'Travel': str,
+            'Idle': str,
+            'Ex Idle': str,
+            'Harsh Break': 'Int64',
+            'Harsh Acceleration': 'Int64',
+            'Over Speed': 'Int64',
+            'Max Speed': 'Int64',
+            'Exceed Road Speed': str
+        }
+    }
+}
+
+_catalog_lock = threading.Lock()
+_catalog_cache = {}
+
+
+def report_dir(report):
+    return os.path.join(STORE_DIR, report)
+
+
+def _catalog_path(report):
+    return os.path.join(report_dir(report), CATALOG_FILE)
+
+
+def _partition_key(day, vehicle):
+    return f"{day}/{vehicle}"
+
+
+def vehicle_file_name(vehicle):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', vehicle) + ".parquet"
+
+
+def _empty_catalog(report):
+    return {
+        "report": report,
+        "columns": [],
+        "version": 0,
+        "partitions": {}
+    }
+
+
+def load_catalog(report):
+    path = _catalog_path(report)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return _empty_catalog(report)
+
+    cached = _catalog_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"[storage] Failed to read catalog for '{report}': {e}")
+        return _empty_catalog(report)
+
+    _catalog_cache[path] = (mtime, catalog)
+    return catalog
+
+
+def _save_catalog(report, catalog):
+    path = _catalog_path(report)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def has_report(report):
+    return bool(load_catalog(report)["partitions"])
+
+
+def coerce_report_types(report, df):
+    schema = REPORT_SCHEMAS[report]
+    df = df.copy()
+
+    for col in schema["datetime_columns"]:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    for col, dtype in schema["dtypes"].items():
+        if col not in df.columns:
+            continue
+        try:
+            if dtype is str:
+                values = df[col].astype(object)
+                df[col] = values.where(values.isna(), values.astype(str).str.strip())
+            elif dtype == 'Int64':
+                df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+            else:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        except Exception as e:
+            print(f"[storage] Could not convert '{col}' in {report}: {e}")
+
+    return df
+
+
+def _write_partition_file(path, df):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def write_report(report, df):
+    schema = REPORT_SCHEMAS[report]
+    vehicle_col = schema["vehicle_column"]
+    time_col = schema["time_column"]
+
+    if df is None or df.empty:
+        return []
+    if vehicle_col not in df.columns or time_col not in df.columns:
+        print(f"[storage] {report}: missing '{vehicle_col}' or '{time_col}', nothing stored")
+        return []
+
+    df = coerce_report_types(report, df)
+    valid = df[time_col].notna() & df[vehicle_col].notna()
+    if not valid.all():
+        print(f"[storage] {report}: skipped {int((~valid).sum())} rows without vehicle or timestamp")
+        df = df[valid]
+    if df.empty:
+        return []
+
+    touched = []
+    with _catalog_lock:
+        catalog = copy.deepcopy(load_catalog(report))
+        columns = catalog["columns"] or list(df.columns)
+        for col in df.columns:
+            if col not in columns:
+                columns.append(col)
+        catalog["columns"] = columns
+
+        days = df[time_col].dt.strftime('%Y-%m-%d')
+        for (day, vehicle), part in df.groupby([days, df[vehicle_col]], sort=True):
+            key = _partition_key(day, vehicle)
+            entry = catalog["partitions"].get(key)
+            file_path = os.path.join(report_dir(report), day, vehicle_file_name(vehicle))
+
+            if entry and os.path.exists(file_path):
+                existing = pd.read_parquet(file_path)
+                merged = pd.concat([existing, part], ignore_index=True).drop_duplicates()
+                if len(merged) == len(existing):
+                    continue
+            else:
+                merged = part.drop_duplicates()
+
+            merged = merged.sort_values(time_col, kind='stable').reset_index(drop=True)
+            _write_partition_file(file_path, merged)
+
+            catalog["partitions"][key] = {
+                "day": day,
+                "vehicle": vehicle,
+                "file": os.path.relpath(file_path, report_dir(report)),
+                "rows": int(len(merged)),
+                "min_time": merged[time_col].min().strftime('%Y-%m-%d %H:%M:%S'),
+                "max_time": merged[time_col].max().strftime('%Y-%m-%d %H:%M:%S'),
+                "version": (entry or {}).get("version", 0) + 1,
+                "updated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            touched.append((day, vehicle))
+
+        if touched:
+            catalog["version"] = catalog.get("version", 0) + 1
+            _save_catalog(report, catalog)
+
+    if touched:
+        print(f"[storage] {report}: updated {len(touched)} partitions")
+    return touched
+
+
+def _select_partitions(catalog, vehicle_ids=None, t_start=None, t_end=None):
+    vehicles = {str(v).strip() for v in vehicle_ids} if vehicle_ids is not None else None
+    day_start = pd.to_datetime(t_start).strftime('%Y-%m-%d') if t_start is not None else None
+    day_end = pd.to_datetime(t_end).strftime('%Y-%m-%d') if t_end is not None else None
+
+    selected = []
+    for entry in catalog["partitions"].values():
+        if vehicles is not None and entry["vehicle"] not in vehicles:
+            continue
+        if day_start and entry["day"] < day_start:
+            continue
+        if day_end and entry["day"] > day_end:
+            continue
+        selected.append(entry)
+    return sorted(selected, key=lambda e: (e["vehicle"], e["day"]))
+
+
+def read_report(report, vehicle_ids=None, t_start=None, t_end=None, columns=None):
+    schema = REPORT_SCHEMAS[report]
+    time_col = schema["time_column"]
+    catalog = load_catalog(report)
+    partitions = _select_partitions(catalog, vehicle_ids, t_start, t_end)
+
+    read_columns = None
+    if columns is not None:
+        read_columns = [c for c in catalog["columns"] if c in columns or c == time_col]
+
+    frames = []
+    for entry in partitions:
+        file_path = os.path.join(report_dir(report), entry["file"])
+        try:
+            frames.append(pd.read_parquet(file_path, columns=read_columns))
+        except Exception as e:
+            print(f"[storage] Failed to read partition {file_path}: {e}")
+
+    if not frames:
+        return pd.DataFrame(columns=read_columns if read_columns is not None else catalog["columns"])
+
+    df = pd.concat(frames, ignore_index=True)
+    if t_start is not None:
+        df = df[df[time_col] >= pd.to_datetime(t_start)]
+    if t_end is not None:
+        df = df[df[time_col] <= pd.to_datetime(t_end)]
+    if columns is not None and time_col not in columns:
+        df = df.drop(columns=[time_col])
+    return df.reset_index(drop=True)
+
+
+def list_vehicles(report):
+    catalog = load_catalog(report)
+    return sorted({entry["vehicle"] for entry in catalog["partitions"].values()})
+
+
+def list_days(report, vehicle_ids=None):
+    catalog = load_catalog(report)
+    return sorted({entry["day"] for entry in _select_partitions(catalog, vehicle_ids)})
+
+
+def partition_version(report, day, vehicle):
+    entry = load_catalog(report)["partitions"].get(_partition_key(day, str(vehicle).strip()))
+    return entry["version"] if entry else 0
+
+
+def report_version(report):
+    return load_catalog(report).get("version", 0)
+
+
+def summarize(report):
+    partitions = load_catalog(report)["partitions"].values()
+    if not partitions:
+        return {"records": 0, "date_range": None}
+    return {
+        "records": sum(e["rows"] for e in partitions),
+        "date_range": {
+            "start": pd.to_datetime(min(e["min_time"] for e in partitions)),
+            "end": pd.to_datetime(max(e["max_time"] for e in partitions))
+        }
+    }
+
+
+def drop_partitions_before(report, cutoff_day):
+    cutoff_day = pd.to_datetime(cutoff_day).strftime('%Y-%m-%d')
+    dropped = 0
+    with _catalog_lock:
+        catalog = copy.deepcopy(load_catalog(report))
+        for key, entry in list(catalog["partitions"].items()):
+            if entry["day"] >= cutoff_day:
+                continue
+            file_path = os.path.join(report_dir(report), entry["file"])
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            del catalog["partitions"][key]
+            dropped += 1
+
+        if dropped:
+            catalog["version"] = catalog.get("version", 0) + 1
+            _save_catalog(report, catalog)
+
+    for day in os.listdir(report_dir(report)) if os.path.isdir(report_dir(report)) else []:
+        day_path = os.path.join(report_dir(report), day)
+        if os.path.isdir(day_path) and day < cutoff_day and not os.listdir(day_path):
+            os.rmdir(day_path)
+
+    print(f"[storage] {report}: dropped {dropped} partitions before {cutoff_day}")
+    return dropped
+
+
+def import_csv(report, csv_path, chunksize=200000):
+    if not os.path.exists(csv_path):
+        return 0
+    imported = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False):
+        write_report(report, chunk)
+        imported += len(chunk)
+    print(f"[storage] Imported {imported} rows from {csv_path} into {report}")
+    return imported
+
+
+def ensure_imported(report, folder_name):
+    if has_report(report):
+        return
+    for file_name in ("history.csv", "current.csv"):
+        try:
+            import_csv(report, os.path.join(folder_name, file_name))
+        except Exception as e:
+            print(f"[storage] Failed to import {file_name} for {report}: {e}")
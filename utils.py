@@ -4,7 +4,6 @@ import os
 import threading
 import time
 from datetime import datetime, timedelta, UTC,timezone
-from itertools import groupby
 from typing import  Dict
 from langchain_google_genai import ChatGoogleGenerativeAI
 import google.generativeai as genai
@@ -13,18 +12,21 @@ from google.api_core.exceptions import ResourceExhausted
 
 import folium
 import numpy as np
-import openrouteservice
 import pandas as pd
-import requests
 import re
 import schedule
 from geopy import distance
 from geopy.geocoders import Nominatim
-from pyproj import Transformer
-from scipy.spatial.distance import directed_hausdorff
-from shapely.geometry import LineString, Point
 from sklearn.cluster import KMeans
 
+import alertstore
+import maplayers
+import routemetrics
+import routing
+import simplify
+import stoppoints
+import storage
+
 rag_system = None
 _geolocator = None
 SETTINGS_FILE = "config_data/app_settings.json"
@@ -34,9 +36,15 @@ DRIVER_NAMES = "config_data/vehicle_aliases.json"
 CUSTOMER_POINTS_DIR = "analysis/customerpoints"
 ROUTES_JSON_DIR = "analysis/routes_json"
 EDITS_CSV_FILE = "analysis/customerinfo/customerinfo.csv"
+CUSTOMER_POINTS_RENDER_MODE = "geojson"
+MAP_COLORS = ['red', 'blue', 'green', 'purple', 'orange', 'darkred',
+              'lightred', 'beige', 'darkblue', 'darkgreen', 'cadetblue',
+              'darkpurple', 'pink', 'lightblue', 'lightgreen', 'gray', 'black']
 TRAVEL_REPORT_DIR = "data/travelreport"
 DEFAULT_SETTINGS = {
     "ors_api_key": "",
+    "ors_base_url": "",
+    "ors_requests_per_minute": "",
     "route_cache_dir": "",
     "csv_path_current": "",
     "csv_path_past": "",
@@ -141,37 +149,58 @@ def load_vehicle_aliases():
         print(f"Error loading vehicle aliases: {e}")
         return {}
 
+def is_travel_report_path(csv_path):
+    if not csv_path:
+        return False
+    return os.path.normpath(os.path.dirname(csv_path)) == os.path.normpath(TRAVEL_REPORT_DIR)
+
+def load_travel_rows(csv_path, vehicle_ids=None, t_start=None, t_end=None, columns=None):
+    if is_travel_report_path(csv_path) and storage.has_report("travelreport"):
+        return storage.read_report("travelreport", vehicle_ids, t_start, t_end, columns)
+
+    if not csv_path or not os.path.exists(csv_path):
+        return pd.DataFrame()
+
+    df = pd.read_csv(
+        csv_path,
+        dtype={
+            'Vehicle No': str,
+            'Status': str,
+            'Address': str,
+            'Panic':str,
+            'Speed':float,
+            'Odometer': float,
+            'Latitude':float,
+            'Longitude':float
+        },
+        parse_dates=['DateTime']
+    )
+    df['Vehicle No'] = df['Vehicle No'].astype(str).str.strip()
+    if vehicle_ids is not None:
+        df = df[df['Vehicle No'].isin([str(v).strip() for v in vehicle_ids])]
+    if t_start is not None:
+        df = df[df['DateTime'] >= pd.to_datetime(t_start)]
+    if t_end is not None:
+        df = df[df['DateTime'] <= pd.to_datetime(t_end)]
+    if columns is not None:
+        df = df[[c for c in df.columns if c in columns]]
+    return df
+
 def load_actual_route(csv_path, vehicle_id, t_start, t_end):
-    if not os.path.exists(csv_path):
-        return []
-    
     try:
-        df = pd.read_csv(
+        vehicle_id_str = str(vehicle_id).strip()
+        df = load_travel_rows(
             csv_path,
-            dtype={
-                'Vehicle No': str,
-                'Status': str,
-                'Address': str,
-                'Panic':str,
-                'Speed':float,
-                'Odometer': float,
-                'Latitude':float,
-                'Longitude':float
-            },
-            parse_dates=['DateTime']
+            [vehicle_id_str],
+            t_start,
+            t_end,
+            columns=['Vehicle No', 'DateTime', 'Latitude', 'Longitude']
         )
+        if df.empty:
+            return []
 
-        df['Vehicle No'] = df['Vehicle No'].astype(str).str.strip()
-        vehicle_id_str = str(vehicle_id).strip()
-        
-        df = df[df["Vehicle No"] == vehicle_id_str]
-        
         df = df[df["Latitude"].notnull() & df["Longitude"].notnull()]
         
-        if "DateTime" in df.columns:
-            df["DateTime"] = pd.to_datetime(df["DateTime"])
-            df = df[(df["DateTime"] >= pd.to_datetime(t_start)) & (df["DateTime"] <= pd.to_datetime(t_end))]
-        
         coords = df[["Longitude", "Latitude"]].drop_duplicates().values.tolist()
         return coords
         
@@ -328,121 +357,53 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 def compute_path_overlap(ref_path, target_path, tolerance_m=500):
     if not ref_path or not target_path:
         return 0
-    ref_line = LineString(ref_path)
-    count = sum(
-        1 for lon, lat in target_path
-        if ref_line.distance(Point(lon, lat)) * 111320 <= tolerance_m
+    utm_epsg = routemetrics.utm_epsg_for(ref_path[0][0], ref_path[0][1])
+    distances = routemetrics.point_to_line_distances(
+        routemetrics.project_coords(target_path, utm_epsg),
+        routemetrics.project_coords(ref_path, utm_epsg)
     )
-    return (count / len(target_path)) * 100 if target_path else 0
+    return float((distances <= tolerance_m).mean() * 100)
 
-def extract_stop_points(csv_path, vehicle_ids, t_start, t_end):
-    if not os.path.exists(csv_path):
+def extract_stop_points(csv_path, vehicle_ids, t_start, t_end,
+                        join_radius_m=stoppoints.STOP_JOIN_RADIUS_METERS,
+                        min_points=stoppoints.STOP_MIN_POINTS,
+                        min_duration_minutes=stoppoints.STOP_MIN_DURATION_MINUTES):
+    if not (is_travel_report_path(csv_path) and storage.has_report("travelreport")) and not os.path.exists(csv_path):
         print(f"CSV file not found: {csv_path}")
         return pd.DataFrame()
     
     try:
-        df = pd.read_csv(
-            csv_path,
-            dtype={
-                'Vehicle No': str,
-                'Status': str,
-                'Address': str,
-                'Odometer': float,
-                'Panic': str,
-                'Latitude':float,
-                'Longitude':float
-            },
-            parse_dates=['DateTime']
-        )
-        print(f"Loaded {len(df)} records from {csv_path}")
-
-        df['Vehicle No'] = df['Vehicle No'].astype(str).str.strip()
         vehicle_ids_str = [vid.strip() for vid in vehicle_ids]
-        df = df[df['Vehicle No'].isin(vehicle_ids_str)]
+        uses_index = (
+            is_travel_report_path(csv_path) and storage.has_report("travelreport") and
+            (join_radius_m, min_points, min_duration_minutes) == (
+                stoppoints.STOP_JOIN_RADIUS_METERS, stoppoints.STOP_MIN_POINTS, stoppoints.STOP_MIN_DURATION_MINUTES)
+        )
+        if uses_index:
+            result_df = stoppoints.get_stop_points(vehicle_ids_str, t_start, t_end)
+            print(f"Loaded {len(result_df)} stop points from stop-point index")
+            return result_df
 
-        df['DateTime'] = pd.to_datetime(df['DateTime'])
-        df = df[(df['DateTime'] >= pd.to_datetime(t_start)) & (df['DateTime'] <= pd.to_datetime(t_end))]
+        df = load_travel_rows(csv_path, vehicle_ids_str, t_start, t_end)
+        print(f"Loaded {len(df)} records from {csv_path}")
 
-        df = df[df['Status'].isin(['Idle', 'Stopped'])]
-        
         if df.empty:
             print("No stop/idle data found for the specified criteria")
             return pd.DataFrame()
 
-        stop_points = []
+        df = df[df['Status'].isin(stoppoints.STOP_STATUSES)]
         
-        for vehicle_id in vehicle_ids_str:
-            vehicle_data = df[df['Vehicle No'] == vehicle_id].copy()
-            if vehicle_data.empty:
-                continue
-
-            vehicle_data = vehicle_data.sort_values('DateTime')
-
-            current_group = []
-            current_lat = None
-            current_lon = None
-            
-            for _, row in vehicle_data.iterrows():
-                lat, lon = row['Latitude'], row['Longitude']
-
-                if current_lat is not None and current_lon is not None:
-                    distance = haversine_distance(current_lat, current_lon, lat, lon)
-                    if distance <= 50:
-                        current_group.append(row)
-
-                        current_lat = sum(r['Latitude'] for r in current_group) / len(current_group)
-                        current_lon = sum(r['Longitude'] for r in current_group) / len(current_group)
-                    else:
-
-                        if len(current_group) >= 2:
-                            start_time = current_group[0]['DateTime']
-                            end_time = current_group[-1]['DateTime']
-                            duration_minutes = (end_time - start_time).total_seconds() / 60
-                            
-                            if duration_minutes >= 2:
-                                avg_lat = sum(r['Latitude'] for r in current_group) / len(current_group)
-                                avg_lon = sum(r['Longitude'] for r in current_group) / len(current_group)
-                                
-                                stop_points.append({
-                                    'Vehicle No': vehicle_id,
-                                    'Latitude': avg_lat,
-                                    'Longitude': avg_lon,
-                                    'StartTime': start_time,
-                                    'EndTime': end_time,
-                                    'DurationMinutes': round(duration_minutes, 1),
-                                    'Status': current_group[0]['Status'],
-                                    'Address': current_group[0]['Address']
-                                })
+        if df.empty:
+            print("No stop/idle data found for the specified criteria")
+            return pd.DataFrame()
 
-                        current_group = [row]
-                        current_lat = lat
-                        current_lon = lon
-                else:
-                    current_group = [row]
-                    current_lat = lat
-                    current_lon = lon
-
-            if len(current_group) >= 2:
-                start_time = current_group[0]['DateTime']
-                end_time = current_group[-1]['DateTime']
-                duration_minutes = (end_time - start_time).total_seconds() / 60
-                
-                if duration_minutes >= 2:
-                    avg_lat = sum(r['Latitude'] for r in current_group) / len(current_group)
-                    avg_lon = sum(r['Longitude'] for r in current_group) / len(current_group)
-                    
-                    stop_points.append({
-                        'Vehicle No': vehicle_id,
-                        'Latitude': avg_lat,
-                        'Longitude': avg_lon,
-                        'StartTime': start_time,
-                        'EndTime': end_time,
-                        'DurationMinutes': round(duration_minutes, 1),
-                        'Status': current_group[0]['Status'],
-                        'Address': current_group[0]['Address']
-                    })
-        
-        result_df = pd.DataFrame(stop_points)
+        result_df = stoppoints.detect_stop_points(
+            df,
+            vehicle_ids=vehicle_ids_str,
+            join_radius_m=join_radius_m,
+            min_points=min_points,
+            min_duration_minutes=min_duration_minutes
+        )
         print(f"Extracted {len(result_df)} stop points")
         return result_df
         
@@ -478,22 +439,17 @@ def get_address_from_coords(lat, lon):
         return "Unspecified Location"
 
 def get_available_vehicles():
+    if storage.has_report("travelreport"):
+        return storage.list_vehicles("travelreport")
+
     vehicles = set()
     
     for csv_path in [f"{TRAVEL_REPORT_DIR}/current.csv", f"{TRAVEL_REPORT_DIR}/history.csv"]:
         if os.path.exists(csv_path):
             df = pd.read_csv(
                 csv_path,
-                dtype={
-                    'Vehicle No': str,
-                    'Status': str,
-                    'Odometer': float,
-                    'Address': str,
-                    'Panic': str,
-                    'Latitude':float,
-                    'Longitude':float
-                },
-                parse_dates=['DateTime']
+                dtype={'Vehicle No': str},
+                usecols=['Vehicle No']
             )
             if "Vehicle No" in df.columns:
                 vehicles.update(df["Vehicle No"].astype(str).unique())
@@ -574,38 +530,61 @@ def load_and_process_customer_points(customer_cache_point):
     
     return customer_points
 
-def render_customer_points_to_map(map_object, filtered_df, vehicle_colors, show_edits_button=True):
+def resolve_customer_points(filtered_df, vehicle_colors):
+    points = filtered_df.copy()
+    if 'customer_id' not in points:
+        points['customer_id'] = None
+
+    aliases = load_vehicle_aliases()
+    points['vehicle'] = points['Vehicle No'].astype(str)
+    points['alias'] = points['vehicle'].map(aliases).fillna(points['vehicle'])
+    points['color'] = [
+        vehicle_colors.get((vehicle, weekday)) or vehicle_colors.get(vehicle, 'gray')
+        for vehicle, weekday in zip(points['Vehicle No'], points['Weekday'])
+    ]
+    points['is_custom'] = points['customer_id'].notna()
+
     edits_df = get_unified_edits_df() if os.path.exists(EDITS_CSV_FILE) else pd.DataFrame()
-    
-    for _, row in filtered_df.iterrows():
-        vehicle_no = row['Vehicle No']
-        alias = load_vehicle_aliases().get(str(vehicle_no), str(vehicle_no))
-        weekday = row['Weekday']
-        color = vehicle_colors.get((vehicle_no, weekday)) or vehicle_colors.get(vehicle_no, 'gray')
+    if points['is_custom'].any() and not edits_df.empty:
+        edits = edits_df.dropna(subset=['customer_id']).drop_duplicates('customer_id')
+        edits = edits[['customer_id', 'customer_name', 'customer_contact', 'description']]
+        points = points.merge(edits, on='customer_id', how='left')
+    else:
+        points = points.assign(customer_name=None, customer_contact=None, description=None)
 
-        customer_id = row.get('customer_id')
-        is_custom = pd.notna(customer_id)
-        
-        customer_name = ''
-        customer_contact = ''
-        display_address = row.get('Address', 'Unspecified Location')
-        
-        if is_custom and not edits_df.empty:
-            customer_data = edits_df[edits_df['customer_id'] == customer_id]
-            if not customer_data.empty:
-                customer_record = customer_data.iloc[0]
-                customer_name = customer_record.get('customer_name', '')
-                customer_contact = customer_record.get('customer_contact', '')
-                display_address = customer_record.get('description', display_address)
+    address = points['Address'] if 'Address' in points else pd.Series('Unspecified Location', index=points.index)
+    points['display_address'] = points['description'].where(points['description'].notna(), address)
+    points[['customer_name', 'customer_contact']] = points[['customer_name', 'customer_contact']].fillna('')
+    return points
+
+def customer_point_icon(color, is_custom):
+    return create_pin_marker(color, size=18, opacity=0.8, marker_type="custom_point" if is_custom else "customer_point")
+
+def render_customer_points_to_map(map_object, filtered_df, vehicle_colors, show_edits_button=True, mode=None):
+    points = resolve_customer_points(filtered_df, vehicle_colors)
+    mode = mode or CUSTOMER_POINTS_RENDER_MODE
+
+    if mode == "geojson":
+        data, icons = maplayers.customer_points_geojson(points, customer_point_icon)
+        maplayers.CustomerPointsLayer(data, icons, show_edits_button=show_edits_button).add_to(map_object)
+        return
+
+    for _, row in points.iterrows():
+        vehicle_no = row['Vehicle No']
+        alias = row['alias']
+        color = row['color']
+        is_custom = row['is_custom']
+        customer_id = row['customer_id'] if is_custom else None
+        customer_name = row['customer_name']
+        customer_contact = row['customer_contact']
+        display_address = row['display_address']
 
         if is_custom:
-            icon_type = "custom_point"
             edit_button_class = "edit-custom-point-btn"
             remove_button_class = "remove-custom-point-btn"
             edit_button_text = "Edit Customer"
             remove_button_text = "Remove Customer"
         else:
-            icon_type = "customer_point"
             edit_button_class = "edit-point-btn"
             remove_button_class = "remove-point-btn"
             edit_button_text = "Edit Point"
@@ -659,7 +638,7 @@ def render_customer_points_to_map(map_object, filtered_df, vehicle_colors, show_
         if customer_name:
             tooltip_content = f"{customer_name} - {alias} - {row['Weekday']}"
 
-        icon_html = create_pin_marker(color, size=18, opacity=0.8, marker_type=icon_type)
+        icon_html = customer_point_icon(color, is_custom)
         
         folium.Marker(
             [row['Latitude'], row['Longitude']],
@@ -688,7 +667,7 @@ def render_vehicle_paths_to_map(map_object, assign_paths_addr, selected_weekdays
 
             if veh in selected_vehicle_ids and day in selected_weekdays:
                 coords = feature["geometry"]["coordinates"]
-                coords_latlon = [(lat, lon) for lon, lat in coords]
+                coords_latlon = simplify.route_geometry(coords).latlon()
 
                 if (veh, day) in vehicle_colors:
                     route_color = vehicle_colors[(veh, day)]
@@ -722,6 +701,15 @@ def render_vehicle_paths_to_map(map_object, assign_paths_addr, selected_weekdays
                     popup=folium.Popup(popup_html, max_width=300),
                     tooltip=folium.Tooltip(tooltip_content, permanent=False)
                 ).add_to(map_object)
+def assign_vehicle_colors(vehicle_ids, weekdays):
+    if len(vehicle_ids) == 1 and len(weekdays) > 1:
+        return {
+            (vehicle_ids[0], day): MAP_COLORS[i % len(MAP_COLORS)] for i, day in enumerate(weekdays)
+        }
+    return {
+        vehicle: MAP_COLORS[i % len(MAP_COLORS)] for i, vehicle in enumerate(vehicle_ids)
+    }
+
 def create_map(vehicle_ids, weekdays, customer_points, assign_paths_addr=None,
                date=None, csv_path_current=None, csv_path_past=None):
     customer_points_df = load_and_process_customer_points(customer_points)
@@ -754,18 +742,7 @@ def create_map(vehicle_ids, weekdays, customer_points, assign_paths_addr=None,
     center_lon = filtered_df['Longitude'].mean()
     m = folium.Map(location=[center_lat, center_lon], zoom_start=12)
 
-    colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred',
-              'lightred', 'beige', 'darkblue', 'darkgreen', 'cadetblue',
-              'darkpurple', 'pink', 'lightblue', 'lightgreen', 'gray', 'black']
-
-    if len(vehicle_ids) == 1 and len(weekdays) > 1:
-        vehicle_colors = {
-            (vehicle_ids[0], day): colors[i % len(colors)] for i, day in enumerate(weekdays)
-        }
-    else:
-        vehicle_colors = {
-            vehicle: colors[i % len(colors)] for i, vehicle in enumerate(vehicle_ids)
-        }
+    vehicle_colors = assign_vehicle_colors(vehicle_ids, weekdays)
     if date:
         csv_path = get_appropriate_csv_path(date, csv_path_current, csv_path_past)
         add_stop_points_to_map(m, vehicle_ids, csv_path, date, vehicle_colors)
@@ -782,7 +759,8 @@ def calculate_customer_points_analysis(vehicle_ids, customer_points, csv_path, d
                 'total_customer_points': 0,
                 'visited_customer_points': 0,
                 'unvisited_customer_points': 0,
-                'visit_percentage': 0.0
+                'visit_percentage': 0.0,
+                'customer_visits': []
             }
         return analysis_results
 
@@ -793,47 +771,37 @@ def calculate_customer_points_analysis(vehicle_ids, customer_points, csv_path, d
     ]
 
     stop_points_df = extract_stop_points(csv_path, vehicle_ids, t_start, t_end)
+    visits = stoppoints.match_customer_visits(vehicle_customer_points, stop_points_df)
     
     for vehicle_id in vehicle_ids:
         vehicle_id_str = str(vehicle_id)
 
-        vehicle_cust_points = vehicle_customer_points[
-            vehicle_customer_points['Vehicle No'] == vehicle_id_str
-        ]
-        
-        total_customer_points = len(vehicle_cust_points)
-        visited_count = 0
+        vehicle_visits = visits[visits['Vehicle No'] == vehicle_id_str]
         
-        if total_customer_points > 0 and not stop_points_df.empty:
-            vehicle_stops = stop_points_df[stop_points_df['Vehicle No'] == vehicle_id_str]
-            
-            if not vehicle_stops.empty:
-                for _, cust_point in vehicle_cust_points.iterrows():
-                    cust_lat = cust_point['Latitude']
-                    cust_lon = cust_point['Longitude']
-
-                    is_visited = False
-                    for _, stop_point in vehicle_stops.iterrows():
-                        stop_lat = stop_point['Latitude']
-                        stop_lon = stop_point['Longitude']
-
-                        distance = haversine_distance(cust_lat, cust_lon, stop_lat, stop_lon)
-                        
-                        if distance <= 500:
-                            is_visited = True
-                            break
-                    
-                    if is_visited:
-                        visited_count += 1
+        total_customer_points = len(vehicle_visits)
+        visited_count = int(vehicle_visits['Visited'].sum())
         
         unvisited_count = total_customer_points - visited_count
         visit_percentage = (visited_count / total_customer_points * 100) if total_customer_points > 0 else 0.0
         
+        customer_visits = []
+        for record in vehicle_visits.to_dict('records'):
+            customer_visits.append({
+                'latitude': record['Latitude'],
+                'longitude': record['Longitude'],
+                'address': record.get('Address') if pd.notna(record.get('Address')) else '',
+                'visited': bool(record['Visited']),
+                'visit_start': record['VisitStart'].strftime('%Y-%m-%d %H:%M:%S') if record['Visited'] else None,
+                'visit_end': record['VisitEnd'].strftime('%Y-%m-%d %H:%M:%S') if record['Visited'] else None,
+                'distance_m': record['VisitDistanceM'] if record['Visited'] else None
+            })
+
         analysis_results[vehicle_id_str] = {
             'total_customer_points': total_customer_points,
             'visited_customer_points': visited_count,
             'unvisited_customer_points': unvisited_count,
-            'visit_percentage': round(visit_percentage, 1)
+            'visit_percentage': round(visit_percentage, 1),
+            'customer_visits': customer_visits
         }
     
     return analysis_results
@@ -852,10 +820,7 @@ def generate_route_comparison(
     generate_map=True
 ):
 
-    colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred',
-              'lightred', 'beige', 'darkblue', 'darkgreen', 'cadetblue',
-              'darkpurple', 'pink', 'lightblue', 'lightgreen', 'gray', 'black']
-    vehicle_colors = {vehicle_id:colors[i%len(colors)] for i,vehicle_id in enumerate(vehicle_ids)}
+    vehicle_colors = {vehicle_id:MAP_COLORS[i%len(MAP_COLORS)] for i,vehicle_id in enumerate(vehicle_ids)}
     comparison_data = {}
 
     if not os.path.exists(geojson_path):
@@ -926,15 +891,12 @@ def generate_route_comparison(
             if actual_coords and len(actual_coords) > 1:
                 valid_routes_exist = True
                 try:
-                    total_dist = sum(
-                        haversine_distance(actual_coords[i-1][1], actual_coords[i-1][0], 
-                                         actual_coords[i][1], actual_coords[i][0])
-                        for i in range(1, len(actual_coords))
-                    )
+                    actual_route = simplify.route_geometry(actual_coords)
+                    total_dist = actual_route.length_m
                     comparison_data[f"{vehicle_id}_{label}"]["actual_distance"] = round(total_dist/1000, 2)
 
                     if generate_map:
-                        actual_latlon = [[lat, lon] for lon, lat in actual_coords]
+                        actual_latlon = actual_route.latlon()
                         all_coords.extend(actual_latlon)
 
                         if not m:
@@ -1017,14 +979,10 @@ def generate_route_comparison(
 
             if generate_map and planned_coords and len(planned_coords) > 1 and date_past is None:
                 try:
-                    planned_latlon = [[lat, lon] for lon, lat in planned_coords]
+                    planned_route = simplify.route_geometry(planned_coords)
+                    planned_latlon = planned_route.latlon()
                     all_coords.extend(planned_latlon)
-                    
-                    planned_dist = sum(
-                        haversine_distance(planned_coords[i-1][1], planned_coords[i-1][0], 
-                                         planned_coords[i][1], planned_coords[i][0])
-                        for i in range(1, len(planned_coords))
-                    )
+                    planned_dist = planned_route.length_m
 
                     planned_popup = f"""
                     <div style="font-family: Arial; min-width: 200px;">
@@ -1049,8 +1007,6 @@ def generate_route_comparison(
 
     if date_past is not None:
         try:
-            project = Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True).transform
-            
             for vehicle_id in vehicle_ids:
                 current_key = f"{vehicle_id}_Current"
                 past_key = f"{vehicle_id}_Past"
@@ -1075,16 +1031,12 @@ def generate_route_comparison(
 
                     if current_coords and past_coords and len(current_coords) > 1 and len(past_coords) > 1:
                         try:
-                            current_proj = [project(lon, lat) for lon, lat in current_coords]
-                            past_proj = [project(lon, lat) for lon, lat in past_coords]
+                            metrics = routemetrics.route_metrics(current_coords, past_coords)
                             
-                            if len(current_proj) > 1 and len(past_proj) > 1:
-                                A = np.array(current_proj)
-                                B = np.array(past_proj)
-
-                                hausdorff = min(directed_hausdorff(A, B)[0], directed_hausdorff(B, A)[0])
-                                overlap = compute_path_overlap(current_coords, past_coords)
-                                reverse_overlap = compute_path_overlap(past_coords, current_coords)
+                            if metrics is not None:
+                                hausdorff = metrics["hausdorff"]
+                                overlap = metrics["coverage"]
+                                reverse_overlap = metrics["alignment"]
 
                                 comparison_data[current_key].update({
                                     "maximum_route_deviation": round(hausdorff, 1),
@@ -1103,8 +1055,6 @@ def generate_route_comparison(
             pass
     else:
         try:
-            project = Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True).transform
-            
             for vehicle_id in vehicle_ids:
                 current_key = f"{vehicle_id}_Current"
                 if current_key in comparison_data:
@@ -1133,16 +1083,12 @@ def generate_route_comparison(
 
                     if actual_coords and planned_coords and len(actual_coords) > 1 and len(planned_coords) > 1:
                         try:
-                            actual_proj = [project(lon, lat) for lon, lat in actual_coords]
-                            planned_proj = [project(lon, lat) for lon, lat in planned_coords]
+                            metrics = routemetrics.route_metrics(actual_coords, planned_coords)
                             
-                            if len(actual_proj) > 1 and len(planned_proj) > 1:
-                                A = np.array(actual_proj)
-                                B = np.array(planned_proj)
-
-                                hausdorff = min(directed_hausdorff(A, B)[0], directed_hausdorff(B, A)[0])
-                                overlap = compute_path_overlap(actual_coords, planned_coords)
-                                reverse_overlap = compute_path_overlap(planned_coords, actual_coords)
+                            if metrics is not None:
+                                hausdorff = metrics["hausdorff"]
+                                overlap = metrics["coverage"]
+                                reverse_overlap = metrics["alignment"]
 
                                 comparison_data[current_key].update({
                                     "maximum_route_deviation": round(hausdorff, 1),
@@ -1203,7 +1149,8 @@ def generate_route_comparison(
                         'total_customer_points': current_analysis[vehicle_id_str]['total_customer_points'],
                         'visited_customer_points': current_analysis[vehicle_id_str]['visited_customer_points'],
                         'unvisited_customer_points': current_analysis[vehicle_id_str]['unvisited_customer_points'],
-                        'visit_percentage': current_analysis[vehicle_id_str]['visit_percentage']
+                        'visit_percentage': current_analysis[vehicle_id_str]['visit_percentage'],
+                        'customer_visits': current_analysis[vehicle_id_str]['customer_visits']
                     })
     except Exception:
         pass
@@ -1224,7 +1171,8 @@ def generate_route_comparison(
                             'total_customer_points': past_analysis[vehicle_id_str]['total_customer_points'],
                             'visited_customer_points': past_analysis[vehicle_id_str]['visited_customer_points'],
                             'unvisited_customer_points': past_analysis[vehicle_id_str]['unvisited_customer_points'],
-                            'visit_percentage': past_analysis[vehicle_id_str]['visit_percentage']
+                            'visit_percentage': past_analysis[vehicle_id_str]['visit_percentage'],
+                            'customer_visits': past_analysis[vehicle_id_str]['customer_visits']
                         })
         except Exception:
             pass
@@ -1295,7 +1243,7 @@ def generate_route_comparison(
         map_html = m._repr_html_()
     return map_html, comparison_data
 
-def generate_routes(csv_path, geojson_path, key=None):
+def generate_routes(csv_path, geojson_path, key=None, base_url=None, on_progress=None):
     try:
         if not os.path.exists(csv_path):
             print(f"CSV file not found: {csv_path}")
@@ -1339,170 +1287,21 @@ def generate_routes(csv_path, geojson_path, key=None):
             axis=1
         )
 
-        grouped = df.groupby(["Vehicle No", "Weekday"])
-        total_groups = len(grouped)
-        print(f"Processing {total_groups} vehicle-day combinations")
-        
-        try:
-            client = openrouteservice.Client(key=key)
-        except Exception as e:
-            print(f"Failed to initialize ORS client: {e}")
-            return None
-            
-        features = []
-        group_count = 0
-
-        def snap_and_validate_coordinates(coords_list, api_key, profile="driving-car"):
-            if not coords_list:
-                return [], []
-            
-            try:
-                url = f'https://api.openrouteservice.org/v2/snap/{profile}'
-                
-                payload = {
-                    "locations": coords_list,
-                    "radius": 350
-                }
-                
-                headers = {
-                    'Authorization': api_key,
-                    'Content-Type': 'application/json'
-                }
-                
-                response = requests.post(url, json=payload, headers=headers)
-                
-                if response.status_code != 200:
-                    raise Exception(f"Snap API failed ({response.status_code}): {response.text}")
-                
-                data = response.json()
-                locations = data.get('locations', [])
-                
-                valid_coords = []
-                invalid_indices = []
-                
-                for i, location in enumerate(locations):
-                    if location is not None and 'location' in location:
-                        valid_coords.append(location['location'])
-                    else:
-                        invalid_indices.append(i)
-                        print(f"WARNING: Coordinate {i} ({coords_list[i]}) could not be snapped to road network")
-                
-                if invalid_indices:
-                    print(f"INFO: {len(invalid_indices)} out of {len(coords_list)} coordinates were invalid")
-                
-                return valid_coords, invalid_indices
-                
-            except Exception as e:
-                print(f"ERROR: Snap endpoint failed: {e}")
-                return coords_list, []
-
-        for (veh_id, weekday), group in grouped:
-            group_count += 1
-            print(f"PROCESSING: Group {group_count}/{total_groups}: Vehicle {veh_id}, {weekday}")
-            
+        groups = []
+        for (veh_id, weekday), group in df.groupby(["Vehicle No", "Weekday"]):
             sorted_group = group.sort_values("DistanceFromStartKM")
-            coords = [(row["Longitude"], row["Latitude"]) for _, row in sorted_group.iterrows()]
-            veh_id_str = str(veh_id)
-            full_coords = [oxy_coord_lonlat] + coords + [oxy_coord_lonlat]
-            
-            print(f"   INFO: Total waypoints before validation: {len(full_coords)}")
-
-            valid_coords, invalid_indices = snap_and_validate_coordinates(full_coords, key)
-            
-            if len(valid_coords) < 2:
-                print(f"   ERROR: Not enough valid coordinates for routing ({len(valid_coords)} valid)")
-                continue
-                
-            print(f"   INFO: Valid waypoints after snapping: {len(valid_coords)}")
-
-            all_street_names = []
-            total_distance = 0
-            all_coordinates = []
-            chunk_count = 0
-
-            for i in range(0, len(valid_coords), 50):
-                chunk = valid_coords[i:i + 50]
-                if len(chunk) < 2:
-                    continue
-                
-                chunk_count += 1
-                max_retries = 3
-                retry_count = 0
-
-                while retry_count < max_retries:
-                    try:
-                        route = client.directions(chunk, profile="driving-car", format="geojson", instructions=True)
-
-                        if not route.get("features") or not route["features"]:
-                            print(f"   WARNING: Empty route response for chunk {chunk_count}")
-                            break
-                            
-                        feature_geo = route["features"][0]["geometry"]["coordinates"]
-                        props = route["features"][0]["properties"]
-
-                        if not props.get("summary"):
-                            print(f"   WARNING: No summary in route response for chunk {chunk_count}")
-                            break
-                            
-                        summary = props["summary"]
-                        chunk_distance = summary.get("distance", 0) / 1000
-                        total_distance += chunk_distance
-
-                        if feature_geo:
-                            all_coordinates.extend(feature_geo)
-
-                        segments = props.get("segments", [])
-                        if segments:
-                            steps = segments[0].get("steps", [])
-                            chunk_street_names = []
-                            for step in steps:
-                                name = step.get("name", "").strip()
-                                if name and name != "-" and name not in ["Destination", "Start"]:
-                                    chunk_street_names.append(name)
-                            all_street_names.extend(chunk_street_names)
-
-                        print(f"SUCCESS: Chunk {chunk_count}: {chunk_distance:.2f} km | {len(chunk_street_names) if 'chunk_street_names' in locals() else 0} streets")
-                        break
-                        
-                    except Exception as e:
-                        retry_count += 1
-                        print(f"   WARNING: Chunk {chunk_count} attempt {retry_count} failed: {e}")
-                        if retry_count >= max_retries:
-                            print(f"   ERROR: Chunk {chunk_count} failed after {max_retries} attempts")
-                        time.sleep(4)
-
-                time.sleep(1)
-
-            ordered_street_names = [k for k, _ in groupby(all_street_names)]
-            final_street_names = []
-            seen = set()
-            for name in ordered_street_names:
-                if name not in seen:
-                    final_street_names.append(name)
-                    seen.add(name)
-
-            if all_coordinates:
-                feature = {
-                    "type": "Feature",
-                    "properties": {
-                        "vehicle_id": veh_id_str,
-                        "weekday": weekday,
-                        "total_distance_km": round(total_distance, 2),
-                        "ordered_street_names": final_street_names,
-                        "street_count": len(final_street_names),
-                        "original_waypoints": len(full_coords),
-                        "valid_waypoints": len(valid_coords),
-                        "invalid_waypoints": len(invalid_indices)
-                    },
-                    "geometry": {
-                        "type": "LineString",
-                        "coordinates": all_coordinates
-                    }
-                }
-                features.append(feature)
-                print(f"   COMPLETED: Route: {total_distance:.2f} km | {len(final_street_names)} unique streets")
-            else:
-                print(f"   WARNING: No coordinates collected for {veh_id_str} {weekday}")
+            coords = list(zip(sorted_group["Longitude"], sorted_group["Latitude"]))
+            groups.append((str(veh_id), weekday, [oxy_coord_lonlat] + coords + [oxy_coord_lonlat]))
+        print(f"Processing {len(groups)} vehicle-day combinations")
+
+        settings = load_settings()
+        features = routing.route_groups(
+            groups,
+            key,
+            base_url=base_url or settings.get("ors_base_url") or None,
+            requests_per_minute=int(settings.get("ors_requests_per_minute") or routing.ORS_REQUESTS_PER_MINUTE),
+            on_progress=on_progress
+        )
 
         if not features:
             print("ERROR: No routes were generated")
@@ -1720,6 +1519,11 @@ class VehicleDataWrapper:
             "sent_alerts": "alerts/sent_alerts.json"
         }
         
+        if self.uses_alert_store():
+            del alert_files["alert_logs"]
+            del alert_files["sent_alerts"]
+            print(f"Using alert store {alertstore.ALERT_DB_PATH} for alert logs")
+        
         self._alert_logs = {}
         for log_type, file_path in alert_files.items():
             try:
@@ -1734,9 +1538,19 @@ class VehicleDataWrapper:
                 print(f"Error loading {log_type}: {str(e)}")
                 self._alert_logs[log_type] = {}
     
+    def uses_alert_store(self) -> bool:
+        return self.base_path == "." and alertstore.has_store()
+
+    def uses_travel_store(self) -> bool:
+        return self.base_path == "." and storage.has_report("travelreport")
+
     def load_all_data(self):
         for source in self.data_sources.keys():
             for time_type in ["current", "history"]:
+                if source == "data/travelreport" and time_type == "history" and self.uses_travel_store():
+                    self.data_sources[source][time_type] = None
+                    print(f"Using partitioned store for {source}/{time_type}")
+                    continue
                 file_path = os.path.join(self.base_path, source, f"{time_type}.csv")
                 try:
                     if os.path.exists(file_path):
@@ -1773,13 +1587,19 @@ class VehicleDataWrapper:
                            vehicle_nos: Optional[List[str]] = None,
                            driver_names: Optional[List[str]] = None) -> Dict:
         filtered_alerts = {}
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        
+        if self.uses_alert_store():
+            try:
+                return alertstore.query_alert_logs(start_str, end_str, vehicle_nos, driver_names)
+            except Exception as e:
+                print(f"Error querying alert store: {str(e)}")
+                return filtered_alerts
         
         if not self._alert_logs:
             return filtered_alerts
         
-        start_str = start_date.strftime('%Y-%m-%d')
-        end_str = end_date.strftime('%Y-%m-%d')
-        
         if "alert_logs" in self._alert_logs and "daily_logs" in self._alert_logs["alert_logs"]:
             daily_logs = self._alert_logs["alert_logs"]["daily_logs"]
             
@@ -1819,6 +1639,24 @@ class VehicleDataWrapper:
     def get_stop_points_data(self, start_date: datetime, end_date: datetime, 
                             vehicle_nos: Optional[List[str]] = None) -> pd.DataFrame:
         all_stop_points = []
+
+        if self.uses_travel_store():
+            vehicle_ids = [str(v) for v in vehicle_nos] if vehicle_nos else storage.list_vehicles("travelreport")
+            stop_points_df = extract_stop_points(
+                csv_path=os.path.join(TRAVEL_REPORT_DIR, "history.csv"),
+                vehicle_ids=vehicle_ids,
+                t_start=start_date.strftime('%Y-%m-%d %H:%M:%S'),
+                t_end=end_date.strftime('%Y-%m-%d %H:%M:%S')
+            )
+            if stop_points_df.empty:
+                return pd.DataFrame()
+            uae_today = pd.Timestamp((datetime.now(UTC) + timedelta(hours=4)).date())
+            stop_points_df['DataSource'] = np.where(
+                stop_points_df['StartTime'] >= uae_today, "travelreport_current", "travelreport_history"
+            )
+            stop_points_df = stop_points_df.sort_values(['Vehicle No', 'StartTime'])
+            print(f"Combined stop points: {len(stop_points_df)} records")
+            return stop_points_df
         
         for time_type in ["current", "history"]:
             csv_path = os.path.join(self.base_path, "data/travelreport", f"{time_type}.csv")
@@ -1986,7 +1824,14 @@ class VehicleDataWrapper:
             summary[source] = {}
             for time_type in ["current", "history"]:
                 df = self.data_sources[source][time_type]
-                if df is not None:
+                if source == "data/travelreport" and time_type == "history" and self.uses_travel_store():
+                    store_summary = storage.summarize("travelreport")
+                    summary[source][time_type] = {
+                        "records": store_summary["records"],
+                        "columns": storage.load_catalog("travelreport")["columns"],
+                        "date_range": store_summary["date_range"]
+                    }
+                elif df is not None:
                     summary[source][time_type] = {
                         "records": len(df),
                         "columns": list(df.columns),